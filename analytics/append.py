@@ -0,0 +1,94 @@
+# analytics/append.py
+import os
+import threading
+
+import numpy as np
+
+from analytics.columnar import append_columnar, file_version, read_columnar, read_manifest, write_columnar
+from analytics.data import (
+    COLUMNAR_PATH, DATA_PATH, columnar_is_current, get_dataset, set_dataset, source_version,
+)
+from analytics.ingest import CUBE_DIR, conform, read_chunks
+from analytics.lazy import lazy_import
+from analytics.partitions import PARTITION_BY, cluster
+
+pd = lazy_import("pandas")
+
+_lock = threading.Lock()
+
+
+def concat_frames(frame, rows):
+    # `frame` followed by `rows`. Categorical columns keep the codes of `frame`
+    # and add values they have not seen at the end of their categories.
+    columns = {}
+    for column in frame.columns:
+        values, more = frame[column], rows[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            columns[column] = pd.api.types.union_categoricals([values, more.astype("category")])
+        else:
+            columns[column] = np.concatenate([values.to_numpy(), more.to_numpy().astype(values.dtype)])
+    return pd.DataFrame(columns, copy=False)
+
+
+def _append_csv(path, rows):
+    with open(path, "rb+") as f:
+        f.seek(0, os.SEEK_END)
+        if f.tell():
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+    rows.to_csv(path, mode="a", header=False, index=False)
+
+
+def append_rows(rows, text=None):
+    # Appends rows shaped like the CSV and publishes a snapshot whose derived
+    # state (index, cube, histograms, inventory and product totals) was updated
+    # from these rows alone. When the current snapshot is the data on disk, the
+    # rows are written to the CSV and the columnar copy too. The CSV gets them
+    # as given (or `text`, the same rows read as strings) in their order; the
+    # in-memory and columnar copies get them conformed to the schema and
+    # grouped by partition, so they extend the layout with ranges of their
+    # own. Returns the snapshot.
+    text = rows if text is None else text
+    rows = cluster(conform(rows.reset_index(drop=True)), PARTITION_BY)
+    with _lock:
+        current = get_dataset()
+        columns = list(current.frame.columns)
+        rows = rows[columns]
+        on_disk = current.version == source_version()
+        columnar = on_disk and columnar_is_current()
+        if on_disk and os.path.exists(DATA_PATH):
+            _append_csv(DATA_PATH, text[columns])
+            version = file_version(DATA_PATH)
+        else:
+            version = f"{current.version}+{len(current.frame) + len(rows):x}"
+        if columnar:
+            manifest = append_columnar(rows, COLUMNAR_PATH, version)
+            frame = read_columnar(COLUMNAR_PATH, manifest=manifest)
+        else:
+            frame = concat_frames(current.frame, rows)
+        dataset = current.extend(frame, version)
+        cells_dir = os.path.join(COLUMNAR_PATH, CUBE_DIR)
+        if columnar and read_manifest(cells_dir) is not None:
+            write_columnar(dataset.cube.cells, cells_dir, version)
+        set_dataset(dataset)
+    return dataset
+
+
+def append_csv(path):
+    # append_rows for a CSV file of new rows, validated as it is read. The CSV
+    # gets each field's text as it appears in `path`.
+    text = pd.read_csv(path, dtype=str, keep_default_na=False)
+    return append_rows(pd.concat(read_chunks(path), ignore_index=True), text)
+
+
+def appended(dataset, version):
+    # The snapshot for `version` when the columnar data on disk is `dataset`
+    # plus appended rows (as written by append_rows in another process), built
+    # from the new rows only; None when the data was rewritten instead.
+    manifest = read_manifest(COLUMNAR_PATH)
+    if manifest is None or manifest["source_version"] != version:
+        return None
+    if {"version": dataset.version, "rows": len(dataset.frame)} not in manifest.get("appends", []):
+        return None
+    return dataset.extend(read_columnar(COLUMNAR_PATH, manifest=manifest), version)
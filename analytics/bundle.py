@@ -0,0 +1,166 @@
+# analytics/bundle.py
+import base64
+import os
+import threading
+
+import numpy as np
+from dash import ClientsideFunction, Input, Output, callback, clientside_callback, dcc
+
+from analytics.histograms import COLORS
+from analytics.lazy import lazy_import
+from analytics.wire import compact_figure, typed_array
+
+pd = lazy_import("pandas")
+
+# CLIENT_FILTERING=1 answers the KPI cards and cube-backed charts in the
+# browser: each page load ships the cube cells rolled up to the page's filters
+# as typed arrays, and a clientside callback (assets/client_filtering.js)
+# recomputes the outputs from them when a dropdown changes. Views of raw rows
+# (scatters, box plots, tables) stay on the server.
+CLIENT_FILTERING = os.environ.get("CLIENT_FILTERING", "0") == "1"
+CLIENT_NAMESPACE = "supplyChain"
+
+
+def cube_callback(bundle_id, *dependencies):
+    # @callback for outputs the bundle can answer. With CLIENT_FILTERING they
+    # are registered as a clientside callback that also reads the `bundle_id`
+    # store; the Python function is returned either way, for tooling that
+    # calls it directly.
+    def decorator(func):
+        if not CLIENT_FILTERING:
+            return callback(*dependencies)(func)
+        outputs = [d for d in dependencies if isinstance(d, Output)]
+        inputs = [d for d in dependencies if not isinstance(d, Output)]
+        clientside_callback(ClientsideFunction(CLIENT_NAMESPACE, "render"), *outputs, Input(bundle_id, "data"), *inputs)
+        return func
+
+    return decorator
+
+
+class ClientView:
+    # The outputs of a page that the browser computes: KPI cards from cube
+    # totals, bar charts from cube groups drawn over their skeletons (see
+    # analytics.figures), histograms from the pre-binned counts. Outputs are
+    # keyed by component id, so one clientside function serves every callback.
+    def __init__(self, dimensions, skeletons=None):
+        self.dimensions = list(dimensions)
+        self.skeletons = skeletons
+        self.outputs = {}
+        self._built = None
+        self._lock = threading.Lock()
+
+    def kpi(self, component_id, plan, total, prefix="", suffix="", decimals=1, grouping=False, scale=1, empty=None):
+        # `empty` is shown instead of NaN when no rows are selected.
+        column, how = plan.totals[total]
+        self.outputs[component_id] = {
+            "kind": "kpi", "measure": column, "how": how, "prefix": prefix, "suffix": suffix,
+            "decimals": decimals, "grouping": grouping, "scale": scale, "empty": empty,
+        }
+        return self
+
+    def bar(self, graph, plan, group, histogram=None, when=None):
+        # `histogram` (a histogram_spec) replaces the bars while the `when`
+        # filter has a selection.
+        keys, columns, how = plan.groups[group]
+        self.outputs[graph] = {"kind": "bar", "measure": columns[0], "how": how, "histogram": histogram, "when": when}
+        return self
+
+    def histogram(self, graph, column, color, title, barmode="relative"):
+        self.outputs[graph] = histogram_spec(column, color, title, barmode)
+        return self
+
+    def store(self, component_id):
+        # The page's dcc.Store, holding the bundle when CLIENT_FILTERING is on.
+        from analytics.data import get_dataset
+
+        return dcc.Store(id=component_id, data=self.bundle(get_dataset()) if CLIENT_FILTERING else None)
+
+    def bundle(self, ds):
+        # Built once per dataset version.
+        with self._lock:
+            built = self._built
+        if built is None or built[0] != ds.version:
+            built = (ds.version, self._build(ds))
+            with self._lock:
+                self._built = built
+        return built[1]
+
+    def _build(self, ds):
+        dims = self.dimensions
+        # Cube cells rolled up to the page's filters.
+        cube_cells = ds.cube.cells
+        cell = cube_cells.groupby(dims, observed=True, sort=False).ngroup().to_numpy()
+        n_cells = int(cell.max()) + 1
+        page_cells = cube_cells[dims].iloc[np.unique(cell, return_index=True)[1]]
+        labels = {d: [str(v) for v in page_cells[d].cat.categories] for d in dims}
+        bundle = {
+            "version": ds.version,
+            "filters": dims,
+            "labels": labels,
+            "cells": {d: typed_array(page_cells[d].cat.codes.to_numpy()) for d in dims},
+            "measures": {},
+            "histograms": {},
+            "outputs": {},
+        }
+
+        bars = self.skeletons(ds) if self.skeletons is not None else {}
+        for component_id, spec in self.outputs.items():
+            spec = dict(spec)
+            if spec["kind"] == "bar":
+                skeleton = bars[component_id]
+                # The browser fills in each trace's x/y.
+                figure = compact_figure(skeleton.figure)
+                figure["data"] = [dict(trace, x=[], y=[]) for trace in figure["data"]]
+                spec["figure"] = figure
+                spec["x"], spec["color"] = skeleton.x, skeleton.color
+                spec["traces"] = [labels[skeleton.color].index(name) for name in skeleton.names]
+            if spec["kind"] == "histogram":
+                spec["layout"] = self._histogram_layout(ds, spec)
+            elif spec.get("histogram"):
+                spec["histogram"] = dict(spec["histogram"], layout=self._histogram_layout(ds, spec["histogram"]))
+            hist = spec if spec["kind"] == "histogram" else spec.get("histogram")
+            if hist:
+                bundle["histograms"].setdefault(hist["column"], None)
+            if "measure" in spec:
+                bundle["measures"].setdefault(spec["measure"], None)
+            bundle["outputs"][component_id] = spec
+
+        for measure in bundle["measures"]:
+            sums = np.bincount(cell, cube_cells[f"{measure}|sum"].to_numpy(np.float64), n_cells)
+            counts = np.bincount(cell, cube_cells[f"{measure}|count"].to_numpy(np.float64), n_cells)
+            # Sums unrounded, so the cards format exactly like the server's.
+            bundle["measures"][measure] = {
+                "sum": {"dtype": "f8", "bdata": base64.b64encode(sums.tobytes()).decode("ascii")},
+                "count": typed_array(counts),
+            }
+        if bundle["histograms"]:
+            # Histogram cells mapped onto the same rolled-up cells.
+            hist_cells = ds.histograms.cells
+            rolled = pd.MultiIndex.from_frame(page_cells.astype(str))
+            hist_cell = rolled.get_indexer(pd.MultiIndex.from_frame(hist_cells[dims].astype(str)))
+        for column in bundle["histograms"]:
+            counts = ds.histograms.counts[column]
+            per_cell = np.zeros((n_cells, counts.shape[1]), dtype=np.int64)
+            np.add.at(per_cell, hist_cell[hist_cell >= 0], counts[hist_cell >= 0])
+            entry = {"counts": typed_array(per_cell.ravel()), "bins": counts.shape[1], "colors": list(COLORS)}
+            if column in ds.histograms.labels:
+                entry["labels"] = [str(v) for v in ds.histograms.labels[column]]
+            else:
+                edges = ds.histograms.edges[column]
+                entry["x"] = typed_array((edges[:-1] + edges[1:]) / 2)
+                entry["width"] = typed_array(np.diff(edges))
+            bundle["histograms"][column] = entry
+        return bundle
+
+    def _histogram_layout(self, ds, hist):
+        # Layout of the server's histogram figure, so both modes draw the same.
+        figure = ds.histograms.figure(
+            hist["column"], {}, color=hist["color"], title=hist["title"], barmode=hist["barmode"],
+        )
+        return compact_figure(figure)["layout"]
+
+
+def histogram_spec(column, color, title, barmode="relative"):
+    # A histogram of pre-binned counts with one trace per value of `color`,
+    # drawn like HistogramIndex.figure.
+    return {"kind": "histogram", "column": column, "color": color, "title": title, "barmode": barmode}
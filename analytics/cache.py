@@ -0,0 +1,301 @@
+# analytics/cache.py
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache, wraps
+
+from dash import Patch
+
+from analytics.data import BASE_DIR, get_version, on_swap
+from analytics.wire import COMPACT
+
+PRECOMPUTED_DIR = os.environ.get(
+    "PRECOMPUTED_DIR", os.path.join(BASE_DIR, "data", "processed", "precomputed")
+)
+
+
+def canonical(value):
+    # None and [] both mean "no filter", and the order values were picked in
+    # does not change the result.
+    if value is None:
+        return ()
+    if isinstance(value, (list, tuple, set)):
+        return tuple(sorted(str(v) for v in value))
+    if isinstance(value, dict):
+        return tuple(sorted((k, canonical(v)) for k, v in value.items()))
+    return value
+
+
+@lru_cache(maxsize=None)
+def defaults(func):
+    # Default value of each parameter of `func` (None where it has none).
+    return tuple(
+        None if p.default is inspect.Parameter.empty else p.default
+        for p in inspect.signature(func).parameters.values()
+    )
+
+
+def plain(value):
+    # Figures are stored as their plain dict form: Dash accepts it as-is and it
+    # unpickles without re-running Plotly's property validation.
+    if isinstance(value, tuple):
+        return tuple(plain(v) for v in value)
+    if isinstance(value, Patch):
+        return value.to_plotly_json()
+    if hasattr(value, "to_plotly_json") and hasattr(value, "to_dict"):
+        return value.to_dict()
+    return value
+
+
+class MemoryBackend:
+    # Per-process LRU dict.
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            expires, value = entry
+            if expires is not None and expires < time.time():
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, value
+
+    def set(self, key, value, ttl=None):
+        expires = time.time() + ttl if ttl else None
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+class DiskBackend:
+    # One pickle per entry in a local directory, so every gunicorn worker on the
+    # box shares the same entries. File mtime doubles as the LRU clock.
+    def __init__(self, directory, maxsize=256):
+        self.directory = directory
+        self.maxsize = maxsize
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        digest = hashlib.sha1(repr(key).encode()).hexdigest()
+        return os.path.join(self.directory, f"{digest}.pkl")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                expires, value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return False, None
+        if expires is not None and expires < time.time():
+            self._remove(path)
+            return False, None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return True, value
+
+    def set(self, key, value, ttl=None):
+        expires = time.time() + ttl if ttl else None
+        path = self._path(key)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump((expires, value), f, protocol=pickle.HIGHEST_PROTOCOL)
+        # Atomic rename: readers in other workers never see a partial file.
+        os.replace(tmp, path)
+        self._evict()
+
+    def _entries(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".pkl"):
+                try:
+                    entries.append((entry.stat().st_mtime, entry.path))
+                except OSError:
+                    pass
+        return entries
+
+    def _evict(self):
+        entries = self._entries()
+        if len(entries) <= self.maxsize:
+            return
+        entries.sort()
+        for _, path in entries[:len(entries) - self.maxsize]:
+            self._remove(path)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def clear(self):
+        for _, path in self._entries():
+            self._remove(path)
+
+    def __len__(self):
+        return len(self._entries())
+
+
+class PrecomputedStore:
+    # Callback outputs written ahead of time by scripts/precompute.py, one JSON
+    # file per key in a sub-directory per dataset version. Entries never
+    # expire; a new data version simply uses a new sub-directory.
+    def __init__(self, directory):
+        self.directory = directory
+
+    def path(self, key):
+        digest = hashlib.sha1(repr(key).encode()).hexdigest()
+        return os.path.join(self.directory, key[2], f"{digest}.json")
+
+    def get(self, key):
+        try:
+            with open(self.path(key)) as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(stored, dict):
+            return None  # written before single outputs were stored as such
+        if "outputs" in stored:
+            return tuple(stored["outputs"])
+        return stored["output"]
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def put(self, key, text):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            f.write(text)
+        os.replace(tmp, path)
+
+    def prune(self, keep_version):
+        # Drop the outputs of every other data version.
+        if not os.path.isdir(self.directory):
+            return
+        for entry in os.scandir(self.directory):
+            if entry.is_dir() and entry.name != keep_version:
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+
+class CallbackCache:
+    def __init__(self, backend, ttl=None, precomputed=None):
+        self.backend = backend
+        self.ttl = ttl
+        self.precomputed = precomputed
+        self.hits = 0
+        self.misses = 0
+        self.precomputed_hits = 0
+        # Workers serve callbacks on several threads.
+        self._counter_lock = threading.Lock()
+
+    def _count(self, counter):
+        with self._counter_lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def key(self, func, args):
+        # Compact and plain figures are different outputs for the same args.
+        # Omitted trailing arguments (callers passing only the filters) take
+        # their defaults, so they share entries with what Dash sends.
+        args = tuple(args) + defaults(func)[len(args):]
+        return (func.__module__, func.__qualname__, get_version(), tuple(canonical(a) for a in args), COMPACT)
+
+    def memoize(self, func):
+        # Wraps a callback so a repeated filter selection returns the stored
+        # outputs without touching pandas or building figures. Precomputed
+        # outputs are checked first, then the LRU backend.
+        if self.backend is None and self.precomputed is None:
+            return func
+
+        @wraps(func)
+        def wrapper(*args):
+            key = self.key(func, args)
+            if self.precomputed is not None:
+                value = self.precomputed.get(key)
+                if value is not None:
+                    self._count("precomputed_hits")
+                    return value
+            if self.backend is None:
+                return func(*args)
+            hit, value = self.backend.get(key)
+            if hit:
+                self._count("hits")
+                return value
+            self._count("misses")
+            value = plain(func(*args))
+            self.backend.set(key, value, self.ttl)
+            return value
+
+        return wrapper
+
+    def clear(self):
+        if self.backend is not None:
+            self.backend.clear()
+
+    def stats(self):
+        with self._counter_lock:
+            hits, misses, precomputed_hits = self.hits, self.misses, self.precomputed_hits
+        total = hits + misses
+        return {
+            "backend": type(self.backend).__name__ if self.backend is not None else None,
+            "entries": len(self.backend) if self.backend is not None else 0,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / total if total else 0.0,
+            "precomputed_hits": precomputed_hits,
+        }
+
+
+def cache_from_env():
+    # CACHE_BACKEND=memory|disk|off, CACHE_SIZE entries, CACHE_TTL seconds;
+    # PRECOMPUTED=0 ignores the outputs written by scripts/precompute.py.
+    backend = os.environ.get("CACHE_BACKEND", "memory").lower()
+    maxsize = int(os.environ.get("CACHE_SIZE", "256"))
+    ttl = float(os.environ.get("CACHE_TTL", "600")) or None
+    precomputed = None
+    if os.environ.get("PRECOMPUTED", "1") != "0":
+        precomputed = PrecomputedStore(PRECOMPUTED_DIR)
+    if backend == "off":
+        return CallbackCache(None, precomputed=precomputed)
+    if backend == "disk":
+        directory = os.environ.get(
+            "CACHE_DIR", os.path.join(tempfile.gettempdir(), "supply-chain-cache")
+        )
+        return CallbackCache(DiskBackend(directory, maxsize), ttl, precomputed)
+    return CallbackCache(MemoryBackend(maxsize), ttl, precomputed)
+
+
+callback_cache = cache_from_env()
+memoize = callback_cache.memoize
+
+
+@on_swap
+def _invalidate(dataset):
+    # Entries are keyed on the version, so this only frees the space early.
+    callback_cache.clear()
@@ -0,0 +1,348 @@
+# analytics/columnar.py
+import json
+import os
+import re
+import shutil
+import tempfile
+
+import numpy as np
+
+from analytics.lazy import lazy_import
+from analytics.partitions import MAX_RANGES, Partitions, cluster
+
+pd = lazy_import("pandas")
+
+FORMAT_VERSION = 1
+MANIFEST = "manifest.json"
+# Partition of each row, in arrival order, while a partitioned dataset is written.
+PARTITION_IDS = "partition_ids.bin"
+
+
+def file_version(path):
+    # Cheap content identity for a file: modification time and size.
+    stat = os.stat(path)
+    return f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+
+
+def _file_name(i, column):
+    return f"{i:02d}_{re.sub(r'[^A-Za-z0-9]+', '_', column).strip('_').lower()}.bin"
+
+
+def read_manifest(directory):
+    try:
+        with open(os.path.join(directory, MANIFEST)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("format") != FORMAT_VERSION:
+        return None
+    return manifest
+
+
+# Categorical codes are rewritten in blocks of this many rows when a streamed
+# dataset is finished, so memory stays bounded however large it is.
+REMAP_BLOCK_ROWS = 1 << 20
+
+
+def code_dtype(n_categories):
+    # Smallest signed integer type holding codes 0..n-1 and -1 for missing.
+    return np.dtype(np.min_scalar_type(-max(n_categories, 1))).newbyteorder("<")
+
+
+def _recode(path, rows, dtype, remap, new_dtype):
+    # Rewrites a code file as remap[code] in `new_dtype`, block by block. Code
+    # -1 maps through remap[-1].
+    codes = np.memmap(path, dtype=dtype, mode="r", shape=(rows,)) if rows else np.empty(0, dtype)
+    with open(path + ".tmp", "wb") as f:
+        for start in range(0, rows, REMAP_BLOCK_ROWS):
+            remap[codes[start:start + REMAP_BLOCK_ROWS]].astype(new_dtype).tofile(f)
+    del codes
+    os.replace(path + ".tmp", path)
+
+
+def write_columnar(df, directory, source_version=None):
+    # One raw little-endian array per column plus a JSON manifest. Categoricals
+    # are written as their integer codes; the dictionary lives in the manifest.
+    with ColumnarWriter(directory, source_version) as writer:
+        writer.append(df)
+    return writer.manifest
+
+
+class ColumnarWriter:
+    # Builds a columnar dataset one chunk at a time. Each chunk's columns are
+    # appended to the column files; categorical codes are mapped into a growing
+    # dictionary per column. With `partition_by` the rows are regrouped by
+    # those columns when the writer finishes, and the manifest lists the
+    # partitions (see analytics.partitions). The finished directory replaces
+    # `directory` when the writer is closed, or is discarded if an exception
+    # escapes the block:
+    #   with ColumnarWriter(out, version, sort_categories=True) as writer:
+    #       for chunk in chunks:
+    #           writer.append(chunk)
+    def __init__(self, directory, source_version=None, sort_categories=False, partition_by=None):
+        self.directory = directory
+        self.source_version = source_version
+        self.sort_categories = sort_categories
+        self.partition_by = list(partition_by or [])
+        parent = os.path.dirname(os.path.abspath(directory))
+        os.makedirs(parent, exist_ok=True)
+        self.staging = tempfile.mkdtemp(dir=parent, prefix=".columnar-")
+        self.rows = 0
+        self.columns = None
+        self.manifest = None
+        self._dictionaries = {}
+        self._partition_ids = {}
+
+    def append(self, df):
+        if self.columns is None:
+            self.columns = [self._entry(i, column, df[column]) for i, column in enumerate(df.columns)]
+        elif list(df.columns) != [entry["name"] for entry in self.columns]:
+            raise TypeError("chunk columns differ from the first chunk")
+        keys = {}
+        for entry in self.columns:
+            series = df[entry["name"]]
+            if entry["kind"] == "category":
+                if not isinstance(series.dtype, pd.CategoricalDtype):
+                    raise TypeError(f"column {entry['name']!r} must be categorical in every chunk")
+                dictionary = self._dictionaries[entry["name"]]
+                lookup = np.array(
+                    [dictionary.setdefault(v, len(dictionary)) for v in series.cat.categories] + [-1],
+                    dtype="<i4",
+                )
+                # Code -1 (missing) indexes the trailing -1.
+                values = lookup[series.cat.codes.to_numpy()]
+                if entry["name"] in self.partition_by:
+                    keys[entry["name"]] = values
+            else:
+                values = series.to_numpy()
+                if values.dtype.newbyteorder("<") != np.dtype(entry["dtype"]):
+                    raise TypeError(f"column {entry['name']!r} is {values.dtype} here, {entry['dtype']} before")
+                values = np.ascontiguousarray(values, dtype=entry["dtype"])
+            with open(os.path.join(self.staging, entry["file"]), "ab") as f:
+                values.tofile(f)
+        if self.partition_by:
+            self._append_partition_ids(keys, len(df))
+        self.rows += len(df)
+
+    def _append_partition_ids(self, keys, rows):
+        missing = [column for column in self.partition_by if column not in keys]
+        if missing:
+            raise TypeError(f"partition columns {missing} must be categorical")
+        stacked = np.stack([keys[column] for column in self.partition_by], axis=1).reshape(rows, -1)
+        unique, inverse = np.unique(stacked, axis=0, return_inverse=True)
+        ids = np.array(
+            [self._partition_ids.setdefault(tuple(key), len(self._partition_ids)) for key in unique.tolist()],
+            dtype="<i4",
+        )
+        with open(os.path.join(self.staging, PARTITION_IDS), "ab") as f:
+            ids[inverse.reshape(-1)].tofile(f)
+
+    def _entry(self, i, column, series):
+        entry = {"name": column, "file": _file_name(i, column)}
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            entry.update(kind="category", dtype="<i4")
+            self._dictionaries[column] = {}
+        else:
+            if series.dtype == object:
+                raise TypeError(f"column {column!r} must be numeric or categorical")
+            entry.update(kind="numeric", dtype=series.dtype.newbyteorder("<").str)
+        return entry
+
+    def finish(self):
+        # Writes the manifest, first narrowing each categorical column's codes
+        # to the smallest integer type (and sorting its dictionary if asked).
+        if self.columns is None:
+            raise ValueError("no chunks were appended")
+        for entry in self.columns:
+            if entry["kind"] == "category":
+                self._finish_categories(entry)
+        self.manifest = {
+            "format": FORMAT_VERSION,
+            "rows": self.rows,
+            "source_version": self.source_version,
+            "columns": self.columns,
+        }
+        if self.partition_by:
+            starts = self._cluster()
+            frame = read_columnar(self.staging, manifest=self.manifest)
+            partitions = Partitions.of(frame, self.partition_by, starts=starts)
+            del frame
+            if partitions is not None:
+                self.manifest["partition_by"] = self.partition_by
+                self.manifest["partitions"] = partitions.entries()
+        with open(os.path.join(self.staging, MANIFEST), "w") as f:
+            json.dump(self.manifest, f, indent=2)
+        return self.manifest
+
+    def _finish_categories(self, entry):
+        categories = list(self._dictionaries[entry["name"]])
+        remap = np.arange(len(categories) + 1)
+        if self.sort_categories:
+            order = sorted(range(len(categories)), key=categories.__getitem__)
+            categories = [categories[i] for i in order]
+            remap[order] = np.arange(len(order))
+        remap[-1] = -1
+        dtype = code_dtype(len(categories))
+        _recode(os.path.join(self.staging, entry["file"]), self.rows, "<i4", remap, dtype)
+        entry.update(dtype=dtype.str, categories=categories)
+
+    def _cluster(self):
+        # Rewrites every column file with its rows grouped by partition, in
+        # order of the partition keys, block by block so memory stays bounded.
+        # Rows keep their order within a partition. Returns the partitions'
+        # first rows.
+        path = os.path.join(self.staging, PARTITION_IDS)
+        rows = self.rows
+        ids = np.memmap(path, dtype="<i4", mode="r", shape=(rows,)) if rows else np.empty(0, "<i4")
+        labels = {column: list(self._dictionaries[column]) for column in self.partition_by}
+        keys = list(self._partition_ids)
+
+        def sort_key(i):
+            # Missing keys first, as cluster() orders them.
+            return [(code >= 0, str(labels[column][code]) if code >= 0 else "")
+                    for column, code in zip(self.partition_by, keys[i])]
+
+        rank = np.empty(len(keys), dtype=np.int64)
+        rank[sorted(range(len(keys)), key=sort_key)] = np.arange(len(keys))
+        counts = np.zeros(len(keys), dtype=np.int64)
+        for start in range(0, rows, REMAP_BLOCK_ROWS):
+            counts += np.bincount(rank[ids[start:start + REMAP_BLOCK_ROWS]], minlength=len(keys))
+        cursor = np.cumsum(counts) - counts
+        starts = cursor.copy()
+
+        files = [os.path.join(self.staging, entry["file"]) for entry in self.columns]
+        dtypes = [np.dtype(entry["dtype"]) for entry in self.columns]
+        if rows:
+            sources = [np.memmap(f, dtype=d, mode="r", shape=(rows,)) for f, d in zip(files, dtypes)]
+            targets = [np.memmap(f + ".tmp", dtype=d, mode="w+", shape=(rows,)) for f, d in zip(files, dtypes)]
+            for start in range(0, rows, REMAP_BLOCK_ROWS):
+                part = rank[ids[start:start + REMAP_BLOCK_ROWS]]
+                order = np.argsort(part, kind="stable")
+                in_block = np.bincount(part, minlength=len(keys))
+                first = np.cumsum(in_block) - in_block
+                dest = np.empty(len(part), dtype=np.int64)
+                dest[order] = cursor[part[order]] + np.arange(len(part)) - first[part[order]]
+                cursor += in_block
+                for source, target in zip(sources, targets):
+                    target[dest] = source[start:start + len(part)]
+            for target in targets:
+                target.flush()
+            del sources, targets
+            for f in files:
+                os.replace(f + ".tmp", f)
+        del ids
+        os.remove(path)
+        return starts[counts > 0]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            shutil.rmtree(self.staging, ignore_errors=True)
+            return False
+        if self.manifest is None:
+            self.finish()
+        _replace_dir(self.staging, self.directory)
+        return False
+
+
+def append_columnar(df, directory, source_version=None, history=16):
+    # Appends rows to an existing columnar dataset in place. Column files grow,
+    # new categorical values join the end of their dictionary so existing codes
+    # stay valid, and the manifest is replaced last: readers see either the old
+    # or the new row count. The manifest remembers the last `history` versions
+    # it grew from, so other processes can tell an append from a rewrite. In a
+    # partitioned dataset the new rows are grouped by partition and listed as
+    # ranges of their own.
+    manifest = read_manifest(directory)
+    if manifest is None:
+        raise FileNotFoundError(f"no columnar dataset in {directory}")
+    if list(df.columns) != [entry["name"] for entry in manifest["columns"]]:
+        raise TypeError("appended columns differ from the dataset's")
+    rows = manifest["rows"]
+    if "partition_by" in manifest:
+        df = cluster(df, manifest["partition_by"])
+    for entry in manifest["columns"]:
+        path = os.path.join(directory, entry["file"])
+        series = df[entry["name"]]
+        dtype = np.dtype(entry["dtype"])
+        if entry["kind"] == "category":
+            if not isinstance(series.dtype, pd.CategoricalDtype):
+                series = series.astype("category")
+            lookup = {value: code for code, value in enumerate(entry["categories"])}
+            remap = np.array([lookup.setdefault(v, len(lookup)) for v in series.cat.categories] + [-1])
+            values = remap[series.cat.codes.to_numpy()]
+            entry["categories"] = list(lookup)
+            wider = code_dtype(len(lookup))
+            if wider.itemsize > dtype.itemsize:
+                # Rare: the dictionary outgrew its code width.
+                _recode(path, rows, dtype, np.append(np.arange(len(lookup)), -1), wider)
+                dtype = wider
+                entry["dtype"] = dtype.str
+            values = values.astype(dtype)
+        else:
+            values = series.to_numpy()
+            if not np.can_cast(values.dtype, dtype, casting="same_kind"):
+                raise TypeError(f"column {entry['name']!r} is {values.dtype}, expected {dtype}")
+            values = np.ascontiguousarray(values, dtype=dtype)
+        with open(path, "r+b") as f:
+            # Drop anything a failed earlier append left past the last row.
+            f.truncate(rows * dtype.itemsize)
+            f.seek(0, os.SEEK_END)
+            values.tofile(f)
+    manifest["appends"] = (manifest.get("appends", []) + [{"version": manifest["source_version"], "rows": rows}])[-history:]
+    manifest["rows"] = rows + len(df)
+    manifest["source_version"] = source_version
+    if "partition_by" in manifest:
+        frame = read_columnar(directory, manifest=manifest)
+        more = Partitions.of(frame, manifest["partition_by"], start=rows)
+        del frame
+        if more is not None and len(manifest["partitions"]) + len(more.starts) <= MAX_RANGES:
+            manifest["partitions"] += more.entries()
+        else:
+            # Readers find the partitions from the rows again.
+            del manifest["partition_by"], manifest["partitions"]
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, os.path.join(directory, MANIFEST))
+    return manifest
+
+
+def _replace_dir(staging, directory):
+    # Swap the finished directory into place. Readers that still have the old
+    # files mapped keep them until they unmap.
+    retired = None
+    if os.path.exists(directory):
+        retired = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(directory)), prefix=".retired-")
+        os.rmdir(retired)
+        os.rename(directory, retired)
+    os.rename(staging, directory)
+    if retired:
+        shutil.rmtree(retired, ignore_errors=True)
+
+
+def read_columnar(directory, mmap=True, manifest=None):
+    # Frame backed by read-only memory maps: nothing is parsed and the pages are
+    # shared through the OS page cache by every process that maps them. Pass a
+    # manifest read earlier to get exactly the rows it describes.
+    manifest = manifest or read_manifest(directory)
+    if manifest is None:
+        raise FileNotFoundError(f"no columnar dataset in {directory}")
+    rows = manifest["rows"]
+    data = {}
+    for entry in manifest["columns"]:
+        path = os.path.join(directory, entry["file"])
+        dtype = np.dtype(entry["dtype"])
+        if mmap and rows:
+            # Plain ndarray view so slices and reductions don't carry the memmap subclass.
+            values = np.memmap(path, dtype=dtype, mode="r", shape=(rows,)).view(np.ndarray)
+        else:
+            values = np.fromfile(path, dtype=dtype, count=rows)
+        if entry["kind"] == "category":
+            values = pd.Categorical.from_codes(
+                values, dtype=pd.CategoricalDtype(entry["categories"]), validate=False
+            )
+        data[entry["name"]] = values
+    return pd.DataFrame(data, copy=False)
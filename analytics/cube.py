@@ -0,0 +1,87 @@
+# analytics/cube.py
+import numpy as np
+
+from analytics.filters import FILTER_COLUMNS
+from analytics.lazy import lazy_import
+from analytics.planner import AggregationPlan
+from analytics.schema import NUMERIC_DTYPES
+
+pd = lazy_import("pandas")
+
+# Share of "Pass" inspections, stored as a 0/1 measure so the pass rate rolls up
+# like any other mean.
+PASS_MEASURE = "Inspection pass"
+CUBE_MEASURES = list(NUMERIC_DTYPES) + [PASS_MEASURE]
+STATS = ["sum", "count", "min", "max"]
+# How each statistic combines when two sets of cells are merged.
+MERGE = {"sum": "sum", "count": "sum", "min": "min", "max": "max"}
+
+
+def merge_cells(cells, more):
+    # Combines two sets of cells over the same dimensions. Dimensions are
+    # merged as plain values since each side may have its own categories.
+    dims = [c for c in more.columns if "|" not in c]
+    more = more.astype({d: object for d in dims})
+    if cells is None:
+        return more
+    merged = pd.concat([cells.astype({d: object for d in dims}), more], ignore_index=True)
+    how = {c: MERGE[c.rsplit("|", 1)[1]] for c in merged.columns if "|" in c}
+    return merged.groupby(dims, dropna=False, sort=False, as_index=False).agg(how)
+
+
+class Cube:
+    # sum/count/min/max of every measure for each observed combination of the
+    # filter dimensions. KPIs and grouped bars roll these cells up instead of
+    # touching the raw rows.
+    def __init__(self, df, dimensions=FILTER_COLUMNS, measures=CUBE_MEASURES):
+        self.dimensions = list(dimensions)
+        self.measures = list(measures)
+        frame = df[self.dimensions + [m for m in self.measures if m != PASS_MEASURE]]
+        if PASS_MEASURE in self.measures:
+            frame = frame.assign(**{PASS_MEASURE: df["Inspection results"].eq("Pass").astype("int8")})
+        plan = AggregationPlan()
+        for stat in STATS:
+            plan.group(stat, self.dimensions, self.measures, stat)
+        built = plan.run(frame)
+        cells = built["sum"][self.dimensions].copy()
+        for measure in self.measures:
+            for stat in STATS:
+                cells[f"{measure}|{stat}"] = built[stat][measure].to_numpy()
+        self.cells = cells
+
+    @classmethod
+    def from_cells(cls, cells, dimensions=FILTER_COLUMNS, measures=CUBE_MEASURES):
+        # A cube whose cells were built elsewhere, e.g. merged chunk by chunk
+        # during streaming ingest.
+        cube = cls.__new__(cls)
+        cube.dimensions = list(dimensions)
+        cube.measures = list(measures)
+        cube.cells = cells
+        return cube
+
+    def extend(self, df, start):
+        # Cube of `df` whose first `start` rows are the ones summarized here:
+        # only the new rows are aggregated, then merged cell by cell.
+        more = Cube(df.iloc[start:], self.dimensions, self.measures).cells
+        cells = merge_cells(self.cells, more).astype({d: df[d].dtype for d in self.dimensions})
+        return Cube.from_cells(cells, self.dimensions, self.measures)
+
+    def select(self, selections=None):
+        cells = self.cells
+        mask = np.ones(len(cells), dtype=bool)
+        for col, values in (selections or {}).items():
+            if values:
+                mask &= cells[col].isin(values).to_numpy()
+        return cells[mask]
+
+    def run(self, plan, selections=None):
+        # Every total and group of `plan` over the selected cells, in one pass.
+        return plan.run(self.select(selections), cells=True)
+
+    def total(self, selections, measure, how):
+        # Single value over the selected cells, e.g. total(sel, "Price", "mean").
+        return self.run(AggregationPlan().total("value", measure, how), selections)["value"]
+
+    def group(self, selections, by, measure, how):
+        # Same shape as df.groupby(by, as_index=False, observed=True)[measure].agg(how).
+        return self.run(AggregationPlan().group("value", by, measure, how), selections)["value"]
@@ -0,0 +1,177 @@
+# analytics/data.py
+import os
+import threading
+from functools import cached_property
+
+from analytics.columnar import file_version, read_columnar, read_manifest
+from analytics.cube import Cube
+from analytics.filters import FilterIndex
+from analytics.histograms import HistogramIndex
+from analytics.ingest import CUBE_DIR
+from analytics.inventory import InventoryAnalytics
+from analytics.lazy import lazy_import
+from analytics.partitions import PARTITION_BY, Partitions, cluster
+from analytics.products import ProductTotals
+from analytics.schema import DTYPES
+from analytics.sketches import QuantileIndex
+
+pd = lazy_import("pandas")
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_PATH = os.environ.get(
+    "SUPPLY_CHAIN_DATA", os.path.join(BASE_DIR, "data", "raw", "supply_chain_data.csv")
+)
+# Written by scripts/ingest.py; memory-mapped instead of parsing the CSV.
+COLUMNAR_PATH = os.environ.get(
+    "SUPPLY_CHAIN_COLUMNAR", os.path.join(BASE_DIR, "data", "processed", "supply_chain")
+)
+
+
+def read_csv(path=DATA_PATH):
+    # Rows grouped by partition, as the columnar copy stores them.
+    return cluster(pd.read_csv(path, dtype=DTYPES))
+
+
+def columnar_is_current(directory=COLUMNAR_PATH, source=DATA_PATH):
+    # The columnar copy is only used while it matches the CSV it was built from.
+    manifest = read_manifest(directory)
+    if manifest is None:
+        return False
+    return not os.path.exists(source) or manifest["source_version"] == file_version(source)
+
+
+def load_data():
+    if columnar_is_current():
+        return read_columnar(COLUMNAR_PATH)
+    return read_csv()
+
+
+def load_dataset(version):
+    # Like load_data, but also reuses the cube cells a streaming ingest wrote
+    # next to the columnar data instead of aggregating every row again.
+    if not columnar_is_current():
+        return Dataset(read_csv(), version)
+    manifest = read_manifest(COLUMNAR_PATH)
+    frame = read_columnar(COLUMNAR_PATH, manifest=manifest)
+    partitions = None
+    if manifest.get("partition_by") == PARTITION_BY and "partitions" in manifest:
+        partitions = Partitions.from_entries(manifest["partitions"], PARTITION_BY, frame)
+    dataset = Dataset(frame, version, partitions)
+    cells_dir = os.path.join(COLUMNAR_PATH, CUBE_DIR)
+    cells_manifest = read_manifest(cells_dir)
+    if cells_manifest is not None and cells_manifest["source_version"] == manifest["source_version"]:
+        dataset.cube = Cube.from_cells(read_columnar(cells_dir, mmap=False, manifest=cells_manifest))
+    return dataset
+
+
+def source_version():
+    # Identifies the data contents on disk; derived state and cached callback
+    # results are keyed on it.
+    if os.path.exists(DATA_PATH):
+        return file_version(DATA_PATH)
+    return read_manifest(COLUMNAR_PATH)["source_version"]
+
+
+# Derived structures of a Dataset; each has extend(frame, start).
+DERIVED = ("index", "cube", "histograms", "inventory", "products", "quantiles")
+
+
+class Dataset:
+    # One immutable snapshot of the data plus everything derived from it.
+    # Callbacks fetch the current snapshot once and use it throughout, so a
+    # reload in the middle of a request cannot mix two versions.
+    def __init__(self, frame, version, partitions=None):
+        self.frame = frame
+        self.version = version
+        # Partitions read from the columnar manifest; found from the rows
+        # otherwise.
+        self._partitions = partitions
+
+    @cached_property
+    def index(self):
+        partitions = self._partitions if self._partitions is not None else Partitions.of(self.frame)
+        return FilterIndex(self.frame, partitions=partitions)
+
+    @cached_property
+    def cube(self):
+        return Cube(self.frame)
+
+    @cached_property
+    def histograms(self):
+        return HistogramIndex(self.frame)
+
+    @cached_property
+    def inventory(self):
+        return InventoryAnalytics(self.frame)
+
+    @cached_property
+    def products(self):
+        return ProductTotals(self.frame)
+
+    @cached_property
+    def quantiles(self):
+        return QuantileIndex(self.frame)
+
+    def warm(self):
+        # Build the derived structures now rather than on the first request.
+        self.index
+        self.cube
+        self.histograms
+        self.inventory
+        self.products
+        self.quantiles
+        return self
+
+    def extend(self, frame, version):
+        # Snapshot of `frame`, which is this snapshot's rows followed by new
+        # ones. Derived structures already built here are updated from the new
+        # rows only; the rest are built lazily as usual.
+        dataset = Dataset(frame, version)
+        start = len(self.frame)
+        for name in DERIVED:
+            if name in self.__dict__:
+                dataset.__dict__[name] = self.__dict__[name].extend(frame, start)
+        return dataset
+
+
+_current = None
+_lock = threading.Lock()
+_swap_listeners = []
+
+
+def get_dataset():
+    global _current
+    if _current is None:
+        with _lock:
+            if _current is None:
+                _current = load_dataset(source_version())
+    return _current
+
+
+def set_dataset(dataset):
+    # Publishing is a single reference assignment; requests already holding the
+    # previous snapshot keep using it.
+    global _current
+    with _lock:
+        _current = dataset
+    for listener in list(_swap_listeners):
+        listener(dataset)
+
+
+def on_swap(listener):
+    _swap_listeners.append(listener)
+    return listener
+
+
+def get_data():
+    return get_dataset().frame
+
+
+def get_version():
+    return get_dataset().version
+
+
+def options(df, column):
+    # Dropdown values for a categorical column, sorted: the rows are stored
+    # grouped by partition, so their first-seen order says nothing.
+    return sorted(df[column].dropna().unique().tolist(), key=str)
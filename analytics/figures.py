@@ -0,0 +1,72 @@
+# analytics/figures.py
+import threading
+
+from dash import Patch
+
+from analytics.lazy import lazy_import
+
+px = lazy_import("plotly.express")
+
+
+class BarSkeleton:
+    # A px.bar figure built once from the unfiltered aggregate, with one trace
+    # per value of `color`. A filter change then only swaps each trace's x/y
+    # arrays (hiding the traces whose value was filtered out) and the title,
+    # either in a copy of the skeleton or as a dash.Patch against the figure
+    # the browser already shows. Colors and legend order stay fixed per value.
+    def __init__(self, frame, x, y, color, title, signature, **kwargs):
+        self.x, self.y, self.color = x, y, color
+        self.signature = signature
+        self.kwargs = kwargs
+        self.figure = px.bar(frame, x=x, y=y, color=color, title=title, **kwargs).to_dict()
+        self.names = [trace["name"] for trace in self.figure["data"]]
+
+    def traces(self, frame):
+        # (x, y) per skeleton trace, or None for values missing from `frame`.
+        groups = {str(name): rows for name, rows in frame.groupby(self.color, sort=False, observed=True)}
+        for name in self.names:
+            rows = groups.get(name)
+            yield None if rows is None else (rows[self.x].tolist(), rows[self.y].to_numpy())
+
+    def full(self, frame, title):
+        data = []
+        for trace, arrays in zip(self.figure["data"], self.traces(frame)):
+            trace = dict(trace)
+            trace["x"], trace["y"] = arrays or ([], [])
+            trace["visible"] = arrays is not None
+            data.append(trace)
+        layout = dict(self.figure["layout"])
+        layout["title"] = dict(layout.get("title", {}), text=title)
+        return {"data": data, "layout": layout}
+
+    def patch(self, frame, title):
+        patch = Patch()
+        for i, arrays in enumerate(self.traces(frame)):
+            x, y = arrays or ([], [])
+            patch["data"][i]["x"] = x
+            patch["data"][i]["y"] = y
+            patch["data"][i]["visible"] = arrays is not None
+        patch["layout"]["title"]["text"] = title
+        return patch
+
+    def render(self, frame, title, sent):
+        # A Patch when `sent` (what this graph was last sent, as reported by
+        # the browser) is this skeleton, the whole figure otherwise.
+        if sent == self.signature:
+            return self.patch(frame, title)
+        return self.full(frame, title)
+
+
+_skeletons = {}
+_lock = threading.Lock()
+
+
+def skeletons(ds, name, build):
+    # build(ds) -> {graph id: skeleton}, built once per dataset version.
+    with _lock:
+        version, built = _skeletons.get(name, (None, None))
+    if version != ds.version:
+        built = build(ds)
+        with _lock:
+            _skeletons[name] = (ds.version, built)
+    return built
@@ -0,0 +1,187 @@
+# analytics/filters.py
+import numpy as np
+
+from analytics.lazy import lazy_import
+
+pd = lazy_import("pandas")
+
+# Every dropdown on the pages filters on one of these columns.
+FILTER_COLUMNS = [
+    "Product type",
+    "Supplier name",
+    "Location",
+    "Shipping carriers",
+    "Transportation modes",
+]
+
+
+class _Segment:
+    # Index over a run of consecutive rows. For each column the row positions
+    # (relative to `start`) are stored grouped by category code (one stable
+    # argsort), so the rows for a value are a contiguous, already sorted slice.
+    def __init__(self, codes, start):
+        self.start = start
+        self.n_rows = len(next(iter(codes.values())))
+        self.codes = codes
+        self.positions = {}
+        self.offsets = {}
+        pos_dtype = np.int32 if self.n_rows < 2**31 else np.int64
+        for col, col_codes in codes.items():
+            counts = np.bincount(col_codes, minlength=1)
+            self.positions[col] = np.argsort(col_codes, kind="stable").astype(pos_dtype)
+            self.offsets[col] = np.concatenate([[0], np.cumsum(counts)])
+
+    @classmethod
+    def of(cls, df, columns, start=0):
+        codes = {}
+        for col in columns:
+            values = df[col]
+            if not isinstance(values.dtype, pd.CategoricalDtype):
+                values = values.astype("category")
+            # Shift by one so missing values (code -1) land in bucket 0.
+            codes[col] = values.cat.codes.to_numpy().astype(np.int64) + 1
+        return cls(codes, start)
+
+    def merge(self, other):
+        # One segment covering this one and the `other` that follows it.
+        return _Segment({col: np.concatenate([self.codes[col], other.codes[col]]) for col in self.codes}, self.start)
+
+    def size(self, col, codes):
+        offsets = self.offsets[col]
+        return sum(offsets[c + 1] - offsets[c] for c in codes if c + 1 < len(offsets))
+
+    def _rows_for_codes(self, col, codes):
+        offsets, positions = self.offsets[col], self.positions[col]
+        codes = [c for c in codes if c + 1 < len(offsets)]
+        if len(codes) == 1:
+            return positions[offsets[codes[0]]:offsets[codes[0] + 1]]
+        if not codes:
+            return positions[:0]
+        # Buckets are disjoint, so the union is a concatenation plus one sort.
+        return np.sort(np.concatenate([positions[offsets[c]:offsets[c + 1]] for c in codes]))
+
+    def select(self, active):
+        # Start from the most selective column, then check the remaining
+        # columns only on the rows that survived.
+        sizes = {col: self.size(col, codes) for col, codes in active.items()}
+        first = min(sizes, key=sizes.get)
+        rows = self._rows_for_codes(first, active[first])
+        for col, codes in active.items():
+            if col == first or not len(rows):
+                continue
+            allowed = np.zeros(len(self.offsets[col]) - 1, dtype=bool)
+            allowed[[c for c in codes if c < len(allowed)]] = True
+            rows = rows[allowed[self.codes[col][rows]]]
+        return rows + self.start if self.start else rows
+
+
+class FilterIndex:
+    # Inverted index over the filter columns. Rows are indexed in segments: the
+    # initial build plus one per append, with neighbouring segments of similar
+    # size merged (like a binary counter) so an append costs O(delta log n)
+    # amortized and a lookup touches only a few segments. With `partitions`
+    # (see analytics.partitions) a selection that prunes them to fewer rows
+    # than its most selective column reads only the ranges left.
+    def __init__(self, df, columns=FILTER_COLUMNS, segments=None, partitions=None):
+        self.columns = list(columns)
+        self.n_rows = len(df)
+        self.partitions = partitions
+        self.lookup = {}
+        for col in self.columns:
+            values = df[col]
+            if not isinstance(values.dtype, pd.CategoricalDtype):
+                values = values.astype("category")
+            categories = values.cat.categories
+            self.lookup[col] = {value: code + 1 for code, value in enumerate(categories)}
+        self.segments = segments if segments is not None else [_Segment.of(df, self.columns)]
+
+    def extend(self, df, start):
+        # Index of `df` whose first `start` rows are the ones indexed here.
+        segments = self.segments + [_Segment.of(df.iloc[start:], self.columns, start)]
+        while len(segments) > 1 and segments[-2].n_rows <= 2 * segments[-1].n_rows:
+            segments[-2:] = [segments[-2].merge(segments[-1])]
+        partitions = self.partitions.extend(df, start) if self.partitions is not None else None
+        return FilterIndex(df, self.columns, segments, partitions)
+
+    def move_arrays(self, copy):
+        # Replaces the arrays of every segment by copy(arrays), which returns
+        # equal arrays stored elsewhere, e.g. in shared memory.
+        for segment in self.segments:
+            tables = (segment.codes, segment.positions, segment.offsets)
+            keys = [(table, col) for table in tables for col in table]
+            for (table, col), values in zip(keys, copy([table[col] for table, col in keys])):
+                table[col] = values
+        return self
+
+    def _value_codes(self, col, values):
+        lookup = self.lookup[col]
+        return [lookup[v] for v in values if v in lookup]
+
+    def select(self, selections):
+        # Row positions matching every non-empty selection, or None when nothing
+        # is selected (meaning all rows).
+        active = {col: self._value_codes(col, values) for col, values in selections.items() if values}
+        if not active:
+            return None
+        if not all(active.values()):
+            return np.empty(0, dtype=self.segments[0].positions[self.columns[0]].dtype)
+        keep = self._pruned(selections, active)
+        if keep is not None:
+            rows = self.partitions.rows(keep)
+            rest = {col: values for col, values in selections.items() if col not in self.partitions.keys}
+            return rows[self.matches(rows, rest)] if any(rest.values()) else rows
+        parts = [segment.select(active) for segment in self.segments]
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    def _pruned(self, selections, active):
+        # The partitions to read for this selection, or None when its most
+        # selective column narrows it down further.
+        if self.partitions is None:
+            return None
+        keep = self.partitions.prune(selections)
+        smallest = min(sum(s.size(col, codes) for s in self.segments) for col, codes in active.items())
+        return keep if self.partitions.count(keep) < smallest else None
+
+    def estimate(self, selections):
+        # Rows expected to match, treating the columns as independent; cheap
+        # enough to choose between query plans.
+        expected = float(self.n_rows)
+        if self.partitions is not None:
+            expected = float(self.partitions.count(self.partitions.prune(selections)))
+        for col, values in selections.items():
+            if values and (self.partitions is None or col not in self.partitions.keys):
+                codes = self._value_codes(col, values)
+                expected *= sum(s.size(col, codes) for s in self.segments) / max(self.n_rows, 1)
+        return expected
+
+    def matches(self, positions, selections):
+        # Boolean mask: which of the row `positions` match every selection.
+        keep = np.ones(len(positions), dtype=bool)
+        active = {col: self._value_codes(col, values) for col, values in selections.items() if values}
+        if not active:
+            return keep
+        starts = np.array([segment.start for segment in self.segments])
+        segment_of = np.searchsorted(starts, positions, side="right") - 1
+        for i, segment in enumerate(self.segments):
+            inside = segment_of == i if len(self.segments) > 1 else slice(None)
+            local = positions[inside] - segment.start
+            for col, codes in active.items():
+                allowed = np.zeros(len(segment.offsets[col]) - 1, dtype=bool)
+                allowed[[c for c in codes if c < len(allowed)]] = True
+                keep[inside] &= allowed[segment.codes[col][local]]
+        return keep
+
+    def filter(self, df, selections):
+        # Frame restricted to the selection. With no selection the shared frame
+        # itself is returned, and a selection of whole partitions that lie next
+        # to each other is a slice of it, so callers must not modify the result
+        # in place.
+        if self.partitions is not None and all(col in self.partitions.keys for col, v in selections.items() if v):
+            keep = self.partitions.prune(selections)
+            span = self.partitions.span(keep) if keep.any() and not keep.all() else None
+            if span is not None:
+                return df.iloc[span[0]:span[1]]
+        rows = self.select(selections)
+        if rows is None:
+            return df
+        return df.take(rows)
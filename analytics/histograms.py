@@ -0,0 +1,164 @@
+# analytics/histograms.py
+import numpy as np
+from plotly.colors import qualitative
+
+from analytics.filters import FILTER_COLUMNS
+from analytics.lazy import lazy_import
+from analytics.planner import cell_keys, group_code
+
+pd = lazy_import("pandas")
+go = lazy_import("plotly.graph_objects")
+
+# Columns the pages draw histograms of, and their bin count (None = choose from
+# the data, capped at MAX_BINS). Categorical columns get one bin per value.
+HISTOGRAM_COLUMNS = {
+    "Revenue generated": 20,
+    "Manufacturing lead time": None,
+    "Manufacturing costs": None,
+    "Inspection results": None,
+}
+MAX_BINS = 50
+COLORS = qualitative.Plotly
+
+
+def bin_edges(values, bins=None):
+    values = values[~np.isnan(values)]
+    if not len(values):
+        return np.array([0.0, 1.0])
+    lo, hi = values.min(), values.max()
+    if hi == lo:
+        return np.array([lo - 0.5, hi + 0.5])
+    if bins is None and np.all(values == np.round(values)) and hi - lo <= MAX_BINS:
+        # Small integer ranges: one bin per integer.
+        return np.arange(lo - 0.5, hi + 1.5)
+    if bins is None:
+        bins = min(len(np.histogram_bin_edges(values, bins="auto")) - 1, MAX_BINS)
+    return np.linspace(lo, hi, bins + 1)
+
+
+def bin_codes(values, edges):
+    # Bin of each value; values outside the edges (e.g. appended later) fall
+    # into the first or last bin.
+    codes = np.searchsorted(edges, values, side="right") - 1
+    return np.clip(codes, 0, len(edges) - 2)
+
+
+class HistogramIndex:
+    # Fixed bin edges per column (set once per dataset) and row counts per
+    # (filter-dimension cell, bin). A filtered histogram sums a few rows of that
+    # table, so neither the server nor the browser ever re-bins raw rows.
+    def __init__(self, df, columns=HISTOGRAM_COLUMNS, dimensions=FILTER_COLUMNS):
+        self.dimensions = list(dimensions)
+        code, _, _ = group_code(df, self.dimensions)
+        observed, cell_of_row = np.unique(code, return_inverse=True)
+        first_row = np.unique(cell_of_row, return_index=True)[1]
+        self.cells = df[self.dimensions].iloc[first_row].reset_index(drop=True)
+        n_cells = len(observed)
+
+        self.edges, self.labels, self.counts = {}, {}, {}
+        for column, bins in columns.items():
+            values = df[column]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                self.labels[column] = values.cat.categories.tolist()
+                codes = values.cat.codes.to_numpy().astype(np.int64)
+                valid = codes >= 0
+                n_bins = len(self.labels[column])
+            else:
+                numeric = values.to_numpy(dtype=np.float64)
+                self.edges[column] = bin_edges(numeric, bins)
+                valid = ~np.isnan(numeric)
+                codes = bin_codes(numeric, self.edges[column])
+                n_bins = len(self.edges[column]) - 1
+            flat = cell_of_row[valid] * n_bins + codes[valid]
+            self.counts[column] = np.bincount(flat, minlength=n_cells * n_bins).reshape(n_cells, n_bins)
+
+    def extend(self, df, start):
+        # Counts for `df` whose first `start` rows are counted here; only the new
+        # rows are binned. Bin edges stay fixed (values outside them land in the
+        # end bins) while new cells and new categories get fresh rows/columns.
+        delta = df.iloc[start:]
+        if not len(delta):
+            return self
+        code, _, _ = group_code(delta, self.dimensions)
+        observed, cell_of_row = np.unique(code, return_inverse=True)
+        first_row = np.unique(cell_of_row, return_index=True)[1]
+        delta_cells = delta[self.dimensions].iloc[first_row].reset_index(drop=True)
+
+        known = {key: i for i, key in enumerate(cell_keys(self.cells, self.dimensions))}
+        cell_ids, added = [], []
+        for i, key in enumerate(cell_keys(delta_cells, self.dimensions)):
+            if key not in known:
+                known[key] = len(self.cells) + len(added)
+                added.append(i)
+            cell_ids.append(known[key])
+        row_cells = np.asarray(cell_ids, dtype=np.int64)[cell_of_row]
+
+        out = HistogramIndex.__new__(HistogramIndex)
+        out.dimensions = self.dimensions
+        out.edges = self.edges
+        out.cells = pd.concat(
+            [self.cells.astype({d: df[d].dtype for d in self.dimensions}), delta_cells.iloc[added]],
+            ignore_index=True,
+        )
+        out.labels, out.counts = {}, {}
+        n_cells = len(out.cells)
+        for column, counts in self.counts.items():
+            values = delta[column]
+            if column in self.labels:
+                out.labels[column] = df[column].cat.categories.tolist()
+                codes = values.cat.codes.to_numpy().astype(np.int64)
+                valid = codes >= 0
+                n_bins = len(out.labels[column])
+            else:
+                numeric = values.to_numpy(dtype=np.float64)
+                valid = ~np.isnan(numeric)
+                codes = bin_codes(numeric, self.edges[column])
+                n_bins = counts.shape[1]
+            flat = row_cells[valid] * n_bins + codes[valid]
+            grown = np.bincount(flat, minlength=n_cells * n_bins).reshape(n_cells, n_bins)
+            grown[:counts.shape[0], :counts.shape[1]] += counts
+            out.counts[column] = grown
+        return out
+
+    def select(self, selections=None):
+        mask = np.ones(len(self.cells), dtype=bool)
+        for col, values in (selections or {}).items():
+            if values:
+                mask &= self.cells[col].isin(values).to_numpy()
+        return mask
+
+    def counts_by(self, column, selections, by):
+        # {value of `by`: counts per bin} over the selected cells.
+        mask = self.select(selections)
+        groups = self.cells[by][mask].astype("category")
+        codes = groups.cat.codes.to_numpy()
+        counts = self.counts[column][mask]
+        out = {}
+        for code, value in enumerate(groups.cat.categories):
+            rows = codes == code
+            if rows.any():
+                out[value] = counts[rows].sum(axis=0)
+        return out
+
+    def figure(self, column, selections, color, title, template="plotly_white", barmode="relative"):
+        # Bar traces of pre-binned counts, one per value of `color`, laid out
+        # like px.histogram(x=column, color=color).
+        fig = go.Figure()
+        for i, (name, counts) in enumerate(self.counts_by(column, selections, color).items()):
+            if column in self.labels:
+                keep = counts > 0
+                x, y, width = np.array(self.labels[column], dtype=object)[keep], counts[keep], None
+            else:
+                edges = self.edges[column]
+                x, y, width = (edges[:-1] + edges[1:]) / 2, counts, np.diff(edges)
+            fig.add_trace(go.Bar(
+                x=x, y=y, width=width, name=str(name), marker_color=COLORS[i % len(COLORS)],
+                hovertemplate=f"{color}={name}<br>{column}=%{{x}}<br>count=%{{y}}<extra></extra>",
+            ))
+        fig.update_layout(
+            title=title, template=template, barmode=barmode, bargap=0 if column not in self.labels else None,
+            legend_title_text=color,
+        )
+        fig.update_xaxes(title_text=column)
+        fig.update_yaxes(title_text="count")
+        return fig
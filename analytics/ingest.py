@@ -0,0 +1,86 @@
+# analytics/ingest.py
+import os
+
+import numpy as np
+
+from analytics.columnar import ColumnarWriter, file_version, write_columnar
+from analytics.cube import Cube, merge_cells
+from analytics.lazy import lazy_import
+from analytics.partitions import PARTITION_BY
+from analytics.schema import CATEGORY_COLUMNS, DTYPES, NUMERIC_DTYPES
+
+pd = lazy_import("pandas")
+
+# Rows parsed per chunk; peak memory is a few chunks' worth whatever the file size.
+CHUNK_ROWS = int(os.environ.get("INGEST_CHUNK_ROWS", "200000"))
+# Sub-directory of the columnar output holding the cube cells built during
+# ingest (and kept current by appends), stamped with the data version.
+CUBE_DIR = "cube"
+
+
+def conform(chunk, first_line=2):
+    # Checks one parsed chunk against the schema and returns it with the
+    # schema's dtypes. Errors name the CSV line (header = line 1).
+    missing = [c for c in DTYPES if c not in chunk.columns]
+    extra = [c for c in chunk.columns if c not in DTYPES]
+    if missing or extra:
+        raise ValueError(f"columns do not match the schema: missing {missing}, unexpected {extra}")
+    columns = {}
+    for column in chunk.columns:
+        values = chunk[column]
+        if column in CATEGORY_COLUMNS:
+            columns[column] = values.astype("category")
+            continue
+        dtype = np.dtype(NUMERIC_DTYPES[column])
+        if values.dtype == object:
+            parsed = pd.to_numeric(values, errors="coerce")
+            bad = np.flatnonzero(parsed.isna().to_numpy() & values.notna().to_numpy())
+            if len(bad):
+                raise ValueError(
+                    f"line {first_line + bad[0]}: {column!r} value {values.iloc[bad[0]]!r} is not numeric"
+                )
+            values = parsed
+        if dtype.kind in "iu":
+            if values.isna().any():
+                line = first_line + np.flatnonzero(values.isna().to_numpy())[0]
+                raise ValueError(f"line {line}: {column!r} is empty but must be an integer")
+            info = np.iinfo(dtype)
+            outside = np.flatnonzero(((values < info.min) | (values > info.max)).to_numpy())
+            if len(outside):
+                raise ValueError(
+                    f"line {first_line + outside[0]}: {column!r} value {values.iloc[outside[0]]} "
+                    f"does not fit {dtype}"
+                )
+        columns[column] = values.astype(dtype)
+    return pd.DataFrame(columns, index=chunk.index)
+
+
+def read_chunks(path, chunk_rows=CHUNK_ROWS):
+    # Validated chunks of the CSV with the schema's dtypes. Numeric columns are
+    # left to the C parser and only re-parsed when a chunk contains bad values.
+    dtype = {column: "category" for column in CATEGORY_COLUMNS}
+    line = 2
+    for chunk in pd.read_csv(path, dtype=dtype, chunksize=chunk_rows):
+        yield conform(chunk, line)
+        line += len(chunk)
+
+
+def ingest(source, directory, chunk_rows=CHUNK_ROWS, progress=None):
+    # Streams `source` into the columnar layout at `directory`, partitioned by
+    # PARTITION_BY, building the cube cells chunk by chunk alongside. Returns
+    # the manifest.
+    cells = None
+    version = file_version(source)
+    with ColumnarWriter(directory, version, sort_categories=True, partition_by=PARTITION_BY) as writer:
+        for chunk in read_chunks(source, chunk_rows):
+            writer.append(chunk)
+            cells = merge_cells(cells, Cube(chunk).cells)
+            if progress is not None:
+                progress(writer.rows)
+        manifest = writer.finish()
+        categories = {c["name"]: c["categories"] for c in manifest["columns"] if c["kind"] == "category"}
+        dims = [c for c in cells.columns if "|" not in c]
+        cells = cells.astype({d: pd.CategoricalDtype(categories[d]) for d in dims})
+        write_columnar(cells.reset_index(drop=True), os.path.join(writer.staging, CUBE_DIR), version)
+    return manifest
+
@@ -0,0 +1,193 @@
+# analytics/inventory.py
+import numpy as np
+
+from analytics.ranks import RankIndex
+from analytics.sketches import SKETCH_MIN_ROWS, KLLSketch
+
+INVENTORY_COLUMNS = ["SKU", "Product type", "Stock levels", "Availability", "Number of products sold"]
+RATIO_COLUMN = "Stock_to_Sales_Ratio"
+# The inventory tables and the order they list rows in unless sorted otherwise.
+TABLE_ORDER = {"overstocked": (RATIO_COLUMN, False), "understocked": ("Number of products sold", False)}
+
+
+def stock_to_sales_ratio(df):
+    # Stock levels / units sold, with 0 wherever the ratio is undefined.
+    stock = df["Stock levels"].to_numpy(dtype=np.float64)
+    sold = df["Number of products sold"].to_numpy(dtype=np.float64)
+    ratio = np.zeros(len(df))
+    np.divide(stock, sold, out=ratio, where=sold != 0)
+    ratio[~np.isfinite(ratio)] = 0
+    return ratio
+
+
+def top_k(values, k, candidates):
+    # Positions from `candidates` (ascending) holding the k largest values, in
+    # descending order. argpartition keeps this O(n); ties at the cut-off go to
+    # the earliest rows so results are deterministic.
+    if k <= 0 or not len(candidates):
+        return candidates[:0]
+    v = values[candidates]
+    if len(candidates) > k:
+        kth = np.partition(v, len(v) - k)[len(v) - k]
+        above = v > kth
+        tied = np.flatnonzero(v == kth)[:k - np.count_nonzero(above)]
+        keep = np.sort(np.concatenate([np.flatnonzero(above), tied]))
+        candidates, v = candidates[keep], v[keep]
+    return candidates[np.lexsort((candidates, -v))]
+
+
+class InventoryAnalytics:
+    # Inventory risk over a frame. Queries only touch the rows of their
+    # selection; for all rows the top-k candidates and the median of units sold
+    # are kept so appends update them from the new rows alone.
+    def __init__(self, df):
+        self.frame = df
+        self.stock = df["Stock levels"].to_numpy()
+        self.sold = df["Number of products sold"].to_numpy()
+        self.availability = df["Availability"].to_numpy()
+        self.sold_sketch = KLLSketch.of(self.sold)
+        # (k, availability_threshold) -> (overstocked, low-availability) candidates over all rows.
+        self._overall = {}
+        self.ranks = RankIndex(df, {RATIO_COLUMN: stock_to_sales_ratio(df)})
+
+    def ratio(self, positions):
+        # Stock levels / units sold of the given rows, 0 where undefined.
+        stock = self.stock[positions].astype(np.float64)
+        sold = self.sold[positions].astype(np.float64)
+        ratio = np.zeros(len(positions))
+        np.divide(stock, sold, out=ratio, where=sold != 0)
+        ratio[~np.isfinite(ratio)] = 0
+        return ratio
+
+    def _top_ratio(self, k, candidates):
+        return candidates[top_k(self.ratio(candidates), k, np.arange(len(candidates)))]
+
+    def _records(self, positions, extra=()):
+        columns = INVENTORY_COLUMNS + [c for c in extra if c not in INVENTORY_COLUMNS]
+        out = self.frame.iloc[positions][columns]
+        return out.assign(**{RATIO_COLUMN: self.ratio(positions)})
+
+    def _candidates(self, rows, k, availability_threshold):
+        # Top k by ratio among rows that sold, and top k by units sold among
+        # rows with low availability. Both merge: the candidates of a union are
+        # among the candidates of its parts.
+        over = self._top_ratio(k, rows[self.sold[rows] > 0])
+        low = top_k(self.sold, k, rows[self.availability[rows] <= availability_threshold])
+        return over, low
+
+    def _issues(self, rows, k, availability_threshold, sales_threshold):
+        sold = self.sold[rows]
+        over = self._top_ratio(k, rows[sold > 0])
+        if sales_threshold is None:
+            sales_threshold = np.median(sold) if len(rows) else 0
+        low = (self.availability[rows] <= availability_threshold) & (sold > sales_threshold)
+        under = top_k(self.sold, k, rows[low])
+        return over, under
+
+    def issues(self, rows=None, k=5, availability_threshold=30, sales_threshold=None, by=None):
+        # Overstocked: highest stock-to-sales ratio among rows that sold.
+        # Understocked: most units sold among rows with low availability and
+        # above-median sales. `rows` are positions from FilterIndex.select
+        # (None = all rows); `by` ranks separately within each value of a column.
+        if rows is None and by is None and sales_threshold is None:
+            key = (k, availability_threshold)
+            if key not in self._overall:
+                self._overall[key] = self._candidates(np.arange(len(self.frame)), k, availability_threshold)
+            over, low = self._overall[key]
+            # The top k low-availability rows by units sold, cut at the median,
+            # are exactly the top k of those above the median.
+            under = low[self.sold[low] > self.sales_threshold()]
+            return self._records(over), self._records(under)
+        if rows is None:
+            rows = np.arange(len(self.frame))
+        if by is None:
+            over, under = self._issues(rows, k, availability_threshold, sales_threshold)
+            return self._records(over), self._records(under)
+
+        keys = self.frame[by].iloc[rows]
+        over, under = [], []
+        for positions in keys.groupby(keys, observed=True).indices.values():
+            o, u = self._issues(rows[positions], k, availability_threshold, sales_threshold)
+            over.append(o)
+            under.append(u)
+        over = np.concatenate(over) if over else rows[:0]
+        under = np.concatenate(under) if under else rows[:0]
+        return self._records(over, [by]), self._records(under, [by])
+
+    def extend(self, df, start):
+        # Analytics for `df` whose first `start` rows are covered here: the
+        # median sketch and the all-rows candidates absorb only the new rows.
+        out = InventoryAnalytics.__new__(InventoryAnalytics)
+        out.frame = df
+        out.stock = df["Stock levels"].to_numpy()
+        out.sold = df["Number of products sold"].to_numpy()
+        out.availability = df["Availability"].to_numpy()
+        out.sold_sketch = self.sold_sketch.merge(KLLSketch.of(out.sold[start:]))
+        out._overall = {}
+        ratio = np.concatenate([self.ranks.keys[RATIO_COLUMN], stock_to_sales_ratio(df.iloc[start:])])
+        out.ranks = self.ranks.extend(df, start, {RATIO_COLUMN: ratio})
+        new_rows = np.arange(start, len(df))
+        for (k, threshold), (over, low) in self._overall.items():
+            more_over, more_low = out._candidates(new_rows, k, threshold)
+            out._overall[k, threshold] = (
+                out._top_ratio(k, np.sort(np.concatenate([over, more_over]))),
+                top_k(out.sold, k, np.sort(np.concatenate([low, more_low]))),
+            )
+        return out
+
+    def sales_threshold(self, rows=None):
+        # Median units sold over `rows` (None = all rows). All rows use the
+        # sketch once there are more than SKETCH_MIN_ROWS, like selections do
+        # (see pages/logistics.py); below that the median is exact.
+        if rows is None:
+            if len(self.sold) > SKETCH_MIN_ROWS:
+                return self.sold_sketch.median()
+            rows = slice(None)
+        sold = self.sold[rows]
+        return np.median(sold) if len(sold) else 0
+
+    def listed(self, table, positions, sales_threshold, availability_threshold=30):
+        # Which of `positions` a table lists: rows that sold for overstocked,
+        # low availability and sales above the threshold for understocked.
+        sold = self.sold[positions]
+        if table == "overstocked":
+            return sold > 0
+        return (self.availability[positions] <= availability_threshold) & (sold > sales_threshold)
+
+    def count(self, table, rows, sales_threshold=None, availability_threshold=30):
+        rows = np.arange(len(self.frame)) if rows is None else rows
+        return int(np.count_nonzero(self.listed(table, rows, sales_threshold, availability_threshold)))
+
+    def page(self, table, index, selections, start, size, sort=None, sales_threshold=None, availability_threshold=30):
+        # One page of an inventory table for a filter selection, in the table's
+        # own order or `sort` = (column, ascending). Broad selections walk the
+        # presorted order until the page is full; narrow ones rank just their
+        # rows, whichever touches fewer rows.
+        column, ascending = sort or TABLE_ORDER[table]
+        expected = index.estimate(selections)
+        if expected * expected >= (start + size) * len(self.frame):
+            def keep(positions):
+                listed = self.listed(table, positions, sales_threshold, availability_threshold)
+                return listed & index.matches(positions, selections)
+
+            positions = self.ranks.page(column, ascending, start, size, keep=keep)
+        else:
+            rows = index.select(selections)
+            positions = self.ranks.page(
+                column, ascending, start, size, rows=rows,
+                keep=lambda p: self.listed(table, p, sales_threshold, availability_threshold),
+            )
+        return self._records(positions)
+
+    def batch(self, index, selections_list, **kwargs):
+        # issues() for many filter selections at once, e.g. to precompute every
+        # combination of the dropdowns.
+        results = []
+        for selections in selections_list:
+            rows = index.select(selections)
+            results.append(self.issues(rows, **kwargs))
+        return results
+
+
+def identify_inventory_issues(df, availability_threshold=30, k=5):
+    return InventoryAnalytics(df).issues(k=k, availability_threshold=availability_threshold)
@@ -0,0 +1,74 @@
+# analytics/lazy.py
+import importlib
+import os
+import sys
+import threading
+
+# LAZY_STARTUP=1 lets a worker serve as soon as Dash has registered the pages:
+# pandas and plotly.express are imported on first use, and a background thread
+# imports them, loads the data and renders each page's default view meanwhile.
+LAZY_STARTUP = os.environ.get("LAZY_STARTUP", "0") == "1"
+
+
+class LazyModule:
+    # Stands in for a module imported at the top of a file; the real import
+    # happens on first attribute access. Python's import lock makes concurrent
+    # first accesses wait for one import.
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+    def __repr__(self):
+        return f"<lazy module {self._name!r}>"
+
+
+def lazy_import(name):
+    # The module itself unless LAZY_STARTUP is on and it isn't imported yet.
+    if not LAZY_STARTUP or name in sys.modules:
+        return importlib.import_module(name)
+    return LazyModule(name)
+
+
+# Deferred modules the warmup thread imports first. plotly.graph_objects is not
+# among them: dash.dcc.Graph imports it with Dash.
+HEAVY_MODULES = ["pandas", "plotly.express"]
+
+_ready = threading.Event()
+_warmup_pid = None
+_warmup_lock = threading.Lock()
+
+
+def _warm(default_views):
+    try:
+        for name in HEAVY_MODULES:
+            importlib.import_module(name)
+        from analytics.data import get_dataset
+
+        get_dataset().warm()
+        for func, n_args in default_views():
+            func(*[None] * n_args)
+    finally:
+        _ready.set()
+
+
+def ensure_warmup(default_views=lambda: ()):
+    # Starts the warmup thread once per process (threads don't survive fork).
+    # `default_views` returns (callback, number of arguments) pairs rendered
+    # with no filter, so the first page view is a cache hit.
+    global _warmup_pid
+    if _warmup_pid == os.getpid():
+        return
+    with _warmup_lock:
+        if _warmup_pid != os.getpid():
+            _ready.clear()
+            threading.Thread(target=_warm, args=(default_views,), name="warmup", daemon=True).start()
+            _warmup_pid = os.getpid()
+
+
+def wait_ready(timeout=None):
+    return _ready.wait(timeout)
@@ -0,0 +1,196 @@
+# analytics/metrics.py
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import g, has_request_context
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.environ.get("METRICS", "1") != "0"
+# tracemalloc slows allocation-heavy code noticeably, so it is opt-in. The peak
+# is process-wide: with threaded workers concurrent callbacks share it.
+TRACE_MEMORY = os.environ.get("METRICS_TRACEMALLOC", "0") == "1"
+LOG_REQUESTS = os.environ.get("METRICS_LOG", "0") == "1"
+
+PHASES = ("filter", "aggregate", "figure", "serialize")
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_current = contextvars.ContextVar("callback_record", default=None)
+
+
+class CallbackRecord:
+    # Measurements for one callback invocation.
+    def __init__(self, name):
+        self.name = name
+        self.phases = defaultdict(float)
+        self.rows_in = 0
+        self.rows_out = 0
+        self.payload_bytes = 0
+        self.peak_bytes = 0
+        self.seconds = 0.0
+
+
+class CallbackStats:
+    # Running totals for one callback, exported as Prometheus series.
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.buckets = [0] * len(BUCKETS)
+        self.phases = defaultdict(float)
+        self.rows_in = 0
+        self.rows_out = 0
+        self.payload_bytes = 0
+        self.peak_bytes = 0
+
+    def add(self, record):
+        self.count += 1
+        self.seconds += record.seconds
+        for i, bound in enumerate(BUCKETS):
+            if record.seconds <= bound:
+                self.buckets[i] += 1
+        for name, seconds in record.phases.items():
+            self.phases[name] += seconds
+        self.rows_in += record.rows_in
+        self.rows_out += record.rows_out
+        self.payload_bytes += record.payload_bytes
+        self.peak_bytes = max(self.peak_bytes, record.peak_bytes)
+
+
+_stats = defaultdict(CallbackStats)
+_lock = threading.Lock()
+
+
+@contextmanager
+def phase(name):
+    # Times a block of a callback, e.g. `with phase("filter"): ...`.
+    record = _current.get()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if record is not None:
+            record.phases[name] += time.perf_counter() - start
+
+
+def record_rows(rows_in, rows_out):
+    record = _current.get()
+    if record is not None:
+        record.rows_in += rows_in
+        record.rows_out += rows_out
+
+
+def _finish(record):
+    with _lock:
+        _stats[record.name].add(record)
+    if LOG_REQUESTS:
+        logger.info(json.dumps({
+            "callback": record.name,
+            "seconds": round(record.seconds, 6),
+            "phases": {k: round(v, 6) for k, v in record.phases.items()},
+            "rows_in": record.rows_in,
+            "rows_out": record.rows_out,
+            "payload_bytes": record.payload_bytes,
+            "peak_bytes": record.peak_bytes,
+        }))
+
+
+def instrument(func):
+    # Outermost wrapper under @callback: wall time, phases recorded by the body
+    # and (optionally) peak allocation. Within a request the record is kept
+    # until install_metrics' hook has the response size.
+    if not ENABLED:
+        return func
+
+    @wraps(func)
+    def wrapper(*args):
+        record = CallbackRecord(func.__name__)
+        token = _current.set(record)
+        if TRACE_MEMORY:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            record.seconds = time.perf_counter() - start
+            if TRACE_MEMORY:
+                record.peak_bytes = max(tracemalloc.get_traced_memory()[1] - baseline, 0)
+            _current.reset(token)
+            if has_request_context():
+                g.callback_record = record
+            else:
+                _finish(record)
+
+    return wrapper
+
+
+def install_metrics(server):
+    # Takes each callback's payload size from the body Dash already encoded.
+    # Flask runs after_request hooks in reverse order, so installed after
+    # install_compression this sees the uncompressed body.
+    if not ENABLED:
+        return
+
+    @server.after_request
+    def record_payload(response):
+        record = g.pop("callback_record", None)
+        if record is not None:
+            if not response.direct_passthrough:
+                record.payload_bytes = len(response.get_data())
+            _finish(record)
+        return response
+
+
+def snapshot():
+    with _lock:
+        return {name: vars(stats).copy() for name, stats in _stats.items()}
+
+
+def _series(lines, name, kind, help_text, samples):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} {kind}")
+    for labels, value in samples:
+        label_text = ",".join(f'{k}="{v}"' for k, v in labels.items())
+        lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+
+
+def prometheus_text(extra=None):
+    # Prometheus text exposition format (version 0.0.4).
+    stats = snapshot()
+    lines = []
+    _series(lines, "dash_callback_calls_total", "counter", "Callback invocations.",
+            [({"callback": n}, s["count"]) for n, s in stats.items()])
+
+    lines.append("# HELP dash_callback_duration_seconds Callback wall time.")
+    lines.append("# TYPE dash_callback_duration_seconds histogram")
+    for n, s in stats.items():
+        for bound, count in zip(BUCKETS, s["buckets"]):
+            lines.append(f'dash_callback_duration_seconds_bucket{{callback="{n}",le="{bound}"}} {count}')
+        lines.append(f'dash_callback_duration_seconds_bucket{{callback="{n}",le="+Inf"}} {s["count"]}')
+        lines.append(f'dash_callback_duration_seconds_sum{{callback="{n}"}} {s["seconds"]}')
+        lines.append(f'dash_callback_duration_seconds_count{{callback="{n}"}} {s["count"]}')
+
+    _series(lines, "dash_callback_phase_seconds_total", "counter", "Callback time by phase.",
+            [({"callback": n, "phase": p}, s["phases"].get(p, 0.0)) for n, s in stats.items() for p in PHASES])
+    _series(lines, "dash_callback_rows_in_total", "counter", "Rows the callback filtered from.",
+            [({"callback": n}, s["rows_in"]) for n, s in stats.items()])
+    _series(lines, "dash_callback_rows_out_total", "counter", "Rows left after filtering.",
+            [({"callback": n}, s["rows_out"]) for n, s in stats.items()])
+    _series(lines, "dash_callback_payload_bytes_total", "counter", "Serialized response bytes.",
+            [({"callback": n}, s["payload_bytes"]) for n, s in stats.items()])
+    if TRACE_MEMORY:
+        _series(lines, "dash_callback_peak_alloc_bytes", "gauge", "Largest traced allocation peak of one call.",
+                [({"callback": n}, s["peak_bytes"]) for n, s in stats.items()])
+    for name, (kind, help_text, value) in (extra or {}).items():
+        _series(lines, name, kind, help_text, [({}, value)])
+    return "\n".join(lines) + "\n"
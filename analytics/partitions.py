@@ -0,0 +1,171 @@
+# analytics/partitions.py
+import os
+
+import numpy as np
+
+from analytics.lazy import lazy_import
+
+pd = lazy_import("pandas")
+
+# Rows are stored clustered by these columns (comma-separated, empty = off), so
+# each partition -- one combination of their values -- is a contiguous range of
+# rows. PARTITION_BY="Location,Supplier name" partitions by plant and supplier.
+PARTITION_BY = [c.strip() for c in os.environ.get("PARTITION_BY", "Location").split(",") if c.strip()]
+# Rows in an unclustered frame form about as many runs as there are rows; past
+# this many ranges the layout is treated as unpartitioned.
+MAX_RANGES = 4096
+
+
+def _codes(values):
+    if not isinstance(values.dtype, pd.CategoricalDtype):
+        values = values.astype("category")
+    return values.cat.codes.to_numpy()
+
+
+def cluster(frame, by=PARTITION_BY):
+    # `frame` with its rows grouped by partition (in category order); rows keep
+    # their order within a partition. Returned as is when already grouped.
+    if not by or len(frame) < 2:
+        return frame
+    codes = [_codes(frame[column]) for column in by]
+    order = np.lexsort(codes[::-1])
+    if np.all(order[1:] > order[:-1]):
+        return frame
+    return frame.take(order).reset_index(drop=True)
+
+
+class Partitions:
+    # The row ranges of a clustered frame, one per run of equal partition keys
+    # (a key gets one more range per append), with each range's row count and
+    # per-column min/max: values for numeric columns, category codes for
+    # categorical ones. A selection then only reads the ranges whose key it
+    # selects and whose min/max (a zone map) can hold its other filter values.
+    def __init__(self, by, starts, stops, keys, low, high, lookup):
+        self.by = list(by)
+        self.starts = starts
+        self.stops = stops
+        self.keys = keys
+        self.low = low
+        self.high = high
+        self.lookup = lookup
+
+    @classmethod
+    def of(cls, frame, by=PARTITION_BY, start=0, starts=None):
+        # Ranges of frame[start:], from its runs of equal keys unless their
+        # `starts` (relative to `start`) are known. None when unclustered.
+        if not by:
+            return None
+        tail = frame.iloc[start:]
+        codes = {column: _codes(tail[column]) for column in by}
+        if starts is None:
+            change = np.zeros(len(tail), dtype=bool)
+            change[:1] = True
+            for values in codes.values():
+                change[1:] |= values[1:] != values[:-1]
+            starts = np.flatnonzero(change)
+        starts = np.asarray(starts, dtype=np.int64)
+        if len(starts) > MAX_RANGES:
+            return None
+        low, high, lookup = {}, {}, {}
+        for column in frame.columns:
+            values = frame[column]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                lookup[column] = {value: code for code, value in enumerate(values.cat.categories)}
+                values = values.cat.codes.to_numpy()[start:]
+            else:
+                values = values.to_numpy()[start:]
+            if values.dtype.kind not in "iuf":
+                continue
+            if len(starts):
+                low[column], high[column] = np.fmin.reduceat(values, starts), np.fmax.reduceat(values, starts)
+            else:
+                low[column], high[column] = values[:0], values[:0]
+        stops = np.append(starts[1:], len(tail)).astype(np.int64)
+        keys = {column: values[starts] for column, values in codes.items()}
+        return cls(by, starts + start, stops + start, keys, low, high, lookup)
+
+    @classmethod
+    def from_entries(cls, entries, by, frame):
+        # Partitions of `frame` described by entries() (as stored in the
+        # columnar manifest), without reading the rows.
+        lookup = {
+            column: {value: code for code, value in enumerate(frame[column].cat.categories)}
+            for column in frame.columns if isinstance(frame[column].dtype, pd.CategoricalDtype)
+        }
+        starts = np.array([entry["start"] for entry in entries], dtype=np.int64)
+        stops = starts + np.array([entry["rows"] for entry in entries], dtype=np.int64)
+        keys = {
+            column: np.array([lookup[column].get(entry["key"][column], -1) for entry in entries], dtype=np.int64)
+            for column in by
+        }
+        columns = entries[0]["min"] if entries else {}
+        low = {column: np.array([entry["min"][column] for entry in entries], dtype=float) for column in columns}
+        high = {column: np.array([entry["max"][column] for entry in entries], dtype=float) for column in columns}
+        return cls(by, starts, stops, keys, low, high, lookup)
+
+    def entries(self):
+        labels = {column: list(self.lookup[column]) for column in self.by}
+        out = []
+        for i, (start, stop) in enumerate(zip(self.starts.tolist(), self.stops.tolist())):
+            key = {column: labels[column][code] if code >= 0 else None for column, code in
+                   ((column, int(self.keys[column][i])) for column in self.by)}
+            out.append({
+                "key": key, "start": start, "rows": stop - start,
+                "min": {column: _scalar(values[i]) for column, values in self.low.items()},
+                "max": {column: _scalar(values[i]) for column, values in self.high.items()},
+            })
+        return out
+
+    def extend(self, frame, start):
+        # Partitions of `frame` whose first `start` rows are the ones covered
+        # here; the new rows add ranges of their own.
+        more = Partitions.of(frame, self.by, start)
+        if more is None or len(self.starts) + len(more.starts) > MAX_RANGES:
+            return None
+        return Partitions(
+            self.by,
+            np.concatenate([self.starts, more.starts]),
+            np.concatenate([self.stops, more.stops]),
+            {column: np.concatenate([self.keys[column], more.keys[column]]) for column in self.by},
+            {column: np.concatenate([self.low[column], more.low[column]]) for column in more.low},
+            {column: np.concatenate([self.high[column], more.high[column]]) for column in more.high},
+            more.lookup,
+        )
+
+    def prune(self, selections):
+        # Boolean mask: which ranges can hold rows matching the selections.
+        keep = np.ones(len(self.starts), dtype=bool)
+        for column, values in selections.items():
+            if not values or column not in self.lookup:
+                continue
+            lookup = self.lookup[column]
+            codes = np.array([lookup[v] for v in values if v in lookup], dtype=np.int64)
+            if column in self.keys:
+                keep &= np.isin(self.keys[column], codes)
+            elif column in self.low:
+                low, high = self.low[column][:, None], self.high[column][:, None]
+                keep &= ((low <= codes) & (codes <= high)).any(axis=1)
+        return keep
+
+    def count(self, keep):
+        return int((self.stops - self.starts)[keep].sum())
+
+    def span(self, keep):
+        # (start, stop) when the kept ranges are one contiguous run of rows.
+        starts, stops = self.starts[keep], self.stops[keep]
+        if len(starts) and np.array_equal(starts[1:], stops[:-1]):
+            return int(starts[0]), int(stops[-1])
+        return None
+
+    def rows(self, keep):
+        # Sorted positions of the rows in the kept ranges.
+        starts, stops = self.starts[keep], self.stops[keep]
+        dtype = np.int32 if len(stops) and stops.max() < 2**31 else np.int64
+        if not len(starts):
+            return np.empty(0, dtype=dtype)
+        return np.concatenate([np.arange(a, b, dtype=dtype) for a, b in zip(starts.tolist(), stops.tolist())])
+
+
+def _scalar(value):
+    value = value.item()
+    return None if isinstance(value, float) and value != value else value
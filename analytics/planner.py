@@ -0,0 +1,182 @@
+# analytics/planner.py
+import numpy as np
+
+from analytics.lazy import lazy_import
+
+pd = lazy_import("pandas")
+
+# Accumulators each aggregation needs, and how accumulators from different
+# groups combine when rolled up.
+STATS = {"sum": ["sum"], "mean": ["sum", "count"], "count": ["count"], "min": ["min"], "max": ["max"]}
+ROLLUP = {"sum": np.add, "count": np.add, "min": np.minimum, "max": np.maximum}
+IDENTITY = {"sum": 0.0, "count": 0.0, "min": np.inf, "max": -np.inf}
+
+
+class AggregationPlan:
+    # A page declares every total and grouped metric it needs up front; run()
+    # then answers all of them with one factorized group code over the rows
+    # and one bincount per input column, instead of a groupby per chart.
+    #
+    #   plan = (AggregationPlan()
+    #           .total("revenue", "Revenue generated", "sum")
+    #           .group("by_type", "Product type", "Revenue generated", "sum"))
+    #   plan.run(frame)["by_type"]
+    def __init__(self):
+        self.totals = {}
+        self.groups = {}
+
+    def total(self, name, column, how):
+        _check(how)
+        self.totals[name] = (column, how)
+        return self
+
+    def group(self, name, keys, columns, how):
+        # Result has the same shape as
+        # frame.groupby(keys, as_index=False, observed=True)[columns].agg(how).
+        _check(how)
+        keys = [keys] if isinstance(keys, str) else list(keys)
+        columns = [columns] if isinstance(columns, str) else list(columns)
+        self.groups[name] = (keys, columns, how)
+        return self
+
+    @property
+    def keys(self):
+        keys = []
+        for group_keys, _, _ in self.groups.values():
+            keys += [k for k in group_keys if k not in keys]
+        return keys
+
+    def _accumulators(self):
+        needed = {}
+        for column, how in self.totals.values():
+            needed.setdefault(column, set()).update(STATS[how])
+        for _, columns, how in self.groups.values():
+            for column in columns:
+                needed.setdefault(column, set()).update(STATS[how])
+        return needed
+
+    def run(self, frame, cells=False):
+        # `frame` holds raw rows, or cube cells (cells=True) whose measures are
+        # stored as "<column>|sum", "|count", "|min" and "|max".
+        keys = self.keys
+        code, radices, categories = group_code(frame, keys)
+        grid = int(np.prod(radices, dtype=np.int64)) if radices else 1
+        if grid > max(len(frame), 1 << 20):
+            # Sparse key space (e.g. SKU x Product type): number only the
+            # combinations that occur.
+            flat, code = np.unique(code, return_inverse=True)
+        else:
+            flat = np.arange(grid, dtype=np.int64)
+        size = len(flat)
+
+        # The single pass: one accumulator array per (column, stat).
+        acc, integer = {}, {}
+        for column, stats in self._accumulators().items():
+            for stat in stats:
+                values, integer[column] = _input(frame, column, stat, cells)
+                acc[column, stat] = _accumulate(code, values, stat, size)
+        present = np.bincount(code, minlength=size) > 0
+
+        results = {}
+        for name, (column, how) in self.totals.items():
+            stats = {s: ROLLUP[s].reduce(acc[column, s][present], initial=IDENTITY[s]) for s in STATS[how]}
+            results[name] = _finish(stats, how, integer[column])
+
+        cell = np.flatnonzero(present)
+        cell_codes, stride = {}, 1
+        for key, radix in reversed(list(zip(keys, radices))):
+            cell_codes[key] = (flat[cell] // stride) % radix
+            stride *= radix
+        for name, (group_keys, columns, how) in self.groups.items():
+            results[name] = _group_result(acc, cell, cell_codes, categories, integer, group_keys, columns, how)
+        return results
+
+
+def _check(how):
+    if how not in STATS:
+        raise ValueError(f"unknown aggregation {how!r}")
+
+
+def group_code(frame, keys):
+    # Mixed-radix code over the key columns. Slot 0 of every key holds missing
+    # values, which are dropped from groups like groupby does.
+    code = np.zeros(len(frame), dtype=np.int64)
+    radices, categories = [], {}
+    for key in keys:
+        values = frame[key]
+        if not isinstance(values.dtype, pd.CategoricalDtype):
+            values = values.astype("category")
+        radix = len(values.cat.categories) + 1
+        code = code * radix + values.cat.codes.to_numpy().astype(np.int64) + 1
+        radices.append(radix)
+        categories[key] = values.cat.categories
+    return code, radices, categories
+
+
+def cell_keys(cells, keys):
+    # One tuple of category codes per row of `cells`. Appends only add
+    # categories at the end (see analytics/append.py), so a cell keeps its key
+    # across data versions and derived structures can match new rows to the
+    # cells they already hold by key.
+    return list(zip(*(cells[key].cat.codes.to_numpy() for key in keys)))
+
+
+def _input(frame, column, stat, cells):
+    if cells:
+        series = frame[f"{column}|{stat}"]
+        return series.to_numpy(dtype=np.float64), series.dtype.kind in "iub"
+    series = frame[column]
+    values = series.to_numpy(dtype=np.float64)
+    valid = ~np.isnan(values)
+    if stat == "count":
+        values = valid.astype(np.float64)
+    elif not valid.all():
+        values = np.where(valid, values, IDENTITY[stat])
+    return values, series.dtype.kind in "iub"
+
+
+def _accumulate(code, values, stat, size):
+    if stat in ("sum", "count"):
+        return np.bincount(code, weights=values, minlength=size)
+    out = np.full(size, IDENTITY[stat])
+    ROLLUP[stat].at(out, code, values)
+    return out
+
+
+def _finish(stats, how, integer):
+    # Turn accumulators (scalars or arrays) into the requested aggregation.
+    if how == "mean":
+        count = stats["count"]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(count > 0, stats["sum"] / np.where(count > 0, count, 1), np.nan)[()]
+    value = stats[how]
+    if how == "count" or (how == "sum" and integer):
+        return np.asarray(value).astype(np.int64)[()]
+    if how in ("min", "max"):
+        return np.where(np.isfinite(value), value, np.nan)[()]
+    return value
+
+
+def _group_result(acc, cell, cell_codes, categories, integer, keys, columns, how):
+    sub = np.zeros(len(cell), dtype=np.int64)
+    keep = np.ones(len(cell), dtype=bool)
+    for key in keys:
+        radix = len(categories[key]) + 1
+        sub = sub * radix + cell_codes[key]
+        keep &= cell_codes[key] > 0
+    sub, cell = sub[keep], cell[keep]
+    # Sorted unique codes = category order, as groupby(sort=True) returns.
+    groups, inverse = np.unique(sub, return_inverse=True)
+
+    out, stride = {}, 1
+    key_codes = {}
+    for key in reversed(keys):
+        radix = len(categories[key]) + 1
+        key_codes[key] = (groups // stride) % radix - 1
+        stride *= radix
+    for key in keys:
+        out[key] = pd.Categorical.from_codes(key_codes[key], dtype=pd.CategoricalDtype(categories[key]))
+    for column in columns:
+        stats = {s: _accumulate(inverse, acc[column, s][cell], s, len(groups)) for s in STATS[how]}
+        out[column] = _finish(stats, how, integer[column])
+    return pd.DataFrame(out)
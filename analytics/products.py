@@ -0,0 +1,91 @@
+# analytics/products.py
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from analytics.lazy import lazy_import
+from analytics.planner import AggregationPlan
+from analytics.ranks import RankIndex
+
+pd = lazy_import("pandas")
+
+SKU_KEYS = ["SKU", "Product type"]
+SKU_MEASURES = ["Number of products sold", "Revenue generated"]
+# SKU-level totals for the top products table.
+SKU_PLAN = AggregationPlan().group("skus", SKU_KEYS, SKU_MEASURES, "sum")
+# The products table lists SKUs by revenue unless sorted otherwise.
+DEFAULT_ORDER = ("Revenue generated", False)
+# Selections whose SKU totals (and their sort orders) are kept for paging.
+SELECTIONS_KEPT = 32
+
+
+class ProductTotals:
+    # Units sold and revenue per SKU over all rows, answering the unfiltered
+    # products table without a pass over the rows. Sums merge, so appends
+    # only aggregate the new rows.
+    def __init__(self, df):
+        self.totals = SKU_PLAN.run(df)["skus"]
+        self.ranks = RankIndex(self.totals)
+        self._selected = OrderedDict()
+        self._lock = threading.Lock()
+
+    def ranking(self, index, frame, selections):
+        # (RankIndex over SKU totals, keep) for a selection. Filters on SKU
+        # attributes alone pick rows of the all-rows totals (keep is their
+        # mask); other selections aggregate their rows once and keep the result
+        # for the most recent selections, so paging and re-sorting don't.
+        active = {col: [str(v) for v in values] for col, values in selections.items() if values}
+        if not active:
+            return self.ranks, None
+        if set(active) <= set(SKU_KEYS):
+            columns = [
+                (self.totals[col].cat.codes.to_numpy(), self.totals[col].cat.categories.astype(str).isin(values))
+                for col, values in active.items()
+            ]
+
+            def keep(positions):
+                mask = np.ones(len(positions), dtype=bool)
+                for codes, allowed in columns:
+                    mask &= allowed[codes[positions]] & (codes[positions] >= 0)
+                return mask
+
+            return self.ranks, keep
+        key = tuple(sorted((col, tuple(sorted(values))) for col, values in active.items()))
+        with self._lock:
+            ranks = self._selected.get(key)
+            if ranks is not None:
+                self._selected.move_to_end(key)
+                return ranks, None
+        ranks = RankIndex(SKU_PLAN.run(index.filter(frame, selections))["skus"])
+        with self._lock:
+            self._selected[key] = ranks
+            while len(self._selected) > SELECTIONS_KEPT:
+                self._selected.popitem(last=False)
+        return ranks, None
+
+    def count(self, index, frame, selections):
+        ranks, keep = self.ranking(index, frame, selections)
+        if keep is None:
+            return len(ranks.table)
+        return int(keep(np.arange(len(ranks.table))).sum())
+
+    def page(self, index, frame, selections, start, size, sort=None):
+        # One page of the products table for a selection, in revenue order or
+        # `sort` = (column, ascending).
+        ranks, keep = self.ranking(index, frame, selections)
+        column, ascending = sort or DEFAULT_ORDER
+        return ranks.table.iloc[ranks.page(column, ascending, start, size, keep=keep)]
+
+    def extend(self, df, start):
+        more = SKU_PLAN.run(df.iloc[start:])["skus"]
+        merged = pd.concat([self.totals.astype({c: object for c in SKU_KEYS}), more.astype({c: object for c in SKU_KEYS})])
+        out = ProductTotals.__new__(ProductTotals)
+        out.totals = (
+            merged.groupby(SKU_KEYS, sort=False, as_index=False)[SKU_MEASURES].sum()
+            .astype({c: df[c].dtype for c in SKU_KEYS})
+        )
+        out.ranks = RankIndex(out.totals)
+        out._selected = OrderedDict()
+        out._lock = threading.Lock()
+        return out
@@ -0,0 +1,117 @@
+# analytics/ranks.py
+import threading
+
+import numpy as np
+
+from analytics.lazy import lazy_import
+
+pd = lazy_import("pandas")
+
+# Rows checked in the first step when a page is gathered from a presorted order
+# under a filter; each further step checks twice as many.
+WALK_CHUNK = 1024
+
+
+def sort_key(values):
+    # Numeric key sorting like the column: labels (categorical or text) by their
+    # string order, missing values last.
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        labels = values.cat.categories.astype(str).to_numpy()
+        codes = values.cat.codes.to_numpy()
+    elif values.dtype == object:
+        codes, labels = pd.factorize(values)
+        labels = labels.astype(str).to_numpy()
+    else:
+        return values.to_numpy(dtype=np.float64)
+    ranks = np.empty(len(labels) + 1, dtype=np.float64)
+    ranks[np.argsort(labels, kind="stable")] = np.arange(len(labels))
+    ranks[-1] = np.nan
+    return ranks[codes]
+
+
+def sort_order(sort_by, default=None):
+    # DataTable sort_by -> (column, ascending); only the first entry counts.
+    if sort_by:
+        return sort_by[0]["column_id"], sort_by[0]["direction"] == "asc"
+    return default
+
+
+class RankIndex:
+    # Positions of a table's rows presorted by each column, built on first use
+    # and kept with the table, so a page of any sort order is a slice of one
+    # array. Ties keep row order in both directions. `keys` supplies the sort
+    # keys of columns that aren't in the table (e.g. derived ratios).
+    def __init__(self, table, keys=None):
+        self.table = table
+        self.keys = dict(keys or {})
+        self._orders = {}
+        self._ranks = {}
+        self._lock = threading.Lock()
+
+    def key(self, column):
+        if column in self.keys:
+            return self.keys[column]
+        return sort_key(self.table[column])
+
+    def order(self, column, ascending=True):
+        order = self._orders.get((column, ascending))
+        if order is None:
+            key = self.key(column)
+            order = np.argsort(key if ascending else -key, kind="stable")
+            with self._lock:
+                self._orders[column, ascending] = order
+        return order
+
+    def page(self, column, ascending, start, size, rows=None, keep=None):
+        # Positions of the rows at start..start+size in this order, among `rows`
+        # (sorted positions, None = all) for which keep(positions) is True.
+        # Without `rows` the presorted order is walked until the page is full,
+        # which is cheap when many rows qualify; with them only those are ranked.
+        stop = start + size
+        order = self.order(column, ascending)
+        if rows is None and keep is None:
+            return order[start:stop]
+        if rows is not None:
+            if keep is not None:
+                rows = rows[keep(rows)]
+            rank = self.rank(column, ascending)[rows]
+            if len(rows) > stop:
+                first = np.argpartition(rank, stop - 1)[:stop]
+                rows, rank = rows[first], rank[first]
+            return rows[np.argsort(rank, kind="stable")][start:stop]
+        found, total, pos, chunk = [], 0, 0, WALK_CHUNK
+        while total < stop and pos < len(order):
+            part = order[pos:pos + chunk]
+            part = part[keep(part)][:stop - total]
+            found.append(part)
+            total += len(part)
+            pos += chunk
+            chunk *= 2
+        return np.concatenate(found)[start:stop] if found else order[:0]
+
+    def rank(self, column, ascending=True):
+        # Position of each row in the order.
+        rank = self._ranks.get((column, ascending))
+        if rank is None:
+            order = self.order(column, ascending)
+            rank = np.empty(len(order), dtype=order.dtype)
+            rank[order] = np.arange(len(order), dtype=order.dtype)
+            with self._lock:
+                self._ranks[column, ascending] = rank
+        return rank
+
+    def extend(self, table, start, keys=None):
+        # Index of `table` whose first `start` rows are the ones indexed here.
+        # Orders already built absorb the new rows by a merge: O(n) instead of a
+        # new sort.
+        out = RankIndex(table, keys)
+        new_rows = np.arange(start, len(table))
+        for (column, ascending), order in list(self._orders.items()):
+            key = out.key(column)
+            # NaN keys sort last, as in argsort.
+            key = np.nan_to_num(key if ascending else -key, nan=np.inf)
+            more = new_rows[np.argsort(key[start:], kind="stable")]
+            # Ties go after the old rows, which have lower positions.
+            at = np.searchsorted(key[order], key[more], side="right")
+            out._orders[column, ascending] = np.insert(order, at, more)
+        return out
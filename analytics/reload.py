@@ -0,0 +1,97 @@
+# analytics/reload.py
+import hashlib
+import logging
+import os
+import threading
+
+from analytics.append import appended
+from analytics.columnar import MANIFEST
+from analytics.data import (
+    COLUMNAR_PATH, DATA_PATH, get_dataset, load_dataset, set_dataset, source_version,
+)
+
+logger = logging.getLogger(__name__)
+
+# Seconds between checks of the data file; 0 disables hot reload.
+RELOAD_INTERVAL = float(os.environ.get("DATA_RELOAD_INTERVAL", "0"))
+
+
+def watched_path():
+    if os.path.exists(DATA_PATH):
+        return DATA_PATH
+    return os.path.join(COLUMNAR_PATH, MANIFEST)
+
+
+def file_digest(path, chunk_size=1 << 20):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DataWatcher(threading.Thread):
+    # Polls the data file and, when its contents change, builds the new
+    # snapshot (frame, index, cube) on this thread before swapping it in.
+    def __init__(self, interval=RELOAD_INTERVAL):
+        super().__init__(name="data-watcher", daemon=True)
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._seen = None
+        self._digest = None
+
+    def run(self):
+        self._seen = get_dataset().version
+        if source_version() == self._seen:
+            self._digest = file_digest(watched_path())
+        while not self._stopped.wait(self.interval):
+            try:
+                self.check()
+            except Exception:
+                logger.exception("data reload failed; keeping version %s", get_dataset().version)
+
+    def check(self):
+        version = source_version()
+        current = get_dataset()
+        if version in (self._seen, current.version):
+            self._seen = version
+            return False
+        self._seen = version
+        # Rows appended by another process: extend the snapshot from them.
+        dataset = appended(current, version)
+        if dataset is not None:
+            self._digest = None
+            set_dataset(dataset)
+            logger.info("appended %d rows as version %s", len(dataset.frame) - len(current.frame), version)
+            return True
+        # A touched file with identical bytes keeps the current snapshot.
+        digest = file_digest(watched_path())
+        if digest == self._digest:
+            return False
+        dataset = load_dataset(version).warm()
+        self._digest = digest
+        set_dataset(dataset)
+        logger.info("reloaded data as version %s (%d rows)", version, len(dataset.frame))
+        return True
+
+    def stop(self):
+        self._stopped.set()
+
+
+_watcher = None
+_watcher_pid = None
+_watcher_lock = threading.Lock()
+
+
+def ensure_watcher(interval=RELOAD_INTERVAL):
+    # Threads don't survive fork, so each gunicorn worker starts its own
+    # watcher on its first request.
+    global _watcher, _watcher_pid
+    if interval <= 0 or _watcher_pid == os.getpid():
+        return _watcher
+    with _watcher_lock:
+        if _watcher_pid != os.getpid():
+            _watcher = DataWatcher(interval)
+            _watcher.start()
+            _watcher_pid = os.getpid()
+    return _watcher
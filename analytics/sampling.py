@@ -0,0 +1,123 @@
+# analytics/sampling.py
+import os
+
+import numpy as np
+from plotly.colors import qualitative
+
+from analytics.lazy import lazy_import
+
+px = lazy_import("plotly.express")
+go = lazy_import("plotly.graph_objects")
+
+# Above this many rows scatters and box plots are summarized on the server
+# instead of sending every row to the browser.
+ROW_THRESHOLD = int(os.environ.get("PLOT_ROW_THRESHOLD", "5000"))
+DENSITY_BINS = int(os.environ.get("PLOT_DENSITY_BINS", "60"))
+MAX_OUTLIERS = int(os.environ.get("PLOT_MAX_OUTLIERS", "200"))
+COLORS = qualitative.Plotly
+
+
+def category_order(df, column):
+    # Groups in label order rather than px's first appearance in the rows,
+    # which depends on how the rows are stored.
+    return {column: sorted(df[column].dropna().unique().tolist(), key=str)}
+
+
+def scatter(df, x, y, color, title, template="plotly_white", threshold=None):
+    threshold = ROW_THRESHOLD if threshold is None else threshold
+    if len(df) <= threshold:
+        return px.scatter(
+            df, x=x, y=y, color=color, title=title, template=template, category_orders=category_order(df, color)
+        )
+
+    # 2D histogram binned here; the browser only receives the bin grid.
+    counts, x_edges, y_edges = np.histogram2d(
+        df[x].to_numpy(dtype=np.float64), df[y].to_numpy(dtype=np.float64), bins=DENSITY_BINS
+    )
+    z = counts.T
+    z[z == 0] = np.nan
+    fig = go.Figure(go.Heatmap(
+        x=(x_edges[:-1] + x_edges[1:]) / 2,
+        y=(y_edges[:-1] + y_edges[1:]) / 2,
+        z=z,
+        colorscale="Blues",
+        colorbar={"title": {"text": "Rows"}},
+        hovertemplate=f"{x}: %{{x:.2f}}<br>{y}: %{{y:.2f}}<br>Rows: %{{z}}<extra></extra>",
+    ))
+    fig.update_layout(title=f"{title} (density of {len(df):,} rows)", template=template)
+    fig.update_xaxes(title_text=x)
+    fig.update_yaxes(title_text=y)
+    return fig
+
+
+def quartiles(values):
+    # Box statistics as Plotly computes them: linear quartiles and Tukey fences
+    # clipped to the most extreme values inside them.
+    q1, median, q3 = np.percentile(values, [25, 50, 75])
+    iqr = q3 - q1
+    inside = values[(values >= q1 - 1.5 * iqr) & (values <= q3 + 1.5 * iqr)]
+    outliers = values[(values < q1 - 1.5 * iqr) | (values > q3 + 1.5 * iqr)]
+    return {
+        "q1": q1, "median": median, "q3": q3,
+        "lowerfence": inside.min(), "upperfence": inside.max(),
+        "outliers": outliers,
+    }
+
+
+def sketch_quartiles(sketch):
+    # quartiles() from a KLLSketch: exact while the sketch holds every value,
+    # otherwise within its rank error. Fences are the most extreme retained
+    # values inside them (the true minimum/maximum when those are inside), and
+    # outliers are the retained values outside, a sample of the real ones.
+    q1, median, q3 = sketch.quantiles([0.25, 0.5, 0.75])
+    iqr = q3 - q1
+    low, high = q1 - 1.5 * iqr, q3 + 1.5 * iqr
+    items = sketch.items()
+    if not sketch.exact:
+        items = np.concatenate([items, [sketch.min, sketch.max]])
+    inside = items[(items >= low) & (items <= high)]
+    outliers = items[(items < low) | (items > high)]
+    return {
+        "q1": q1, "median": median, "q3": q3,
+        "lowerfence": inside.min(), "upperfence": inside.max(),
+        "outliers": outliers,
+    }
+
+
+def box(df, x, y, title, template="plotly_white", threshold=None, sketches=None):
+    # Box plot of y per x category, coloured by x. Above the threshold the
+    # statistics come from `sketches` ({x value: KLLSketch of y}, see
+    # QuantileIndex.groups) when given, otherwise from the rows of `df`.
+    threshold = ROW_THRESHOLD if threshold is None else threshold
+    if sketches is None and len(df) <= threshold:
+        return px.box(df, x=x, y=y, color=x, title=title, template=template, category_orders=category_order(df, x))
+
+    if sketches is not None:
+        groups = ((name, sketch_quartiles(sketch)) for name, sketch in sketches.items())
+    else:
+        groups = (
+            (name, quartiles(values.to_numpy(dtype=np.float64)))
+            for name, values in df.groupby(x, observed=True, sort=False)[y]
+        )
+    groups = sorted(groups, key=lambda group: str(group[0]))
+    fig = go.Figure()
+    rng = np.random.default_rng(0)
+    for i, (name, stats) in enumerate(groups):
+        color = COLORS[i % len(COLORS)]
+        fig.add_trace(go.Box(
+            name=str(name), x=[name], legendgroup=str(name), marker_color=color,
+            q1=[stats["q1"]], median=[stats["median"]], q3=[stats["q3"]],
+            lowerfence=[stats["lowerfence"]], upperfence=[stats["upperfence"]],
+        ))
+        outliers = stats["outliers"]
+        if len(outliers) > MAX_OUTLIERS:
+            outliers = rng.choice(outliers, MAX_OUTLIERS, replace=False)
+        if len(outliers):
+            fig.add_trace(go.Scatter(
+                x=[name] * len(outliers), y=outliers, mode="markers", marker_color=color,
+                legendgroup=str(name), showlegend=False, name=str(name),
+            ))
+    fig.update_layout(title=title, template=template, boxmode="overlay", legend_title_text=x)
+    fig.update_xaxes(title_text=x, type="category")
+    fig.update_yaxes(title_text=y)
+    return fig
@@ -0,0 +1,113 @@
+# analytics/shared.py
+import gc
+import mmap
+import os
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from analytics.data import Dataset, get_dataset, set_dataset
+from analytics.lazy import lazy_import
+
+pd = lazy_import("pandas")
+
+# SHARED_MEMORY=1 loads the dataset once in the gunicorn master (gunicorn.conf.py
+# turns on --preload with it) and places the rows and the filter index in shared
+# memory as plain read-only NumPy buffers, so forked workers map one copy
+# instead of each holding their own.
+SHARED_MEMORY = os.environ.get("SHARED_MEMORY", "0") == "1"
+SHM_PATH = "/dev/shm"
+ALIGN = 64
+
+# Blocks stay open for the life of the process; the arrays handed out are views
+# into them.
+_blocks = []
+
+
+def _mapped(values):
+    # True when the array is backed by a file mapping (the columnar files),
+    # which the page cache already shares between processes.
+    base = values
+    while base is not None:
+        if isinstance(base, mmap.mmap):
+            return True
+        base = getattr(base, "base", None)
+    return False
+
+
+def _check_space(size):
+    # Writing past the size of /dev/shm kills the process with SIGBUS rather
+    # than raising, so fail up front (containers often mount only 64 MB).
+    if not os.path.isdir(SHM_PATH):
+        return
+    stat = os.statvfs(SHM_PATH)
+    available = stat.f_bavail * stat.f_frsize
+    if size > available:
+        raise MemoryError(
+            f"{size / 2**20:.0f} MiB of shared memory needed but {SHM_PATH} has {available / 2**20:.0f} MiB free; "
+            "enlarge it (e.g. docker run --shm-size) or unset SHARED_MEMORY"
+        )
+
+
+def shared_arrays(arrays):
+    # Read-only copies of `arrays` in one shared memory block. The block is
+    # unlinked at once: forked workers inherit the mapping, and nothing is left
+    # behind in /dev/shm however the server exits.
+    offsets, size = [], 0
+    for values in arrays:
+        offsets.append(size)
+        size += -(-values.nbytes // ALIGN) * ALIGN
+    _check_space(size)
+    block = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    block.unlink()
+    _blocks.append(block)
+    views = []
+    for values, offset in zip(arrays, offsets):
+        view = np.ndarray(values.shape, dtype=values.dtype, buffer=block.buf, offset=offset)
+        view[...] = values
+        view.flags.writeable = False
+        views.append(view)
+    return views
+
+
+def share_frame(frame):
+    # The frame with its column buffers (codes for categorical columns) in
+    # shared memory. Columns already mapped from the columnar files are kept
+    # as they are.
+    raw = {}
+    for name in frame.columns:
+        values = frame[name]
+        codes = values.cat.codes.to_numpy() if isinstance(values.dtype, pd.CategoricalDtype) else values.to_numpy()
+        if codes.dtype != object and not _mapped(codes):
+            raw[name] = codes
+    columns = {name: frame[name] for name in frame.columns}
+    for name, view in zip(raw, shared_arrays(list(raw.values()))):
+        dtype = frame[name].dtype
+        if isinstance(dtype, pd.CategoricalDtype):
+            columns[name] = pd.Categorical.from_codes(view, dtype=dtype, validate=False)
+        else:
+            columns[name] = view
+    return pd.DataFrame(columns, copy=False)
+
+
+def share_dataset(dataset):
+    # Copy of `dataset` over shared rows, with its derived structures built on
+    # them (views into the rows stay shared) and the filter index moved into
+    # shared memory too.
+    shared = Dataset(share_frame(dataset.frame), dataset.version)
+    if "cube" in dataset.__dict__:
+        # Cells loaded from the ingest output; they don't reference the rows.
+        shared.cube = dataset.cube
+    shared.warm()
+    shared.index.move_arrays(shared_arrays)
+    return shared
+
+
+def preload():
+    # Run in the gunicorn master before it forks the workers. Freezing the
+    # collector keeps it from touching (and so copying) the objects built here.
+    dataset = share_dataset(get_dataset())
+    set_dataset(dataset)
+    gc.collect()
+    gc.freeze()
+    return dataset
@@ -0,0 +1,251 @@
+# analytics/sketches.py
+import os
+
+import numpy as np
+
+from analytics.columnar import code_dtype
+from analytics.filters import FILTER_COLUMNS
+from analytics.lazy import lazy_import
+from analytics.planner import cell_keys, group_code
+
+pd = lazy_import("pandas")
+
+# Accuracy/size trade-off of every sketch: rank error is about 1.7/SKETCH_K and
+# each sketch keeps at most ~3 * SKETCH_K values.
+SKETCH_K = int(os.environ.get("SKETCH_K", "200"))
+# Selections with more rows than this take medians from the sketches rather
+# than from their rows.
+SKETCH_MIN_ROWS = int(os.environ.get("SKETCH_MIN_ROWS", "5000"))
+# Columns the pages take quantiles of: box plots and the inventory median.
+SKETCH_COLUMNS = ["Shipping times", "Manufacturing lead time", "Number of products sold"]
+
+
+class KLLSketch:
+    # Mergeable quantile sketch (Karnin-Lang-Liberty). Values are kept in
+    # levels where an item at level h stands for 2**h inputs; a full level is
+    # sorted and every other item promoted to the next one. Memory is O(k) and
+    # rank error roughly 1.7/k whatever the input size. While nothing has been
+    # compacted the sketch holds every value and quantiles are exact. The
+    # exact minimum and maximum are tracked alongside.
+    def __init__(self, k=SKETCH_K, seed=0):
+        self.k = k
+        self.n = 0
+        self.min, self.max = np.inf, -np.inf
+        self.levels = [np.empty(0)]
+        self.seed = seed
+        self._rng = None
+
+    @classmethod
+    def of(cls, values, k=SKETCH_K, seed=0):
+        return cls(k, seed).update(values)
+
+    @classmethod
+    def from_sorted(cls, values, k=SKETCH_K):
+        # Sketch of already sorted values, built without compacting: the top
+        # level holds the middle value of every run of 2**h values and the
+        # leftover tail goes to the levels below, at most one item each.
+        sketch = cls(k)
+        n = len(values)
+        if not n:
+            return sketch
+        top = int(np.ceil(np.log2(n / k))) if n > k else 0
+        levels, start = [], 0
+        for h in range(top, -1, -1):
+            stride = 2 ** h
+            end = start + (n - start) // stride * stride
+            levels.append(np.array(values[start + stride // 2:end:stride], dtype=np.float64))
+            start = end
+        sketch.levels = levels[::-1]
+        sketch.n = n
+        sketch.min, sketch.max = float(values[0]), float(values[-1])
+        return sketch
+
+    @classmethod
+    def union(cls, sketches, k=SKETCH_K):
+        # All of `sketches` in one, for answering a query over several cells.
+        # Levels are pooled but not compacted, so the result is as accurate as
+        # its parts; it is meant to be queried and dropped.
+        sketches = list(sketches)
+        out = cls(sketches[0].k if sketches else k)
+        depth = max((len(s.levels) for s in sketches), default=1)
+        out.levels = [
+            np.concatenate([s.levels[h] for s in sketches if h < len(s.levels)] or [np.empty(0)])
+            for h in range(depth)
+        ]
+        out.n = sum(s.n for s in sketches)
+        out.min = min((s.min for s in sketches), default=np.inf)
+        out.max = max((s.max for s in sketches), default=-np.inf)
+        return out
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if len(values):
+            self.levels[0] = np.concatenate([self.levels[0], values])
+            self.n += len(values)
+            self.min = min(self.min, float(values.min()))
+            self.max = max(self.max, float(values.max()))
+            self._compress()
+        return self
+
+    def merge(self, other):
+        # New sketch summarizing both inputs; neither operand changes, so a
+        # snapshot can keep using its sketch while a newer one is derived.
+        out = KLLSketch(self.k, self.seed + other.seed + 1)
+        depth = max(len(self.levels), len(other.levels))
+        out.levels = [
+            np.concatenate([s.levels[h] for s in (self, other) if h < len(s.levels)]) for h in range(depth)
+        ]
+        out.n = self.n + other.n
+        out.min, out.max = min(self.min, other.min), max(self.max, other.max)
+        out._compress()
+        return out
+
+    def _capacity(self, level):
+        # Lower levels hold geometrically fewer items than the top one.
+        return max(2, int(np.ceil(self.k * (2 / 3) ** (len(self.levels) - level - 1))))
+
+    def _compress(self):
+        if self._rng is None:
+            self._rng = np.random.default_rng(self.seed)
+        h = 0
+        while h < len(self.levels):
+            items = self.levels[h]
+            if len(items) > self._capacity(h):
+                if h + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                items = np.sort(items)
+                # An odd item out stays behind; the rest pairs up.
+                keep, pairs = items[:len(items) % 2], items[len(items) % 2:]
+                promoted = pairs[int(self._rng.integers(2))::2]
+                self.levels[h] = keep
+                self.levels[h + 1] = np.concatenate([self.levels[h + 1], promoted])
+                h = 0
+                continue
+            h += 1
+
+    @property
+    def exact(self):
+        return len(self.levels) == 1
+
+    def quantiles(self, qs):
+        qs = np.asarray(qs, dtype=np.float64)
+        if not self.n:
+            return np.full(qs.shape, np.nan)
+        if self.exact:
+            return np.quantile(self.levels[0], qs)
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(level), 2.0 ** h) for h, level in enumerate(self.levels)])
+        order = np.argsort(items, kind="stable")
+        items, cumulative = items[order], np.cumsum(weights[order])
+        ranks = np.searchsorted(cumulative, qs * cumulative[-1], side="left")
+        return items[np.minimum(ranks, len(items) - 1)]
+
+    def quantile(self, q):
+        return float(self.quantiles([q])[0])
+
+    def median(self):
+        return self.quantile(0.5)
+
+    def items(self):
+        # Values the sketch retains: actual input values, e.g. to draw as
+        # representative outliers.
+        return np.concatenate(self.levels)
+
+    def __len__(self):
+        return self.n
+
+
+class QuantileIndex:
+    # A KLL sketch per column for every observed combination of the filter
+    # dimensions. Quantiles for a selection pool the sketches of its cells, so
+    # medians and box statistics never sort the selected rows, and appends only
+    # sketch the new rows and merge them into their cells.
+    def __init__(self, df, columns=SKETCH_COLUMNS, dimensions=FILTER_COLUMNS, k=SKETCH_K):
+        self.dimensions = list(dimensions)
+        self.k = k
+        self.first_row, self.cells, grouping = self._cells_of(df)
+        self.sketches = {column: self._sketch_cells(df[column], *grouping) for column in columns}
+
+    def _cells_of(self, df):
+        # Observed cells of `df` (first row of each, dimension values) and the
+        # rows grouped by cell: a stable order and each cell's bounds in it.
+        code, _, _ = group_code(df, self.dimensions)
+        observed, cell_of_row = np.unique(code, return_inverse=True)
+        order = np.argsort(cell_of_row.astype(code_dtype(len(observed))), kind="stable")
+        bounds = np.concatenate([[0], np.cumsum(np.bincount(cell_of_row, minlength=len(observed)))])
+        first_row = order[bounds[:-1]]
+        cells = df[self.dimensions].iloc[first_row].reset_index(drop=True)
+        return first_row, cells, (cell_of_row, order, bounds)
+
+    def _sketch_cells(self, values, cell_of_row, order, bounds):
+        # Each cell's values sorted on their own (missing values sort last and
+        # are cut off) and sketched.
+        values = values.to_numpy(dtype=np.float64)
+        valid = np.bincount(cell_of_row, weights=~np.isnan(values), minlength=len(bounds) - 1).astype(np.int64)
+        grouped = values[order]
+        return [
+            KLLSketch.from_sorted(np.sort(grouped[bounds[i]:bounds[i + 1]])[:valid[i]], self.k)
+            for i in range(len(bounds) - 1)
+        ]
+
+    def extend(self, df, start):
+        # Index for `df` whose first `start` rows are sketched here. New rows
+        # are sketched per cell and merged in; unseen cells are appended.
+        delta = df.iloc[start:]
+        if not len(delta):
+            return self
+        first_row, delta_cells, grouping = self._cells_of(delta)
+
+        known = {key: i for i, key in enumerate(cell_keys(self.cells, self.dimensions))}
+        cell_ids, added = [], []
+        for i, key in enumerate(cell_keys(delta_cells, self.dimensions)):
+            if key not in known:
+                known[key] = len(self.cells) + len(added)
+                added.append(i)
+            cell_ids.append(known[key])
+
+        out = QuantileIndex.__new__(QuantileIndex)
+        out.dimensions = self.dimensions
+        out.k = self.k
+        out.first_row = np.concatenate([self.first_row, start + first_row[added]])
+        out.cells = pd.concat(
+            [self.cells.astype({d: df[d].dtype for d in self.dimensions}), delta_cells.iloc[added]],
+            ignore_index=True,
+        )
+        out.sketches = {}
+        for column, sketches in self.sketches.items():
+            sketches = sketches + [KLLSketch(self.k) for _ in added]
+            for i, more in enumerate(self._sketch_cells(delta[column], *grouping)):
+                if len(more):
+                    sketches[cell_ids[i]] = sketches[cell_ids[i]].merge(more)
+            out.sketches[column] = sketches
+        return out
+
+    def select(self, selections=None):
+        mask = np.ones(len(self.cells), dtype=bool)
+        for col, values in (selections or {}).items():
+            if values:
+                mask &= self.cells[col].isin(values).to_numpy()
+        return np.flatnonzero(mask)
+
+    def count(self, column, selections=None):
+        # Non-missing values of `column` in the selection.
+        sketches = self.sketches[column]
+        return sum(sketches[i].n for i in self.select(selections))
+
+    def sketch(self, column, selections=None):
+        sketches = self.sketches[column]
+        return KLLSketch.union(sketches[i] for i in self.select(selections))
+
+    def groups(self, column, by, selections=None):
+        # {value of `by`: sketch of `column`} over the selected cells, in order
+        # of first appearance in the data like groupby(sort=False).
+        cells = self.select(selections)
+        cells = cells[np.argsort(self.first_row[cells], kind="stable")]
+        sketches = self.sketches[column]
+        members = {}
+        for i, value in zip(cells, self.cells[by].to_numpy()[cells]):
+            if sketches[i].n and not pd.isna(value):
+                members.setdefault(value, []).append(sketches[i])
+        return {value: KLLSketch.union(parts, self.k) for value, parts in members.items()}
@@ -0,0 +1,204 @@
+# analytics/wire.py
+import base64
+import gzip
+import os
+from functools import wraps
+
+import numpy as np
+import plotly.io as pio
+from dash import Patch
+from flask import request
+
+from analytics.metrics import phase
+
+try:
+    import brotli
+except ImportError:  # optional; gzip is always available
+    brotli = None
+
+# WIRE_COMPACT=0 sends figures exactly as Plotly builds them.
+COMPACT = os.environ.get("WIRE_COMPACT", "1") != "0"
+COMPRESS = os.environ.get("WIRE_COMPRESS", "1") != "0"
+# Decimal places kept for float values; hover labels and ticks show fewer.
+DECIMALS = int(os.environ.get("WIRE_DECIMALS", "4"))
+# Shorter arrays stay plain JSON lists, where base64 would not pay off.
+MIN_TYPED_LENGTH = 8
+COMPRESS_MIN_BYTES = 1024
+COMPRESSIBLE_TYPES = ("application/json", "text/html", "text/css", "text/plain", "application/javascript")
+
+# Trace keys that may carry numeric arrays.
+ARRAY_KEYS = (
+    "x", "y", "z", "customdata", "q1", "median", "q3", "lowerfence", "upperfence", "mean", "sd", "base", "width",
+)
+# Typed-array dtypes Plotly.js decodes, smallest first.
+INT_DTYPES = (np.int8, np.uint8, np.int16, np.uint16, np.int32, np.uint32)
+
+# The parts of plotly_white the dashboard's charts use. The full template also
+# styles maps, 3D scenes, polar axes and two dozen trace types, and Plotly
+# embeds all of it (~7 KB) in every figure.
+TEMPLATE_LAYOUT_KEYS = (
+    "autotypenumbers", "colorway", "font", "hovermode", "hoverlabel", "paper_bgcolor", "plot_bgcolor",
+    "xaxis", "yaxis", "title",
+)
+TEMPLATE_TRACE_TYPES = ("bar", "box", "heatmap", "histogram", "scatter")
+
+
+def slim_template(name="plotly_white"):
+    full = pio.templates[name].to_plotly_json()
+    return {
+        "layout": {k: v for k, v in full["layout"].items() if k in TEMPLATE_LAYOUT_KEYS},
+        "data": {k: v for k, v in full["data"].items() if k in TEMPLATE_TRACE_TYPES},
+    }
+
+
+TEMPLATE = slim_template()
+
+
+def typed_array(values):
+    # Numeric array -> Plotly.js typed-array spec, using the smallest dtype that
+    # holds the values. Anything else is returned unchanged.
+    if isinstance(values, dict) and "bdata" in values:
+        arr = np.frombuffer(base64.b64decode(values["bdata"]), dtype=np.dtype(values["dtype"]))
+        if "shape" in values:
+            arr = arr.reshape([int(s) for s in str(values["shape"]).split(",")])
+    elif isinstance(values, (list, tuple, np.ndarray)):
+        arr = np.asarray(values)
+    else:
+        return values
+    if arr.dtype.kind not in "iuf" or arr.size == 0:
+        return values
+
+    if arr.dtype.kind == "f":
+        finite = np.isfinite(arr)
+        if finite.all() and np.array_equal(arr, np.round(arr)) and np.abs(arr).max() < 2 ** 31:
+            arr = arr.astype(np.int64)
+        else:
+            arr = np.round(arr, DECIMALS)
+            narrow = arr.astype(np.float32)
+            # float32 keeps ~7 significant digits; large totals stay float64.
+            if np.allclose(narrow[finite], arr[finite], rtol=0, atol=10 ** -DECIMALS):
+                arr = narrow
+    if arr.dtype.kind in "iu":
+        lo, hi = arr.min(), arr.max()
+        for dtype in INT_DTYPES:
+            info = np.iinfo(dtype)
+            if info.min <= lo and hi <= info.max:
+                arr = arr.astype(dtype)
+                break
+
+    if arr.ndim == 1 and arr.size < MIN_TYPED_LENGTH:
+        return arr.tolist()
+    spec = {"dtype": arr.dtype.str.lstrip("<|="), "bdata": base64.b64encode(arr.tobytes()).decode("ascii")}
+    if arr.ndim > 1:
+        spec["shape"] = ",".join(str(s) for s in arr.shape)
+    return spec
+
+
+def compact_figure(fig):
+    # Figure (or figure dict) -> plain dict with typed numeric arrays, rounded
+    # floats and the slim template.
+    figure = fig.to_dict() if hasattr(fig, "to_dict") else dict(fig)
+    data = []
+    for trace in figure.get("data", []):
+        trace = dict(trace)
+        for key in ARRAY_KEYS:
+            if key in trace:
+                trace[key] = typed_array(trace[key])
+        data.append(trace)
+    figure["data"] = data
+    layout = dict(figure.get("layout", {}))
+    if "template" in layout:
+        layout["template"] = TEMPLATE
+    figure["layout"] = layout
+    return figure
+
+
+def compact_patch(patch):
+    # dash.Patch -> its plain form, with the trace arrays it assigns compacted
+    # like those of a whole figure.
+    update = patch.to_plotly_json()
+    operations = []
+    for op in update["operations"]:
+        location = op["location"]
+        if op["operation"] == "Assign" and location[:1] == ["data"] and location[-1] in ARRAY_KEYS:
+            op = dict(op, params={"value": typed_array(op["params"]["value"])})
+        operations.append(op)
+    return dict(update, operations=operations)
+
+
+def compact_outputs(func):
+    # Callback decorator, innermost so cached and precomputed outputs are
+    # stored already compacted.
+    if not COMPACT:
+        return func
+
+    def convert(value):
+        if isinstance(value, Patch):
+            return compact_patch(value)
+        if hasattr(value, "to_plotly_json") and hasattr(value, "to_dict"):
+            return compact_figure(value)
+        # Figures already in dict form, e.g. rendered from a bar skeleton.
+        if isinstance(value, dict) and "data" in value and "layout" in value:
+            return compact_figure(value)
+        return value
+
+    @wraps(func)
+    def wrapper(*args):
+        result = func(*args)
+        with phase("serialize"):
+            if isinstance(result, tuple):
+                return tuple(convert(v) for v in result)
+            return convert(result)
+
+    return wrapper
+
+
+def accepted_encodings(header):
+    # Content codings an Accept-Encoding header allows; "gzip;q=0" refuses gzip.
+    accepted = set()
+    for part in header.split(","):
+        coding, *params = [p.strip() for p in part.split(";")]
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding and q > 0:
+            accepted.add(coding.lower())
+    return accepted
+
+
+def install_compression(server):
+    # Compresses JSON and static responses from the Flask server: brotli when
+    # the optional `brotli` package is installed and the client accepts it,
+    # gzip otherwise.
+    if not COMPRESS:
+        return
+
+    @server.after_request
+    def compress_response(response):
+        if (
+            response.direct_passthrough
+            or response.status_code != 200
+            or "Content-Encoding" in response.headers
+            or response.mimetype not in COMPRESSIBLE_TYPES
+        ):
+            return response
+        body = response.get_data()
+        if len(body) < COMPRESS_MIN_BYTES:
+            return response
+        accepted = accepted_encodings(request.headers.get("Accept-Encoding", ""))
+        if brotli is not None and "br" in accepted:
+            response.set_data(brotli.compress(body, quality=4))
+            response.headers["Content-Encoding"] = "br"
+        elif "gzip" in accepted:
+            response.set_data(gzip.compress(body, compresslevel=5))
+            response.headers["Content-Encoding"] = "gzip"
+        else:
+            return response
+        response.vary.add("Accept-Encoding")
+        return response
+
@@ -0,0 +1,176 @@
+// assets/client_filtering.js
+// Clientside half of CLIENT_FILTERING=1 (see analytics/bundle.py): the KPI
+// cards and cube-backed charts recomputed in the browser from the page's
+// bundle of per-cell sums, counts and histogram bins.
+(function () {
+    const TYPES = {
+        i1: Int8Array, u1: Uint8Array, i2: Int16Array, u2: Uint16Array,
+        i4: Int32Array, u4: Uint32Array, f4: Float32Array, f8: Float64Array,
+    };
+    const decoded = new WeakMap();
+
+    // Plotly typed-array spec ({dtype, bdata}) or plain list -> array.
+    function decode(values) {
+        if (!values || Array.isArray(values)) {
+            return values || [];
+        }
+        let array = decoded.get(values);
+        if (!array) {
+            const bytes = Uint8Array.from(atob(values.bdata), (c) => c.charCodeAt(0));
+            array = new TYPES[values.dtype](bytes.buffer);
+            decoded.set(values, array);
+        }
+        return array;
+    }
+
+    // Rolled-up cells matching every non-empty selection, like Cube.select.
+    function selectedCells(bundle, values) {
+        const n = decode(bundle.cells[bundle.filters[0]]).length;
+        let cells = Array.from({length: n}, (_, i) => i);
+        bundle.filters.forEach((dim, k) => {
+            if (!values[k] || !values[k].length) {
+                return;
+            }
+            const wanted = new Set(values[k].map(String));
+            const allowed = bundle.labels[dim].map((label) => wanted.has(label));
+            const codes = decode(bundle.cells[dim]);
+            cells = cells.filter((i) => allowed[codes[i]]);
+        });
+        return cells;
+    }
+
+    function finish(sum, count, how) {
+        return how === 'mean' ? (count ? sum / count : NaN) : sum;
+    }
+
+    // Rounds to `decimals` places like Python's format(): exact ties go to the
+    // even digit, where toFixed would round them up.
+    function round(value, decimals) {
+        const scale = 10 ** decimals;
+        const scaled = value * scale;
+        if (Math.abs(scaled % 1) === 0.5 && scaled / scale === value) {
+            return 2 * Math.round(scaled / 2) / scale;
+        }
+        return value;
+    }
+
+    // Formats like the server's f-strings; NaN shows as "nan" unless the
+    // spec has a value for an empty selection.
+    function kpi(bundle, spec, cells) {
+        const sums = decode(bundle.measures[spec.measure].sum);
+        const counts = decode(bundle.measures[spec.measure].count);
+        let sum = 0, count = 0;
+        cells.forEach((i) => { sum += sums[i]; count += counts[i]; });
+        const empty = !count && spec.empty !== null && spec.empty !== undefined;
+        const value = empty ? spec.empty : round(finish(sum, count, spec.how) * spec.scale, spec.decimals);
+        let text;
+        if (Number.isNaN(value)) {
+            text = 'nan';
+        } else if (spec.grouping) {
+            text = value.toLocaleString('en-US', {
+                minimumFractionDigits: spec.decimals, maximumFractionDigits: spec.decimals,
+            });
+        } else {
+            text = value.toFixed(spec.decimals);
+        }
+        return spec.prefix + text + spec.suffix;
+    }
+
+    // The skeleton filled like BarSkeleton.full: per trace (one value of the
+    // color column) the x values present in the selection and their measure.
+    function bar(bundle, spec, cells) {
+        const sums = decode(bundle.measures[spec.measure].sum);
+        const counts = decode(bundle.measures[spec.measure].count);
+        const xs = decode(bundle.cells[spec.x]);
+        const colors = decode(bundle.cells[spec.color]);
+        const width = bundle.labels[spec.x].length;
+        const groups = new Map();
+        cells.forEach((i) => {
+            const key = colors[i] * width + xs[i];
+            const group = groups.get(key) || {sum: 0, count: 0};
+            group.sum += sums[i];
+            group.count += counts[i];
+            groups.set(key, group);
+        });
+        const data = spec.figure.data.map((trace, t) => {
+            const x = [], y = [];
+            for (let code = 0; code < width; code++) {
+                const group = groups.get(spec.traces[t] * width + code);
+                if (group) {
+                    x.push(bundle.labels[spec.x][code]);
+                    y.push(finish(group.sum, group.count, spec.how));
+                }
+            }
+            return Object.assign({}, trace, {x: x, y: y, visible: x.length > 0});
+        });
+        return {data: data, layout: spec.figure.layout};
+    }
+
+    // Pre-binned counts like HistogramIndex.figure: one trace per value of
+    // the color column present in the selection.
+    function histogram(bundle, spec, cells) {
+        const hist = bundle.histograms[spec.column];
+        const counts = decode(hist.counts);
+        const colors = decode(bundle.cells[spec.color]);
+        const totals = new Map();
+        cells.forEach((i) => {
+            const total = totals.get(colors[i]) || new Array(hist.bins).fill(0);
+            for (let b = 0; b < hist.bins; b++) {
+                total[b] += counts[i * hist.bins + b];
+            }
+            totals.set(colors[i], total);
+        });
+        const data = [];
+        Array.from(totals.keys()).sort((a, b) => a - b).forEach((code, k) => {
+            const name = bundle.labels[spec.color][code];
+            const total = totals.get(code);
+            const trace = {
+                type: 'bar', name: name, marker: {color: hist.colors[k % hist.colors.length]},
+                hovertemplate: spec.color + '=' + name + '<br>' + spec.column + '=%{x}<br>count=%{y}<extra></extra>',
+            };
+            if (hist.labels) {
+                const keep = total.map((c) => c > 0);
+                trace.x = hist.labels.filter((_, b) => keep[b]);
+                trace.y = total.filter((_, b) => keep[b]);
+            } else {
+                trace.x = Array.from(decode(hist.x));
+                trace.y = total;
+                trace.width = Array.from(decode(hist.width));
+            }
+            data.push(trace);
+        });
+        return {data: data, layout: spec.layout};
+    }
+
+    function output(bundle, spec, cells, values) {
+        if (spec.kind === 'kpi') {
+            return kpi(bundle, spec, cells);
+        }
+        if (spec.kind === 'histogram') {
+            return histogram(bundle, spec, cells);
+        }
+        const when = spec.when && values[bundle.filters.indexOf(spec.when)];
+        if (spec.histogram && when && when.length) {
+            return histogram(bundle, spec.histogram, cells);
+        }
+        return bar(bundle, spec, cells);
+    }
+
+    window.dash_clientside = window.dash_clientside || {};
+    window.dash_clientside.supplyChain = {
+        // (bundle, filter values..., states...) -> the outputs of the calling
+        // callback, found by component id; others (e.g. the charts-sent
+        // stores) are left unchanged.
+        render: function (bundle, ...values) {
+            const noUpdate = window.dash_clientside.no_update;
+            const outputs = window.dash_clientside.callback_context.outputs_list;
+            const many = Array.isArray(outputs);
+            const cells = bundle ? selectedCells(bundle, values) : null;
+            const results = (many ? outputs : [outputs]).map((out) => {
+                const spec = bundle && bundle.outputs[out.id];
+                return spec ? output(bundle, spec, cells, values) : noUpdate;
+            });
+            return many ? results : results[0];
+        },
+    };
+})();
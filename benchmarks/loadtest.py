@@ -0,0 +1,546 @@
+# benchmarks/loadtest.py
+# Load-tests the app over HTTP: starts `gunicorn index:server` (or the app
+# in-process) and has concurrent virtual users replay filter sessions as POSTs
+# to /_dash-update-component, for every worker count and concurrency level:
+#   python -m benchmarks.loadtest --workers 1,2,4 --concurrency 1,8,32 --duration 20
+# A session opens a page (the page-content callback, then every callback of
+# the page like the browser's initial load) and changes its filters or turns a
+# table page a few times, firing the callbacks that depend on what changed and
+# carrying their outputs (the charts-sent stores, table paging) forward. Each
+# user sends its requests one after another, so the concurrency level is the
+# number of requests in flight. Reports throughput, latency percentiles, error
+# rate and per-worker RSS/PSS from /proc.
+import argparse
+import gzip
+import http.client
+import json
+import logging
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+# Measure the callbacks, not the cache; export CACHE_BACKEND=memory (or run
+# scripts/precompute.py) to measure the app as deployed.
+os.environ.setdefault("CACHE_BACKEND", "off")
+os.environ.setdefault("PRECOMPUTED", "0")
+
+import numpy as np
+
+from analytics.data import BASE_DIR
+from benchmarks.run import PAGES, RESULTS_DIR, git_commit, percentile
+
+UPDATE_PATH = "/_dash-update-component"
+HEADERS = {"Content-Type": "application/json", "Accept-Encoding": "gzip"}
+# Callback that renders a page into the page container (use_pages).
+PAGE_CONTENT = "_pages_content.children"
+# Share of interactions that turn a table page instead of changing a filter.
+PAGING_SHARE = 0.2
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def post(conn, path, body):
+    # (status, decoded JSON or None) for one request on a kept-alive connection.
+    conn.request("POST", path, json.dumps(body), HEADERS)
+    response = conn.getresponse()
+    data = response.read()
+    if response.getheader("Content-Encoding") == "gzip":
+        data = gzip.decompress(data)
+    return response.status, json.loads(data) if response.status == 200 and data else None
+
+
+def get(port, path):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    try:
+        conn.request("GET", path)
+        response = conn.getresponse()
+        return response.status, response.read()
+    finally:
+        conn.close()
+
+
+def split_output(output):
+    # Dash's callback id -> [(component id, property)]; several outputs are
+    # written "..a.children...b.figure..".
+    parts = output[2:-2].split("...") if output.startswith("..") else [output]
+    return [tuple(part.rsplit(".", 1)) for part in parts]
+
+
+class Callback:
+    def __init__(self, spec):
+        self.output = spec["output"]
+        self.outputs = split_output(self.output)
+        self.multi = self.output.startswith("..")
+        self.inputs = [(i["id"], i["property"]) for i in spec["inputs"]]
+        self.state = [(s["id"], s["property"]) for s in spec["state"]]
+        self.clientside = bool(spec.get("clientside_function"))
+
+    def body(self, props, changed):
+        # Request body the renderer sends; properties the component does not
+        # have are sent without a value, as the renderer does.
+        def values(deps):
+            out = []
+            for id, prop in deps:
+                item = {"id": id, "property": prop}
+                if prop in props.get(id, {}):
+                    item["value"] = props[id][prop]
+                out.append(item)
+            return out
+
+        outputs = [{"id": id, "property": prop} for id, prop in self.outputs]
+        return {
+            "output": self.output,
+            "outputs": outputs if self.multi else outputs[0],
+            "inputs": values(self.inputs),
+            "state": values(self.state),
+            "changedPropIds": [f"{id}.{prop}" for id, prop in changed],
+        }
+
+
+def components(layout, found=None):
+    # {component id: props} of every component with an id in a layout tree.
+    found = {} if found is None else found
+    if isinstance(layout, list):
+        for child in layout:
+            components(child, found)
+    elif isinstance(layout, dict) and "props" in layout:
+        props = layout["props"]
+        if "id" in props and isinstance(props["id"], str):
+            found[props["id"]] = {k: v for k, v in props.items() if k != "children"}
+        components(props.get("children"), found)
+    return found
+
+
+class App:
+    # The app's callbacks, fetched from /_dash-dependencies.
+    def __init__(self, port):
+        status, body = get(port, "/_dash-dependencies")
+        if status != 200:
+            raise RuntimeError(f"/_dash-dependencies returned HTTP {status}")
+        self.callbacks = [Callback(spec) for spec in json.loads(body)]
+        self.page_content = next(c for c in self.callbacks if PAGE_CONTENT in c.output)
+        # Properties some callback reads; only these are carried forward.
+        self.read = {dep for c in self.callbacks for dep in c.inputs + c.state}
+
+    def page_callbacks(self, props):
+        # Server-side callbacks whose inputs are all on the page.
+        return [
+            c for c in self.callbacks
+            if not c.clientside and c is not self.page_content and all(id in props for id, _ in c.inputs)
+        ]
+
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = []  # (page, output, seconds, ok)
+        self.recording = False
+
+    def add(self, page, output, seconds, ok):
+        if self.recording:
+            with self.lock:
+                self.samples.append((page, output, seconds, ok))
+
+
+class Session:
+    # One virtual user: opens pages and interacts with them over its own
+    # kept-alive connection.
+    def __init__(self, app, port, pages, interactions, recorder, rng):
+        self.app = app
+        self.port = port
+        self.pages = pages
+        self.interactions = interactions
+        self.recorder = recorder
+        self.rng = rng
+        self.conn = None
+
+    def request(self, page, callback, props, changed):
+        # (status, payload); status is None when the connection failed.
+        if self.conn is None:
+            self.conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=120)
+        start = time.perf_counter()
+        try:
+            status, payload = post(self.conn, UPDATE_PATH, callback.body(props, changed))
+        except (OSError, http.client.HTTPException, ValueError):
+            self.conn.close()
+            self.conn = None
+            status, payload = None, None
+        # 204: the callback prevented the update.
+        self.recorder.add(page, callback.output, time.perf_counter() - start, status in (200, 204))
+        return status, payload
+
+    def call(self, page, callback, props, changed):
+        # Properties the response changed, after applying it to `props`.
+        _, payload = self.request(page, callback, props, changed)
+        updated = []
+        for id, values in ((payload or {}).get("response") or {}).items():
+            for prop, value in values.items():
+                if (id, prop) in self.app.read and props.setdefault(id, {}).get(prop) != value:
+                    props[id][prop] = value
+                    updated.append((id, prop))
+        return updated
+
+    def fire(self, page, callbacks, props, changed):
+        # Fires the callbacks reading a changed property, like the renderer:
+        # one waits while another pending callback outputs one of its inputs,
+        # and outputs that change properties fire their readers in turn.
+        pending = [c for c in callbacks if changed is None or set(c.inputs) & set(changed)]
+        fired = set()
+        while pending:
+            blocked = {dep for c in pending for dep in c.outputs}
+            ready = next((c for c in pending if not set(c.inputs) & blocked), pending[0])
+            pending.remove(ready)
+            fired.add(ready.output)
+            updated = self.call(page, ready, props, changed or [])
+            for c in callbacks:
+                if c.output not in fired and c not in pending and set(c.inputs) & set(updated):
+                    pending.append(c)
+
+    def open(self, page):
+        props = {"_pages_location": {"pathname": "/" + page, "search": ""}}
+        status, payload = self.request(page, self.app.page_content, props, [("_pages_location", "pathname")])
+        if status != 200:
+            return None, []
+        props.update(components(payload["response"]["_pages_content"]["children"]))
+        callbacks = self.app.page_callbacks(props)
+        self.fire(page, callbacks, props, None)
+        return props, callbacks
+
+    def interact(self, page, props, callbacks):
+        tables = [id for id, p in props.items() if p.get("page_count", 0) > 1]
+        if tables and self.rng.random() < PAGING_SHARE:
+            table = self.rng.choice(tables)
+            props[table]["page_current"] = self.rng.randrange(props[table]["page_count"])
+            changed = (table, "page_current")
+        else:
+            filters = [id for id, p in props.items() if p.get("options") and p.get("multi")]
+            id = self.rng.choice(filters)
+            options = [o["value"] if isinstance(o, dict) else o for o in props[id]["options"]]
+            if props[id].get("value") and self.rng.random() < 0.25:
+                props[id]["value"] = None
+            else:
+                props[id]["value"] = sorted(self.rng.sample(options, self.rng.randint(1, min(2, len(options)))))
+            changed = (id, "value")
+        self.fire(page, callbacks, props, [changed])
+
+    def run(self, until):
+        while time.perf_counter() < until:
+            page = self.rng.choice(self.pages)
+            props, callbacks = self.open(page)
+            if props is None:
+                continue
+            for _ in range(self.interactions):
+                if time.perf_counter() >= until:
+                    break
+                self.interact(page, props, callbacks)
+        if self.conn is not None:
+            self.conn.close()
+
+
+# Worker processes and their memory, from /proc (Linux only).
+
+def proc_status(pid, field):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def proc_pss(pid):
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def proc_cpu(pid):
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        return int(fields[11]) + int(fields[12])
+    except (OSError, IndexError):
+        return None
+
+
+def children(pid):
+    found = []
+    for entry in os.listdir("/proc") if os.path.isdir("/proc") else []:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == pid:
+            found.append(int(entry))
+    return sorted(found)
+
+
+class MemorySampler(threading.Thread):
+    # Peak RSS per worker while the load runs; PSS (shared pages split between
+    # the processes mapping them) at the end.
+    def __init__(self, pids, interval=0.5):
+        super().__init__(daemon=True)
+        self.pids = pids
+        self.interval = interval
+        self.peak = {pid: 0 for pid in pids}
+        self.stopped = threading.Event()
+
+    def sample(self):
+        for pid in self.pids:
+            rss = proc_status(pid, "VmRSS")
+            if rss is not None:
+                self.peak[pid] = max(self.peak[pid], rss)
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.sample()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+        self.sample()
+        return [
+            {"pid": pid, "peak_rss_bytes": self.peak[pid] or None, "pss_bytes": proc_pss(pid)}
+            for pid in self.pids
+        ]
+
+
+# Servers.
+
+class GunicornServer:
+    def __init__(self, workers, threads, startup_timeout):
+        self.workers = workers
+        self.port = free_port()
+        # A file rather than a pipe, which would block gunicorn once full.
+        self.log = tempfile.TemporaryFile()
+        self.proc = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "index:server", "--workers", str(workers),
+             "--threads", str(threads), "--bind", f"127.0.0.1:{self.port}"],
+            cwd=BASE_DIR, stdout=subprocess.DEVNULL, stderr=self.log,
+        )
+        try:
+            self.wait_ready(startup_timeout)
+        except BaseException:
+            self.stop()
+            raise
+
+    def worker_pids(self):
+        return children(self.proc.pid)
+
+    def wait_ready(self, timeout):
+        # Serving, and every worker done loading: all of them exist and have
+        # stopped burning CPU.
+        deadline = time.monotonic() + timeout
+        last = None
+        while time.monotonic() < deadline:
+            if self.proc.poll() is not None:
+                self.log.seek(0)
+                raise RuntimeError("gunicorn exited during startup:\n" + self.log.read().decode()[-2000:])
+            time.sleep(0.5)
+            try:
+                if get(self.port, "/_cache-stats")[0] != 200:
+                    continue
+            except OSError:
+                continue
+            pids = self.worker_pids()
+            if not os.path.isdir("/proc"):
+                return
+            cpu = [proc_cpu(pid) for pid in pids]
+            if len(pids) == self.workers and cpu == last:
+                return
+            last = cpu
+        raise RuntimeError(f"gunicorn did not start within {timeout}s")
+
+    def stop(self):
+        self.proc.terminate()
+        try:
+            self.proc.wait(30)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+            self.proc.wait()
+        self.log.close()
+
+
+class InProcessServer:
+    # The app on a threaded werkzeug server in this process. There is one
+    # "worker", and its memory includes the load generator.
+    workers = 1
+
+    def __init__(self, workers, threads, startup_timeout):
+        from werkzeug.serving import make_server
+
+        import index
+
+        # Quiet werkzeug's line per request.
+        logging.getLogger("werkzeug").setLevel(logging.WARNING)
+        self.port = free_port()
+        self.httpd = make_server("127.0.0.1", self.port, index.server, threaded=True)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    def worker_pids(self):
+        return [os.getpid()]
+
+    def stop(self):
+        self.httpd.shutdown()
+
+
+SERVERS = {"gunicorn": GunicornServer, "inprocess": InProcessServer}
+
+
+def load(server, app, pages, concurrency, duration, interactions, seed):
+    recorder = Recorder()
+    until = time.perf_counter() + duration
+    sessions = [
+        Session(app, server.port, pages, interactions, recorder, random.Random(seed * 100003 + user))
+        for user in range(concurrency)
+    ]
+    threads = [threading.Thread(target=s.run, args=(until,), daemon=True) for s in sessions]
+    sampler = MemorySampler(server.worker_pids())
+    sampler.start()
+    recorder.recording = True
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    workers = sampler.stop()
+    return summarize(recorder.samples, elapsed, workers)
+
+
+def latency_stats(samples):
+    latencies = [seconds for *_, seconds, ok in samples if ok]
+    return {
+        "requests": len(samples),
+        "errors": len(samples) - len(latencies),
+        "error_rate": (len(samples) - len(latencies)) / len(samples) if samples else None,
+        "p50_ms": percentile(latencies, 50) * 1000 if latencies else None,
+        "p95_ms": percentile(latencies, 95) * 1000 if latencies else None,
+        "p99_ms": percentile(latencies, 99) * 1000 if latencies else None,
+        "mean_ms": float(np.mean(latencies)) * 1000 if latencies else None,
+    }
+
+
+def summarize(samples, elapsed, workers):
+    stats = latency_stats(samples)
+    rss = [w["peak_rss_bytes"] for w in workers if w["peak_rss_bytes"]]
+    pss = [w["pss_bytes"] for w in workers if w["pss_bytes"]]
+    stats.update(
+        duration_s=elapsed,
+        throughput_per_s=stats["requests"] / elapsed,
+        worker_rss_max_bytes=max(rss) if rss else None,
+        worker_pss_total_bytes=sum(pss) if pss else None,
+        worker_memory=workers,
+        pages={page: latency_stats([s for s in samples if s[0] == page]) for page in sorted({s[0] for s in samples})},
+        callbacks={
+            output: latency_stats([s for s in samples if s[1] == output])
+            for output in sorted({s[1] for s in samples})
+        },
+    )
+    return stats
+
+
+def ms(value):
+    return f"{value:8.1f}" if value is not None else f"{'-':>8}"
+
+
+def mib(value):
+    return f"{value / 2**20:7.0f}" if value is not None else f"{'-':>7}"
+
+
+def run(kind, workers, threads, concurrency, pages, duration, interactions, seed, startup_timeout):
+    results = []
+    for n_workers in workers:
+        start = time.perf_counter()
+        server = SERVERS[kind](n_workers, threads, startup_timeout)
+        try:
+            startup_s = time.perf_counter() - start
+            app = App(server.port)
+            print(f"{kind} with {server.workers} worker(s) ready in {startup_s:.1f}s", file=sys.stderr)
+            # One pass over every page so the first users do not pay for
+            # lazy imports and first figure builds.
+            warmup = Session(app, server.port, pages, 1, Recorder(), random.Random(seed))
+            for page in pages:
+                props, callbacks = warmup.open(page)
+                if props is not None:
+                    warmup.interact(page, props, callbacks)
+            for users in concurrency:
+                stats = load(server, app, pages, users, duration, interactions, seed)
+                stats.update(server=kind, workers=server.workers, threads=threads, concurrency=users,
+                             startup_s=startup_s)
+                results.append(stats)
+                print(
+                    f"{'':>4}{users:>4} users  {stats['throughput_per_s']:7.1f} req/s  p50 {ms(stats['p50_ms'])} ms  "
+                    f"p95 {ms(stats['p95_ms'])} ms  p99 {ms(stats['p99_ms'])} ms  "
+                    f"errors {stats['error_rate'] or 0:6.2%}  worker RSS {mib(stats['worker_rss_max_bytes'])} MiB  "
+                    f"PSS total {mib(stats['worker_pss_total_bytes'])} MiB",
+                    file=sys.stderr,
+                )
+        finally:
+            server.stop()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the dashboard's callback endpoint over HTTP.")
+    parser.add_argument("--server", choices=SERVERS, default="gunicorn",
+                        help="gunicorn subprocess, or the app in this process (one worker)")
+    parser.add_argument("--workers", default="1,2", help="comma-separated gunicorn worker counts")
+    parser.add_argument("--threads", type=int, default=int(os.environ.get("GUNICORN_THREADS", "8")),
+                        help="threads per gunicorn worker")
+    parser.add_argument("--concurrency", default="1,4,16", help="comma-separated numbers of virtual users")
+    parser.add_argument("--pages", default=",".join(PAGES), help="comma-separated subset of pages")
+    parser.add_argument("--duration", type=float, default=10, help="seconds per worker count and concurrency")
+    parser.add_argument("--interactions", type=int, default=5, help="filter changes per page visit")
+    parser.add_argument("--startup-timeout", type=float, default=300, help="seconds to wait for the workers")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="JSON file to write (default: benchmarks/results/loadtest-<timestamp>.json)")
+    args = parser.parse_args()
+
+    workers = [int(w) for w in args.workers.split(",")]
+    if args.server == "inprocess":
+        workers = [1]
+    concurrency = [int(c) for c in args.concurrency.split(",")]
+    results = run(args.server, workers, args.threads, concurrency, args.pages.split(","), args.duration,
+                  args.interactions, args.seed, args.startup_timeout)
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "commit": git_commit(),
+            "server": args.server,
+            "duration_s": args.duration,
+            "interactions": args.interactions,
+            "seed": args.seed,
+            "cache_backend": os.environ["CACHE_BACKEND"],
+        },
+        "results": results,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, "loadtest-" + time.strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# benchmarks/patch.py
+# Compares the ways the cube-backed bar charts can answer a filter change, on
+# synthetic data over a matrix of filter selections:
+#   python -m benchmarks.patch --size 1e5
+# "rebuild" is a new px.bar figure per chart (what the callbacks used to do),
+# "skeleton" a copy of the prebuilt skeleton with the new arrays (the first
+# response) and "patch" the dash.Patch sent afterwards. Times cover building
+# and compacting the figures of one page's bar charts; aggregation is the same
+# for all three and left out. Bytes are the serialized (uncompressed) outputs.
+import argparse
+import importlib
+import json
+import os
+import sys
+import time
+
+os.environ.setdefault("CACHE_BACKEND", "off")
+os.environ.setdefault("PRECOMPUTED", "0")
+
+import numpy as np
+import plotly.express as px
+from plotly.io.json import to_json_plotly
+
+from analytics.data import Dataset, set_dataset
+from analytics.wire import compact_figure, compact_patch
+from benchmarks.run import PAGES, RESULTS_DIR, git_commit, percentile, selection_matrix
+from benchmarks.synthetic import generate
+
+# Per page: the aggregation plan behind its bar charts and the result each
+# chart plots.
+CHARTS = {
+    "sales": ("SALES_CHART_PLAN", {
+        "bar-revenue-by-product": "revenue_by_type",
+        "bar-sales-by-location": "sold_by_location",
+    }),
+    "logistics": ("LOGISTICS_CHART_PLAN", {
+        "shipping-cost-bar": "cost_by_mode",
+        "availability-bar": "stock_by_location",
+    }),
+    "production": ("PRODUCTION_CHART_PLAN", {
+        "bar-manuf-costs": "cost_by_supplier",
+        "bar-defect-rates": "defect_by_type",
+    }),
+}
+
+
+def rebuild(skeleton, frame, title):
+    return compact_figure(px.bar(
+        frame, x=skeleton.x, y=skeleton.y, color=skeleton.color, title=title, **skeleton.kwargs
+    ))
+
+
+def from_skeleton(skeleton, frame, title):
+    return compact_figure(skeleton.full(frame, title))
+
+
+def patch(skeleton, frame, title):
+    return compact_patch(skeleton.patch(frame, title))
+
+
+MODES = {"rebuild": rebuild, "skeleton": from_skeleton, "patch": patch}
+
+
+def bench_page(name, ds, matrix):
+    module = importlib.import_module(PAGES[name])
+    plan_name, charts = CHARTS[name]
+    plan = getattr(module, plan_name)
+    start = time.perf_counter()
+    skeletons = module.chart_skeletons(ds)
+    skeleton_ms = (time.perf_counter() - start) * 1000
+    titles = {graph: skeletons[graph].figure["layout"]["title"]["text"] for graph in charts}
+
+    timings = {mode: [] for mode in MODES}
+    payloads = {mode: [] for mode in MODES}
+    for args in matrix:
+        agg = ds.cube.run(plan, dict(zip(module.PAGE_FILTERS, args)))
+        for mode, render in MODES.items():
+            start = time.perf_counter()
+            outputs = [render(skeletons[graph], agg[key], titles[graph]) for graph, key in charts.items()]
+            timings[mode].append((time.perf_counter() - start) * 1000)
+            payloads[mode].append(len(to_json_plotly(outputs).encode()))
+
+    stats = {"page": name, "rows": len(ds.frame), "skeleton_build_ms": skeleton_ms}
+    for mode in MODES:
+        stats[f"{mode}_p50_ms"] = percentile(timings[mode], 50)
+        stats[f"{mode}_p95_ms"] = percentile(timings[mode], 95)
+        stats[f"{mode}_bytes_mean"] = float(np.mean(payloads[mode]))
+    print(
+        f"{name:<11} " + "  ".join(
+            f"{mode} {stats[f'{mode}_p50_ms']:6.2f} ms {stats[f'{mode}_bytes_mean'] / 1024:6.1f} KiB" for mode in MODES
+        ) + f"  (skeletons built once in {skeleton_ms:.1f} ms)",
+        file=sys.stderr,
+    )
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bar chart rebuilds against skeletons and patches.")
+    parser.add_argument("--size", type=float, default=1e5, help="synthetic rows")
+    parser.add_argument("--pages", default=",".join(CHARTS), help="comma-separated subset of pages")
+    parser.add_argument("--selections", type=int, default=40, help="filter selections per page")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="JSON file to write (default: benchmarks/results/patch-<timestamp>.json)")
+    args = parser.parse_args()
+
+    import index  # noqa: F401  registers the pages and their callbacks
+
+    frame = generate(int(args.size), seed=args.seed)
+    ds = Dataset(frame, f"synthetic-{len(frame)}-{args.seed}")
+    set_dataset(ds)
+    results = []
+    for name in args.pages.split(","):
+        module = importlib.import_module(PAGES[name])
+        matrix = selection_matrix(frame, module.PAGE_FILTERS, args.selections, args.seed)
+        results.append(bench_page(name, ds, matrix))
+    output = args.output or os.path.join(RESULTS_DIR, "patch-" + time.strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({"commit": git_commit(), "selections": args.selections, "results": results}, f, indent=2)
+    print(f"Results written to {output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
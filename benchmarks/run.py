@@ -0,0 +1,192 @@
+# benchmarks/run.py
+# Calls the page callbacks directly on synthetic data and reports latency,
+# throughput, payload size and peak memory:
+#   python -m benchmarks.run --sizes 1000,100000,1000000 --output results.json
+#   python -m benchmarks.run --compare benchmarks/results/old.json
+import argparse
+import importlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+# Measure the callbacks themselves, not the cache or the instrumentation.
+os.environ.setdefault("CACHE_BACKEND", "off")
+os.environ.setdefault("PRECOMPUTED", "0")
+os.environ.setdefault("METRICS", "0")
+
+import numpy as np
+from plotly.io.json import to_json_plotly
+
+from analytics.data import BASE_DIR, Dataset, set_dataset
+from analytics.partitions import cluster
+from benchmarks.synthetic import generate
+
+RESULTS_DIR = os.path.join(BASE_DIR, "benchmarks", "results")
+
+PAGES = {"sales": "pages.sales", "logistics": "pages.logistics", "production": "pages.production"}
+
+
+def selection_matrix(frame, columns, limit, seed=0):
+    # No filter, every single value of every filter, then random mixes of
+    # multi-value selections across filters.
+    rng = np.random.default_rng(seed)
+    values = {c: frame[c].cat.categories.tolist() for c in columns}
+    matrix = [tuple(None for _ in columns)]
+    for i, column in enumerate(columns):
+        for value in values[column]:
+            matrix.append(tuple([value] if j == i else None for j in range(len(columns))))
+    while len(matrix) < limit:
+        args = []
+        for column in columns:
+            if rng.random() < 0.5:
+                args.append(None)
+            else:
+                k = rng.integers(1, len(values[column]) + 1)
+                args.append(sorted(rng.choice(values[column], k, replace=False).tolist()))
+        matrix.append(tuple(args))
+    return matrix[:limit]
+
+
+def percentile(samples, q):
+    return float(np.percentile(samples, q)) if samples else None
+
+
+def bench_page(funcs, matrix, repeat, memory):
+    # A page is several callbacks the browser requests in parallel: latency is
+    # their total work, first paint the KPI callback (listed first) and the
+    # critical path the slowest one.
+    latencies, first_paint, critical, payloads, peaks = [], [], [], [], []
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for args in matrix:
+            if memory:
+                tracemalloc.reset_peak()
+                base = tracemalloc.get_traced_memory()[0]
+            timings, outputs = [], []
+            for func in funcs:
+                start = time.perf_counter()
+                outputs.append(func(*args))
+                timings.append(time.perf_counter() - start)
+            latencies.append(sum(timings))
+            first_paint.append(timings[0])
+            critical.append(max(timings))
+            if memory:
+                peaks.append(tracemalloc.get_traced_memory()[1] - base)
+            payloads.append(sum(len(to_json_plotly(o).encode()) for o in outputs))
+    elapsed = time.perf_counter() - started
+    return {
+        "calls": len(latencies),
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "mean_ms": float(np.mean(latencies)) * 1000,
+        "first_paint_p50_ms": percentile(first_paint, 50) * 1000,
+        "critical_path_p50_ms": percentile(critical, 50) * 1000,
+        # Payload encoding is excluded from latency but included here.
+        "throughput_per_s": len(latencies) / elapsed,
+        "payload_bytes_mean": float(np.mean(payloads)),
+        "payload_bytes_max": int(max(payloads)),
+        "peak_alloc_bytes": int(max(peaks)) if peaks else None,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sizes, pages, selections, repeat, memory, seed):
+    import index  # noqa: F401  registers the pages and their callbacks
+
+    modules = {name: importlib.import_module(PAGES[name]) for name in pages}
+    if memory:
+        tracemalloc.start()
+    results = []
+    for n_rows in sizes:
+        start = time.perf_counter()
+        # Stored like the columnar copy, grouped by partition.
+        frame = cluster(generate(n_rows, seed=seed))
+        set_dataset(Dataset(frame, f"synthetic-{n_rows}-{seed}").warm())
+        build_s = time.perf_counter() - start
+        print(f"{n_rows:>10,} rows  generated + indexed in {build_s:.2f}s", file=sys.stderr)
+        for name in pages:
+            funcs = modules[name].PAGE_CALLBACKS
+            matrix = selection_matrix(frame, modules[name].PAGE_FILTERS, selections, seed)
+            for func in funcs:
+                func(*matrix[0])  # warm-up: imports, first figure build
+            stats = bench_page(funcs, matrix, repeat, memory)
+            stats.update(page=name, rows=n_rows, build_s=build_s)
+            results.append(stats)
+            print(
+                f"{'':>10}  {name:<11} p50 {stats['p50_ms']:8.1f} ms  p95 {stats['p95_ms']:8.1f} ms  "
+                f"first paint {stats['first_paint_p50_ms']:7.1f} ms  "
+                f"{stats['throughput_per_s']:7.1f}/s  payload {stats['payload_bytes_mean'] / 1024:8.1f} KiB",
+                file=sys.stderr,
+            )
+    if memory:
+        tracemalloc.stop()
+    return results
+
+
+def compare(current, baseline):
+    old = {(r["page"], r["rows"]): r for r in baseline["results"]}
+    print(f"{'page':<11} {'rows':>10} {'p50 ms':>16} {'p95 ms':>16} {'payload KiB':>18}")
+    for r in current["results"]:
+        b = old.get((r["page"], r["rows"]))
+        if b is None:
+            continue
+        print(
+            f"{r['page']:<11} {r['rows']:>10,} "
+            f"{b['p50_ms']:7.1f} -> {r['p50_ms']:6.1f} {b['p95_ms']:7.1f} -> {r['p95_ms']:6.1f} "
+            f"{b['payload_bytes_mean'] / 1024:8.1f} -> {r['payload_bytes_mean'] / 1024:7.1f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the dashboard callbacks on synthetic data.")
+    parser.add_argument("--sizes", default="1000,10000,100000",
+                        help="comma-separated row counts, e.g. 1e3,1e5,1e7")
+    parser.add_argument("--pages", default=",".join(PAGES), help="comma-separated subset of pages")
+    parser.add_argument("--selections", type=int, default=40, help="filter selections per page")
+    parser.add_argument("--repeat", type=int, default=1, help="passes over the selection matrix")
+    parser.add_argument("--memory", action="store_true", help="record peak allocation with tracemalloc")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="JSON file to write (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--compare", help="earlier results JSON to compare against")
+    args = parser.parse_args()
+
+    sizes = [int(float(s)) for s in args.sizes.split(",")]
+    pages = args.pages.split(",")
+    results = run(sizes, pages, args.selections, args.repeat, args.memory, args.seed)
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "selections": args.selections,
+            "repeat": args.repeat,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, time.strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}", file=sys.stderr)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
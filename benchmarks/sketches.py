@@ -0,0 +1,107 @@
+# benchmarks/sketches.py
+# Checks the quantile sketches against exact quantiles on synthetic data, per
+# sketch size, over a matrix of filter selections:
+#   python -m benchmarks.sketches --size 1000000 --k 50,100,200,400
+# Rank error is how far the requested quantile lies outside the range of ranks
+# the returned value occupies in the exact sorted data (0 = exact answer).
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from analytics.filters import FILTER_COLUMNS, FilterIndex
+from analytics.sampling import quartiles, sketch_quartiles
+from analytics.sketches import SKETCH_COLUMNS, QuantileIndex
+from benchmarks.run import RESULTS_DIR, percentile, selection_matrix
+from benchmarks.synthetic import generate
+
+QUANTILES = [0.05, 0.25, 0.5, 0.75, 0.95]
+# The box plot measured for latency: Shipping times per transportation mode.
+BOX = ("Shipping times", "Transportation modes")
+
+
+def rank_errors(values, answers, qs):
+    values = np.sort(values)
+    lo = np.searchsorted(values, answers, side="left") / len(values)
+    hi = np.searchsorted(values, answers, side="right") / len(values)
+    return np.maximum(0, np.maximum(lo - qs, qs - hi))
+
+
+def run(frame, ks, matrix):
+    index = FilterIndex(frame)
+    rows = [index.select(dict(zip(FILTER_COLUMNS, args))) for args in matrix]
+    rows = [np.arange(len(frame)) if r is None else r for r in rows]
+    qs = np.asarray(QUANTILES)
+    results = []
+    for k in ks:
+        start = time.perf_counter()
+        sketches = QuantileIndex(frame, k=k)
+        build_s = time.perf_counter() - start
+        retained = sum(len(s.items()) for cells in sketches.sketches.values() for s in cells)
+        errors, sketch_ms, exact_ms = [], [], []
+        for args, positions in zip(matrix, rows):
+            if not len(positions):
+                continue
+            selections = dict(zip(FILTER_COLUMNS, args))
+            for column in SKETCH_COLUMNS:
+                answers = sketches.sketch(column, selections).quantiles(qs)
+                values = frame[column].to_numpy(dtype=np.float64)[positions]
+                errors.extend(rank_errors(values[~np.isnan(values)], answers, qs))
+
+            column, by = BOX
+            start = time.perf_counter()
+            for sketch in sketches.groups(column, by, selections).values():
+                sketch_quartiles(sketch)
+            sketch_ms.append((time.perf_counter() - start) * 1000)
+            start = time.perf_counter()
+            selected = frame.iloc[positions]
+            for _, values in selected.groupby(by, observed=True, sort=False)[column]:
+                quartiles(values.to_numpy(dtype=np.float64))
+            exact_ms.append((time.perf_counter() - start) * 1000)
+
+        stats = {
+            "k": k,
+            "rows": len(frame),
+            "build_s": build_s,
+            "retained_values": retained,
+            "sketch_bytes": retained * 8,
+            "rank_error_max": float(np.max(errors)),
+            "rank_error_mean": float(np.mean(errors)),
+            "rank_error_p99": percentile(errors, 99),
+            "box_sketch_p50_ms": percentile(sketch_ms, 50),
+            "box_exact_p50_ms": percentile(exact_ms, 50),
+        }
+        results.append(stats)
+        print(
+            f"k={k:<5} build {build_s:5.2f}s  {stats['sketch_bytes'] / 2**20:7.1f} MiB  "
+            f"rank error max {stats['rank_error_max']:.4f} mean {stats['rank_error_mean']:.5f}  "
+            f"box p50 {stats['box_sketch_p50_ms']:6.1f} ms vs exact {stats['box_exact_p50_ms']:6.1f} ms",
+            file=sys.stderr,
+        )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark quantile sketch accuracy against exact results.")
+    parser.add_argument("--size", type=float, default=1e6, help="synthetic rows")
+    parser.add_argument("--k", default="50,100,200,400", help="comma-separated sketch sizes")
+    parser.add_argument("--selections", type=int, default=40, help="filter selections")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="JSON file to write (default: benchmarks/results/sketches-<timestamp>.json)")
+    args = parser.parse_args()
+
+    frame = generate(int(args.size), seed=args.seed)
+    matrix = selection_matrix(frame, FILTER_COLUMNS, args.selections, args.seed)
+    results = run(frame, [int(k) for k in args.k.split(",")], matrix)
+    output = args.output or os.path.join(RESULTS_DIR, "sketches-" + time.strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({"quantiles": QUANTILES, "selections": args.selections, "results": results}, f, indent=2)
+    print(f"Results written to {output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+# benchmarks/startup.py
+# Measures app startup in fresh interpreters, eager and with LAZY_STARTUP, and
+# reports the slowest imports from `python -X importtime`:
+#   python -m benchmarks.startup --modes eager,lazy --repeat 3
+# "import" is the time until `import index` returns (the worker can serve),
+# "ready" the time until the data is loaded and, in lazy mode, the warmup
+# thread has rendered every page's default view. -X importtime only nests the
+# main thread's imports properly, so modules the warmup thread imports are
+# counted in "ready" rather than listed.
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from analytics.data import BASE_DIR
+from analytics.lazy import HEAVY_MODULES
+from benchmarks.run import RESULTS_DIR, git_commit
+
+MODES = {"eager": "0", "lazy": "1"}
+
+PROBE = """
+import json, os, sys, time
+import analytics.lazy as lazy
+# Hold the warmup thread back until `import index` has returned, so what the
+# import loaded itself isn't confused with what the warmup imports meanwhile.
+lazy._warmup_pid = os.getpid()
+start = time.perf_counter()
+import index
+imported = time.perf_counter() - start
+loaded = [name for name in lazy.HEAVY_MODULES if name in sys.modules]
+if lazy.LAZY_STARTUP:
+    lazy._warmup_pid = None
+    lazy.ensure_warmup(index.default_views)
+    lazy.wait_ready()
+print(json.dumps({"import_s": imported, "ready_s": time.perf_counter() - start, "loaded": loaded}))
+"""
+
+
+def parse_importtime(stderr):
+    # [(module, self_us, cumulative_us, depth)] from -X importtime output.
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+def profile(mode, repeat):
+    env = dict(os.environ, LAZY_STARTUP=MODES[mode])
+    timings = []
+    for _ in range(repeat):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", PROBE],
+            cwd=BASE_DIR, env=env, capture_output=True, text=True, check=True,
+        )
+        timings.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+    imports = parse_importtime(proc.stderr)
+    return {
+        "mode": mode,
+        "import_s": float(np.median([t["import_s"] for t in timings])),
+        "ready_s": float(np.median([t["ready_s"] for t in timings])),
+        "modules_imported": len(imports),
+        # Deferred modules that `import index` loaded anyway.
+        "heavy_loaded": timings[-1]["loaded"],
+        "imports": [
+            {"module": name, "self_us": self_us, "cumulative_us": cumulative_us, "depth": depth}
+            for name, self_us, cumulative_us, depth in imports
+        ],
+    }
+
+
+def report(result, top):
+    print(
+        f"{result['mode']:<6} import {result['import_s']:6.2f}s  ready {result['ready_s']:6.2f}s  "
+        f"{result['modules_imported']} modules imported by index",
+        file=sys.stderr,
+    )
+    deferred = [name for name in HEAVY_MODULES if name not in result["heavy_loaded"]]
+    print(f"{'':>8}loaded by the import: {', '.join(result['heavy_loaded']) or '-'}; "
+          f"deferred: {', '.join(deferred) or '-'}", file=sys.stderr)
+    # Top-level packages and the app's own modules.
+    listed = [
+        i for i in result["imports"]
+        if "." not in i["module"].lstrip("_") or i["module"].startswith(("analytics.", "pages."))
+    ]
+    for item in sorted(listed, key=lambda i: -i["cumulative_us"])[:top]:
+        print(f"{'':>8}{item['cumulative_us'] / 1000:8.1f} ms  {item['module']}", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile app startup and import time.")
+    parser.add_argument("--modes", default=",".join(MODES), help="comma-separated subset of eager,lazy")
+    parser.add_argument("--repeat", type=int, default=3, help="fresh interpreters per mode (median reported)")
+    parser.add_argument("--top", type=int, default=15, help="slowest imports to list")
+    parser.add_argument("--output", help="JSON file to write (default: benchmarks/results/startup-<timestamp>.json)")
+    args = parser.parse_args()
+
+    results = []
+    for mode in args.modes.split(","):
+        results.append(profile(mode, args.repeat))
+        report(results[-1], args.top)
+    output = args.output or os.path.join(RESULTS_DIR, "startup-" + time.strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({"commit": git_commit(), "repeat": args.repeat, "results": results}, f, indent=2)
+    print(f"Results written to {output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+# benchmarks/synthetic.py
+# Synthetic supply-chain data with the exact schema of supply_chain_data.csv,
+# drawn from the distributions of the real file so any row count can be tested.
+import numpy as np
+import pandas as pd
+
+from analytics.data import DATA_PATH, read_csv
+from analytics.schema import CATEGORY_COLUMNS, NUMERIC_DTYPES
+
+# Columns that describe the SKU itself rather than an individual order.
+SKU_ATTRIBUTES = ["Product type", "Price"]
+
+
+def sku_count(n_rows):
+    # The sample has one row per SKU; large extracts repeat SKUs across orders.
+    return int(min(n_rows, max(100, n_rows // 50)))
+
+
+def generate(n_rows, seed=0, source=DATA_PATH):
+    real = read_csv(source)
+    rng = np.random.default_rng(seed)
+    n_skus = sku_count(n_rows)
+    sku_of_row = rng.integers(0, n_skus, n_rows)
+
+    data = {}
+    for column in real.columns:
+        if column == "SKU":
+            categories = [f"SKU{i}" for i in range(n_skus)]
+            data[column] = pd.Categorical.from_codes(sku_of_row, categories=categories)
+        elif column in CATEGORY_COLUMNS:
+            # Same value set and frequencies as the real data.
+            freq = real[column].value_counts(normalize=True, sort=False)
+            draws = n_skus if column in SKU_ATTRIBUTES else n_rows
+            codes = rng.choice(len(freq), size=draws, p=freq.to_numpy())
+            if column in SKU_ATTRIBUTES:
+                codes = codes[sku_of_row]
+            data[column] = pd.Categorical.from_codes(codes, categories=freq.index.tolist())
+        else:
+            values = real[column].to_numpy()
+            dtype = np.dtype(NUMERIC_DTYPES[column])
+            draws = n_skus if column in SKU_ATTRIBUTES else n_rows
+            if dtype.kind == "i":
+                # Integer columns in the sample are close to uniform over their range.
+                sample = rng.integers(values.min(), values.max() + 1, draws)
+            else:
+                # Resample the real values with a little jitter so they stay in range.
+                sample = rng.choice(values, draws) * rng.uniform(0.97, 1.03, draws)
+                sample = np.clip(sample, values.min(), values.max())
+            if column in SKU_ATTRIBUTES:
+                sample = sample[sku_of_row]
+            data[column] = sample.astype(dtype)
+    return pd.DataFrame(data, columns=real.columns)
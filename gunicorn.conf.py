@@ -0,0 +1,7 @@
+# gunicorn.conf.py
+# Read by gunicorn from the working directory, on top of the Procfile flags.
+import os
+
+# SHARED_MEMORY=1 imports the app once in the master, which loads the dataset
+# into shared memory before forking the workers (see analytics/shared.py).
+preload_app = os.environ.get("SHARED_MEMORY", "0") == "1"
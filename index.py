@@ -1,8 +1,19 @@
-from dash import Dash, dcc, html, page_container
+import sys
+
+from dash import Dash, dcc, html, page_container, page_registry
 import dash_bootstrap_components as dbc
+from flask import Response, jsonify
+
+from analytics.cache import callback_cache
+from analytics.data import get_dataset
+from analytics.lazy import LAZY_STARTUP, ensure_warmup
+from analytics.metrics import install_metrics, prometheus_text
+from analytics.reload import ensure_watcher
+from analytics.shared import SHARED_MEMORY, preload
+from analytics.wire import install_compression
 
 app = Dash(__name__, use_pages=True, external_stylesheets=[dbc.themes.BOOTSTRAP])
-print('App Created')
+app.logger.info("App Created")
 app.title = "Supply Chain Dashboard"
 
 navbar = dbc.NavbarSimple(
@@ -25,6 +36,52 @@ app.layout = html.Div([
 ])
 
 server = app.server
+install_compression(server)
+install_metrics(server)
+
+
+def default_views():
+    # Every page callback with no filter selected, rendered by the warmup.
+    for page in page_registry.values():
+        module = sys.modules[page["module"]]
+        for func in getattr(module, "PAGE_CALLBACKS", []):
+            yield func, len(module.PAGE_FILTERS)
+
+
+# Load the data and build its indexes before the first request; with
+# SHARED_MEMORY=1 once, in the gunicorn master, for all workers. With
+# LAZY_STARTUP=1 the worker starts serving at once and a background thread
+# does this (see analytics/lazy.py).
+if SHARED_MEMORY:
+    preload()
+elif LAZY_STARTUP:
+    ensure_warmup(default_views)
+else:
+    get_dataset().warm()
+
+
+@server.before_request
+def start_background_threads():
+    ensure_watcher()
+    if LAZY_STARTUP:
+        ensure_warmup(default_views)
+
+
+@server.route("/_cache-stats")
+def cache_stats():
+    return jsonify(callback_cache.stats())
+
+
+@server.route("/metrics")
+def metrics():
+    stats = callback_cache.stats()
+    body = prometheus_text({
+        "dash_cache_hits_total": ("counter", "Callback cache hits.", stats["hits"]),
+        "dash_cache_misses_total": ("counter", "Callback cache misses.", stats["misses"]),
+        "dash_precomputed_hits_total": ("counter", "Callback outputs served precomputed.", stats["precomputed_hits"]),
+    })
+    return Response(body, mimetype="text/plain; version=0.0.4")
+
 
 if __name__ == "__main__":
     app.run()
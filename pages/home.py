@@ -12,7 +12,7 @@ layout = html.Div([
         html.Li("View total revenue, average price, and product sales volume."),
         html.Li("Use filters (Product Type, Supplier, Location) to customize insights."),
         html.Li("Explore trends like revenue distribution or price vs. units sold."),
-        html.Li("The table shows the top 5 best-selling products."),
+        html.Li("The table lists the best-selling products five per page; click a column header to sort it."),
         html.Li("When no filters are applied, you'll see summarized views. Filtering reveals detailed patterns."),
     ]),
 
@@ -1,179 +1,352 @@
-from dash import html, dcc, register_page, callback, Input, Output, dash_table
+from dash import html, dcc, register_page, callback, Input, Output, State, dash_table
 import dash_bootstrap_components as dbc
-import pandas as pd
-import plotly.express as px
-import numpy as np
+
+from analytics import sampling
+from analytics.bundle import ClientView, cube_callback
+from analytics.cache import memoize
+from analytics.data import get_data, get_dataset, options
+from analytics.figures import BarSkeleton, skeletons
+from analytics.metrics import instrument, phase, record_rows
+from analytics.planner import AggregationPlan
+from analytics.ranks import sort_order
+from analytics.sketches import SKETCH_MIN_ROWS
+from analytics.wire import compact_outputs
 
 register_page(__name__, path="/logistics")
 
-# Load data
-df = pd.read_csv("data/raw/supply_chain_data.csv")
-
-# Dropdown options
-product_types = df["Product type"].unique()
-carriers = df["Shipping carriers"].unique()
-locations = df["Location"].unique()
-transport_modes = df["Transportation modes"].unique()
-
-# Inventory logic function
-def identify_inventory_issues(df, availability_threshold=30):
-    df = df.copy()
-    df["Stock_to_Sales_Ratio"] = df["Stock levels"] / df["Number of products sold"].replace(0, np.nan)
-    df["Stock_to_Sales_Ratio"] = df["Stock_to_Sales_Ratio"].replace([np.inf, -np.inf], np.nan).fillna(0)
-
-    overstocked = (
-        df[df["Number of products sold"] > 0]
-        .sort_values(by="Stock_to_Sales_Ratio", ascending=False)
-        .head(5)
-    )[
-        ["SKU", "Product type", "Stock levels", "Availability", "Number of products sold", "Stock_to_Sales_Ratio"]
-    ]
-
-    sales_median = df["Number of products sold"].median()
-    understocked = (
-        df[
-            (df["Availability"] <= availability_threshold)
-            & (df["Number of products sold"] > sales_median)
-        ]
-        .sort_values(by="Number of products sold", ascending=False)
-        .head(5)
-    )[
-        ["SKU", "Product type", "Stock levels", "Availability", "Number of products sold", "Stock_to_Sales_Ratio"]
-    ]
-
-    return overstocked, understocked
+# Dataset columns behind the dropdowns, in callback argument order.
+PAGE_FILTERS = ["Product type", "Shipping carriers", "Location", "Transportation modes"]
+
+# The KPI cards and the bar charts, each answered in one pass over the cube.
+LOGISTICS_KPI_PLAN = (
+    AggregationPlan()
+    .total("availability", "Availability", "mean")
+    .total("stock", "Stock levels", "mean")
+    .total("ship_time", "Shipping times", "mean")
+    .total("ship_cost", "Shipping costs", "mean")
+)
+LOGISTICS_CHART_PLAN = (
+    AggregationPlan()
+    .group("cost_by_mode", "Transportation modes", "Shipping costs", "mean")
+    .group("stock_by_location", ["Location", "Product type"], "Stock levels", "mean")
+)
+
+# Rows per page of the inventory tables; pages are cut on the server.
+TABLE_PAGE_SIZE = 5
+
+
+def chart_skeletons(ds):
+    agg = ds.cube.run(LOGISTICS_CHART_PLAN, {})
+    return {
+        "shipping-cost-bar": BarSkeleton(
+            agg["cost_by_mode"], x="Transportation modes", y="Shipping costs", color="Transportation modes",
+            title="Avg Shipping Cost by Mode", signature=ds.version, template="plotly_white"
+        ),
+        "availability-bar": BarSkeleton(
+            agg["stock_by_location"], x="Location", y="Stock levels", color="Product type",
+            title="Average Stock Levels by Location and Product Type", signature=ds.version,
+            barmode="group", template="plotly_white"
+        ),
+    }
+
+
+# The KPI cards and bar charts as computed in the browser with CLIENT_FILTERING.
+CLIENT_VIEW = (
+    ClientView(PAGE_FILTERS, chart_skeletons)
+    .kpi("kpi-availability", LOGISTICS_KPI_PLAN, "availability")
+    .kpi("kpi-stock", LOGISTICS_KPI_PLAN, "stock")
+    .kpi("kpi-ship-time", LOGISTICS_KPI_PLAN, "ship_time", suffix=" days")
+    .kpi("kpi-ship-cost", LOGISTICS_KPI_PLAN, "ship_cost", prefix="$", decimals=2)
+    .bar("shipping-cost-bar", LOGISTICS_CHART_PLAN, "cost_by_mode")
+    .bar("availability-bar", LOGISTICS_CHART_PLAN, "stock_by_location")
+)
+
 
 # Layout
-layout = html.Div([
-    html.H2("Logistics Dashboard", className="mb-4"),
-
-
-    dbc.Row([
-        # Sidebar Filters
-        dbc.Col([
-            html.H3("Filters", className="mb-4"),
-            html.Label("Product Type"),
-            dcc.Dropdown(product_types, id="logistics-product-type", multi=True),
-
-            html.Label("Shipping Carrier"),
-            dcc.Dropdown(carriers, id="logistics-carrier", multi=True),
-
-            html.Label("Location"),
-            dcc.Dropdown(locations, id="logistics-location", multi=True),
-
-            html.Label("Transportation Mode"),
-            dcc.Dropdown(transport_modes, id="logistics-mode", multi=True)
-        ], width=2, style={"backgroundColor": "#f8f9fa", "padding": "20px"}),
-
-        # Main Content
-        dbc.Col(children =[
-        # KPI Cards
-            dbc.Row([
-                dbc.Col(dbc.Card(dbc.CardBody([
-                    html.H6("Avg Availability"), html.H4(id="kpi-availability")
-                ]), color="primary", inverse=True), width=3),
-                dbc.Col(dbc.Card(dbc.CardBody([
-                    html.H6("Avg Stock Levels"), html.H4(id="kpi-stock")
-                ]), color="info", inverse=True), width=3),
-                dbc.Col(dbc.Card(dbc.CardBody([
-                    html.H6("Avg Shipping Time"), html.H4(id="kpi-ship-time")
-                ]), color="success", inverse=True), width=3),
-                dbc.Col(dbc.Card(dbc.CardBody([
-                    html.H6("Avg Shipping Cost"), html.H4(id="kpi-ship-cost")
-                ]), color="danger", inverse=True), width=3),
-            ], className="mb-4"),
-
-            # Graphs
-            dbc.Row([
-                dbc.Col(dcc.Graph(id="shipping-time-boxplot"), width=6),
-                dbc.Col(dcc.Graph(id="shipping-cost-bar"), width=6),
-            ]),
-            dbc.Row([
-                dbc.Col(dcc.Graph(id="availability-bar"), width=6),
-                dbc.Col(dcc.Graph(id="scatter-stock-vs-ship-time"), width=6),
-            ]),
-
-            # Inventory Tables
-            dbc.Row([
-                dbc.Col([
-                    html.H5("Top 5 Overstocked Products"),
-                    dash_table.DataTable(
-                        id="overstocked-table",
-                        columns=[{"name": col, "id": col} for col in
-                                 ["SKU", "Product type", "Stock levels", "Number of products sold"]],
-                        style_table={"overflowX": "auto"},
-                        page_size=5
-                    )
-                ], width=6),
-
-                dbc.Col([
-                    html.H5("Top 5 Understocked Products"),
-                    dash_table.DataTable(
-                        id="understocked-table",
-                        columns=[{"name": col, "id": col} for col in
-                                 ["SKU", "Product type", "Stock levels",  "Number of products sold"]],
-                        style_table={"overflowX": "auto"},
-                        page_size=5
-                    )
-                ], width=6)
+def layout(**kwargs):
+    # Built per page load so the dropdowns follow data reloads.
+    df = get_data()
+
+    # Dropdown options
+    product_types = options(df, "Product type")
+    carriers = options(df, "Shipping carriers")
+    locations = options(df, "Location")
+    transport_modes = options(df, "Transportation modes")
+
+    return html.Div([
+        html.H2("Logistics Dashboard", className="mb-4"),
+
+
+        dbc.Row([
+            # Sidebar Filters
+            dbc.Col([
+                html.H3("Filters", className="mb-4"),
+                html.Label("Product Type"),
+                dcc.Dropdown(product_types, id="logistics-product-type", multi=True),
+
+                html.Label("Shipping Carrier"),
+                dcc.Dropdown(carriers, id="logistics-carrier", multi=True),
+
+                html.Label("Location"),
+                dcc.Dropdown(locations, id="logistics-location", multi=True),
+
+                html.Label("Transportation Mode"),
+                dcc.Dropdown(transport_modes, id="logistics-mode", multi=True)
+            ], width=2, style={"backgroundColor": "#f8f9fa", "padding": "20px"}),
+
+            # Main Content
+            dbc.Col(children =[
+            # KPI Cards
+                dbc.Row([
+                    dbc.Col(dbc.Card(dbc.CardBody([
+                        html.H6("Avg Availability"), html.H4(id="kpi-availability")
+                    ]), color="primary", inverse=True), width=3),
+                    dbc.Col(dbc.Card(dbc.CardBody([
+                        html.H6("Avg Stock Levels"), html.H4(id="kpi-stock")
+                    ]), color="info", inverse=True), width=3),
+                    dbc.Col(dbc.Card(dbc.CardBody([
+                        html.H6("Avg Shipping Time"), html.H4(id="kpi-ship-time")
+                    ]), color="success", inverse=True), width=3),
+                    dbc.Col(dbc.Card(dbc.CardBody([
+                        html.H6("Avg Shipping Cost"), html.H4(id="kpi-ship-cost")
+                    ]), color="danger", inverse=True), width=3),
+                ], className="mb-4"),
+
+                # Graphs
+                dbc.Row([
+                    dbc.Col(dcc.Graph(id="shipping-time-boxplot"), width=6),
+                    dbc.Col(dcc.Graph(id="shipping-cost-bar"), width=6),
+                ]),
+                dbc.Row([
+                    dbc.Col(dcc.Graph(id="availability-bar"), width=6),
+                    dbc.Col(dcc.Graph(id="scatter-stock-vs-ship-time"), width=6),
+                ]),
+                # Which skeleton each bar chart shows, so updates can be patches.
+                dcc.Store(id="logistics-charts-sent"),
+                CLIENT_VIEW.store("logistics-bundle"),
+
+                # Inventory Tables
+                dbc.Row([
+                    dbc.Col([
+                        html.H5("Overstocked Products"),
+                        dash_table.DataTable(
+                            id="overstocked-table",
+                            columns=[{"name": col, "id": col} for col in
+                                     ["SKU", "Product type", "Stock levels", "Number of products sold"]],
+                            style_table={"overflowX": "auto"},
+                            page_action="custom", page_current=0, page_size=TABLE_PAGE_SIZE,
+                            sort_action="custom", sort_mode="single", sort_by=[]
+                        )
+                    ], width=6),
+
+                    dbc.Col([
+                        html.H5("Understocked Products"),
+                        dash_table.DataTable(
+                            id="understocked-table",
+                            columns=[{"name": col, "id": col} for col in
+                                     ["SKU", "Product type", "Stock levels", "Number of products sold"]],
+                            style_table={"overflowX": "auto"},
+                            page_action="custom", page_current=0, page_size=TABLE_PAGE_SIZE,
+                            sort_action="custom", sort_mode="single", sort_by=[]
+                        )
+                    ], width=6)
+                ])
             ])
-        ])
 
-    ])
-], className="mt-4")
+        ])
+    ], className="mt-4")
 
-# Callback
-@callback(
+# Callbacks: KPI cards, cube-backed bars, row-level plots and inventory tables
+# are requested in parallel, so the cards don't wait on the slowest figure.
+@cube_callback(
+    "logistics-bundle",
     Output("kpi-availability", "children"),
     Output("kpi-stock", "children"),
     Output("kpi-ship-time", "children"),
     Output("kpi-ship-cost", "children"),
-    Output("shipping-time-boxplot", "figure"),
+    Input("logistics-product-type", "value"),
+    Input("logistics-carrier", "value"),
+    Input("logistics-location", "value"),
+    Input("logistics-mode", "value")
+)
+@instrument
+@memoize
+def update_logistics_kpis(ptypes, carriers, locs, modes):
+    ds = get_dataset()
+    selections = dict(zip(PAGE_FILTERS, (ptypes, carriers, locs, modes)))
+
+    with phase("aggregate"):
+        agg = ds.cube.run(LOGISTICS_KPI_PLAN, selections)
+        kpi_avail = f"{agg['availability']:.1f}"
+        kpi_stock = f"{agg['stock']:.1f}"
+        kpi_ship_time = f"{agg['ship_time']:.1f} days"
+        kpi_ship_cost = f"${agg['ship_cost']:.2f}"
+
+    return kpi_avail, kpi_stock, kpi_ship_time, kpi_ship_cost
+
+
+@cube_callback(
+    "logistics-bundle",
     Output("shipping-cost-bar", "figure"),
     Output("availability-bar", "figure"),
+    Output("logistics-charts-sent", "data"),
+    Input("logistics-product-type", "value"),
+    Input("logistics-carrier", "value"),
+    Input("logistics-location", "value"),
+    Input("logistics-mode", "value"),
+    State("logistics-charts-sent", "data")
+)
+@instrument
+@memoize
+@compact_outputs
+def update_logistics_charts(ptypes, carriers, locs, modes, sent=None):
+    ds = get_dataset()
+    selections = dict(zip(PAGE_FILTERS, (ptypes, carriers, locs, modes)))
+    sent = sent or {}
+
+    with phase("aggregate"):
+        agg = ds.cube.run(LOGISTICS_CHART_PLAN, selections)
+        cost_by_mode = agg["cost_by_mode"]
+        stock_by_location = agg["stock_by_location"]
+
+    with phase("figure"):
+        # Only the bar heights change with the filters: after the first
+        # response the browser is sent patches against the skeletons.
+        bars = skeletons(ds, "logistics-charts", chart_skeletons)
+        fig2 = bars["shipping-cost-bar"].render(
+            cost_by_mode, "Avg Shipping Cost by Mode", sent.get("shipping-cost-bar")
+        )
+        fig3 = bars["availability-bar"].render(
+            stock_by_location, "Average Stock Levels by Location and Product Type", sent.get("availability-bar")
+        )
+
+    return fig2, fig3, {graph: skeleton.signature for graph, skeleton in bars.items()}
+
+
+@callback(
+    Output("shipping-time-boxplot", "figure"),
     Output("scatter-stock-vs-ship-time", "figure"),
+    Input("logistics-product-type", "value"),
+    Input("logistics-carrier", "value"),
+    Input("logistics-location", "value"),
+    Input("logistics-mode", "value")
+)
+@instrument
+@memoize
+@compact_outputs
+def update_logistics_distributions(ptypes, carriers, locs, modes):
+    ds = get_dataset()
+    df = ds.frame
+    selections = dict(zip(PAGE_FILTERS, (ptypes, carriers, locs, modes)))
+
+    with phase("filter"):
+        dff = ds.index.filter(df, selections)
+        record_rows(len(df), len(dff))
+
+    sketches = None
+    if len(dff) > sampling.ROW_THRESHOLD:
+        with phase("aggregate"):
+            sketches = ds.quantiles.groups("Shipping times", "Transportation modes", selections)
+
+    with phase("figure"):
+        fig1 = sampling.box(dff, x="Transportation modes", y="Shipping times", title="Shipping Time by Carrier", template="plotly_white", sketches=sketches)
+        fig4 = sampling.scatter(
+            dff, x="Stock levels", y="Shipping times", color="Product type",
+            title="Stock Levels vs Shipping Times", template="plotly_white"
+        )
+
+    return fig1, fig4
+
+
+def sales_threshold(ds, selections):
+    # Median units sold over the selection, from the sketches when it is large.
+    if any(selections.values()) and ds.quantiles.count("Number of products sold", selections) > SKETCH_MIN_ROWS:
+        return ds.quantiles.sketch("Number of products sold", selections).median()
+    return ds.inventory.sales_threshold(ds.index.select(selections))
+
+
+@callback(
+    Output("overstocked-table", "page_count"),
+    Output("overstocked-table", "page_current"),
+    Output("understocked-table", "page_count"),
+    Output("understocked-table", "page_current"),
+    Input("logistics-product-type", "value"),
+    Input("logistics-carrier", "value"),
+    Input("logistics-location", "value"),
+    Input("logistics-mode", "value"),
+    Input("overstocked-table", "page_size"),
+    Input("understocked-table", "page_size")
+)
+@instrument
+@memoize
+def update_logistics_inventory_pages(ptypes, carriers, locs, modes, over_size=TABLE_PAGE_SIZE,
+                                     under_size=TABLE_PAGE_SIZE):
+    # A new selection starts both tables again at their first page.
+    ds = get_dataset()
+    selections = dict(zip(PAGE_FILTERS, (ptypes, carriers, locs, modes)))
+
+    with phase("filter"):
+        rows = ds.index.select(selections)
+        record_rows(len(ds.frame), len(ds.frame) if rows is None else len(rows))
+
+    with phase("aggregate"):
+        over = ds.inventory.count("overstocked", rows)
+        under = ds.inventory.count("understocked", rows, sales_threshold(ds, selections))
+
+    return max(1, -(-over // over_size)), 0, max(1, -(-under // under_size)), 0
+
+
+def inventory_page(table, selections, page_current, page_size, sort_by):
+    ds = get_dataset()
+    with phase("aggregate"):
+        threshold = sales_threshold(ds, selections) if table == "understocked" else None
+        page = ds.inventory.page(
+            table, ds.index, selections, (page_current or 0) * page_size, page_size,
+            sort_order(sort_by), sales_threshold=threshold,
+        )
+    return page.to_dict("records")
+
+
+@callback(
     Output("overstocked-table", "data"),
+    Input("logistics-product-type", "value"),
+    Input("logistics-carrier", "value"),
+    Input("logistics-location", "value"),
+    Input("logistics-mode", "value"),
+    Input("overstocked-table", "page_current"),
+    Input("overstocked-table", "page_size"),
+    Input("overstocked-table", "sort_by")
+)
+@instrument
+@memoize
+def update_logistics_overstocked(ptypes, carriers, locs, modes, page_current=0, page_size=TABLE_PAGE_SIZE,
+                                 sort_by=None):
+    # Highest stock-to-sales ratio first, read from presorted orders.
+    selections = dict(zip(PAGE_FILTERS, (ptypes, carriers, locs, modes)))
+    return inventory_page("overstocked", selections, page_current, page_size, sort_by)
+
+
+@callback(
     Output("understocked-table", "data"),
     Input("logistics-product-type", "value"),
     Input("logistics-carrier", "value"),
     Input("logistics-location", "value"),
-    Input("logistics-mode", "value")
+    Input("logistics-mode", "value"),
+    Input("understocked-table", "page_current"),
+    Input("understocked-table", "page_size"),
+    Input("understocked-table", "sort_by")
 )
-def update_logistics(ptypes, carriers, locs, modes):
-    dff = df.copy()
-    if ptypes: dff = dff[dff["Product type"].isin(ptypes)]
-    if carriers: dff = dff[dff["Shipping carriers"].isin(carriers)]
-    if locs: dff = dff[dff["Location"].isin(locs)]
-    if modes: dff = dff[dff["Transportation modes"].isin(modes)]
-
-    # KPIs
-    kpi_avail = f"{dff['Availability'].mean():.1f}"
-    kpi_stock = f"{dff['Stock levels'].mean():.1f}"
-    kpi_ship_time = f"{dff['Shipping times'].mean():.1f} days"
-    kpi_ship_cost = f"${dff['Shipping costs'].mean():.2f}"
-
-    # Graphs
-    fig1 = px.box(dff, x="Transportation modes", y="Shipping times", color="Transportation modes", title="Shipping Time by Carrier", template="plotly_white")
-    fig2 = px.bar(
-        dff.groupby("Transportation modes", as_index=False)["Shipping costs"].mean(),
-        x="Transportation modes", y="Shipping costs", color="Transportation modes",
-        title="Avg Shipping Cost by Mode", template="plotly_white"
-    )
-    fig3 = px.bar(
-        dff.groupby(["Location", "Product type"], as_index=False)["Stock levels"].mean(),
-        x="Location", y="Stock levels", color="Product type", barmode="group",
-        title="Average Stock Levels by Location and Product Type", template="plotly_white"
-    )
-    fig4 = px.scatter(
-        dff, x="Stock levels", y="Shipping times", color="Product type",
-        title="Stock Levels vs Shipping Times", template="plotly_white"
-    )
-
-    # Inventory Tables
-    over, under = identify_inventory_issues(dff)
-
-    return (
-        kpi_avail, kpi_stock, kpi_ship_time, kpi_ship_cost,
-        fig1, fig2, fig3, fig4,
-        over.to_dict("records"), under.to_dict("records")
-    )
\ No newline at end of file
+@instrument
+@memoize
+def update_logistics_understocked(ptypes, carriers, locs, modes, page_current=0, page_size=TABLE_PAGE_SIZE,
+                                  sort_by=None):
+    # Most units sold first among low-availability rows selling above the median.
+    selections = dict(zip(PAGE_FILTERS, (ptypes, carriers, locs, modes)))
+    return inventory_page("understocked", selections, page_current, page_size, sort_by)
+
+
+# Filter-driven callbacks, for tooling that calls them directly (benchmarks, precompute).
+PAGE_CALLBACKS = [
+    update_logistics_kpis, update_logistics_charts, update_logistics_distributions, update_logistics_inventory_pages,
+    update_logistics_overstocked, update_logistics_understocked,
+]
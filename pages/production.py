@@ -1,125 +1,249 @@
 
-from dash import html, dcc, register_page, callback, Input, Output, dash_table
+import math
+
+from dash import html, dcc, register_page, callback, Input, Output, State, dash_table
 import dash_bootstrap_components as dbc
-import pandas as pd
-import plotly.express as px
+
+from analytics import sampling
+from analytics.bundle import ClientView, cube_callback, histogram_spec
+from analytics.cache import memoize
+from analytics.cube import PASS_MEASURE
+from analytics.data import get_data, get_dataset, options
+from analytics.figures import BarSkeleton, skeletons
+from analytics.metrics import instrument, phase, record_rows
+from analytics.planner import AggregationPlan
+from analytics.wire import compact_outputs
 
 register_page(__name__, path="/production")
 
-# Load data
-df = pd.read_csv("data/raw/supply_chain_data.csv")
+# Dataset columns behind the dropdowns, in callback argument order.
+PAGE_FILTERS = ["Product type", "Supplier name", "Location"]
+
+# The KPI cards and the bar charts, each answered in one pass over the cube.
+PRODUCTION_KPI_PLAN = (
+    AggregationPlan()
+    .total("lead_time", "Manufacturing lead time", "mean")
+    .total("cost", "Manufacturing costs", "mean")
+    .total("defect", "Defect rates", "mean")
+    .total("pass_rate", PASS_MEASURE, "mean")
+)
+PRODUCTION_CHART_PLAN = (
+    AggregationPlan()
+    .group("cost_by_supplier", "Supplier name", "Manufacturing costs", "mean")
+    .group("defect_by_type", "Product type", "Defect rates", "mean")
+)
+
+
+def chart_skeletons(ds):
+    agg = ds.cube.run(PRODUCTION_CHART_PLAN, {})
+    return {
+        "bar-manuf-costs": BarSkeleton(
+            agg["cost_by_supplier"], x="Supplier name", y="Manufacturing costs", color="Supplier name",
+            title="Average Manufacturing Costs by Supplier", signature=ds.version, template="plotly_white"
+        ),
+        "bar-defect-rates": BarSkeleton(
+            agg["defect_by_type"], x="Product type", y="Defect rates", color="Product type",
+            title="Average Defect Rate by Product Type", signature=ds.version, template="plotly_white"
+        ),
+    }
+
+
+# The KPI cards and cube-backed charts as computed in the browser with
+# CLIENT_FILTERING.
+CLIENT_VIEW = (
+    ClientView(PAGE_FILTERS, chart_skeletons)
+    .kpi("kpi-manuf-lead", PRODUCTION_KPI_PLAN, "lead_time", suffix=" days")
+    .kpi("kpi-manuf-cost", PRODUCTION_KPI_PLAN, "cost", prefix="$", decimals=2)
+    .kpi("kpi-inspect-pass", PRODUCTION_KPI_PLAN, "pass_rate", suffix="%", scale=100, empty=0)
+    .kpi("kpi-defect-rate", PRODUCTION_KPI_PLAN, "defect", suffix="%", decimals=2)
+    .bar("bar-manuf-costs", PRODUCTION_CHART_PLAN, "cost_by_supplier", when="Supplier name", histogram=histogram_spec(
+        "Manufacturing costs", "Supplier name", "Manufacturing Cost Distribution (Filtered by Supplier)"
+    ))
+    .histogram("bar-inspection-results", "Inspection results", "Product type", "Inspection Results by Product Type",
+               barmode="group")
+    .bar("bar-defect-rates", PRODUCTION_CHART_PLAN, "defect_by_type")
+)
 
-# Dropdown options
-product_types = df["Product type"].unique()
-suppliers = df["Supplier name"].unique()
-locations = df["Location"].unique()
 
 # Layout
-layout = html.Div([
-    html.H2("Production Dashboard", className="mb-4"),
-
-    dbc.Row([
-        # Filters
-        dbc.Col([
-            html.Label("Product Type"),
-            dcc.Dropdown(product_types, id="prod-product-type", multi=True),
-
-            html.Label("Supplier"),
-            dcc.Dropdown(suppliers, id="prod-supplier", multi=True),
-
-            html.Label("Location"),
-            dcc.Dropdown(locations, id="prod-location", multi=True)
-        ], width=2, style={"backgroundColor": "#f8f9fa", "padding": "20px"}),
-
-        # Main Content
-        dbc.Col(children =[
-            # KPI Cards
-            dbc.Row([
-                dbc.Col(dbc.Card(dbc.CardBody([
-                    html.H6("Avg Manufacturing Lead Time"), html.H4(id="kpi-manuf-lead")
-                ]), color="primary", inverse=True), width=3),
-                dbc.Col(dbc.Card(dbc.CardBody([
-                    html.H6("Avg Manufacturing Cost"), html.H4(id="kpi-manuf-cost")
-                ]), color="info", inverse=True), width=3),
-                dbc.Col(dbc.Card(dbc.CardBody([
-                    html.H6("Inspection Pass Rate"), html.H4(id="kpi-inspect-pass")
-                ]), color="success", inverse=True), width=3),
-                dbc.Col(dbc.Card(dbc.CardBody([
-                    html.H6("Avg Defect Rate"), html.H4(id="kpi-defect-rate")
-                ]), color="danger", inverse=True), width=3)
-            ], className="mb-4"),
-
-            # Charts
-            dbc.Row([
-                dbc.Col(dcc.Graph(id="box-manuf-lead-time"), width=6),
-                dbc.Col(dcc.Graph(id="bar-manuf-costs"), width=6)
-            ]),
-            dbc.Row([
-                dbc.Col(dcc.Graph(id="bar-inspection-results"), width=6),
-                dbc.Col(dcc.Graph(id="bar-defect-rates"), width=6)
+def layout(**kwargs):
+    # Built per page load so the dropdowns follow data reloads.
+    df = get_data()
+
+    # Dropdown options
+    product_types = options(df, "Product type")
+    suppliers = options(df, "Supplier name")
+    locations = options(df, "Location")
+
+    return html.Div([
+        html.H2("Production Dashboard", className="mb-4"),
+
+        dbc.Row([
+            # Filters
+            dbc.Col([
+                html.Label("Product Type"),
+                dcc.Dropdown(product_types, id="prod-product-type", multi=True),
+
+                html.Label("Supplier"),
+                dcc.Dropdown(suppliers, id="prod-supplier", multi=True),
+
+                html.Label("Location"),
+                dcc.Dropdown(locations, id="prod-location", multi=True)
+            ], width=2, style={"backgroundColor": "#f8f9fa", "padding": "20px"}),
+
+            # Main Content
+            dbc.Col(children =[
+                # KPI Cards
+                dbc.Row([
+                    dbc.Col(dbc.Card(dbc.CardBody([
+                        html.H6("Avg Manufacturing Lead Time"), html.H4(id="kpi-manuf-lead")
+                    ]), color="primary", inverse=True), width=3),
+                    dbc.Col(dbc.Card(dbc.CardBody([
+                        html.H6("Avg Manufacturing Cost"), html.H4(id="kpi-manuf-cost")
+                    ]), color="info", inverse=True), width=3),
+                    dbc.Col(dbc.Card(dbc.CardBody([
+                        html.H6("Inspection Pass Rate"), html.H4(id="kpi-inspect-pass")
+                    ]), color="success", inverse=True), width=3),
+                    dbc.Col(dbc.Card(dbc.CardBody([
+                        html.H6("Avg Defect Rate"), html.H4(id="kpi-defect-rate")
+                    ]), color="danger", inverse=True), width=3)
+                ], className="mb-4"),
+
+                # Charts
+                dbc.Row([
+                    dbc.Col(dcc.Graph(id="box-manuf-lead-time"), width=6),
+                    dbc.Col(dcc.Graph(id="bar-manuf-costs"), width=6)
+                ]),
+                dbc.Row([
+                    dbc.Col(dcc.Graph(id="bar-inspection-results"), width=6),
+                    dbc.Col(dcc.Graph(id="bar-defect-rates"), width=6)
+                ]),
+                # Which skeleton each bar chart shows, so updates can be patches.
+                dcc.Store(id="prod-charts-sent"),
+                CLIENT_VIEW.store("prod-bundle")
             ])
         ])
-    ])
-], className="mt-4")
-# Callback
-@callback(
+    ], className="mt-4")
+# Callbacks: the KPI cards, the cube-backed charts and the lead-time plot (which
+# may need the filtered rows) are requested in parallel, so the cards don't wait
+# on the slowest figure.
+@cube_callback(
+    "prod-bundle",
     Output("kpi-manuf-lead", "children"),
     Output("kpi-manuf-cost", "children"),
     Output("kpi-inspect-pass", "children"),
     Output("kpi-defect-rate", "children"),
+    Input("prod-product-type", "value"),
+    Input("prod-supplier", "value"),
+    Input("prod-location", "value")
+)
+@instrument
+@memoize
+def update_production_kpis(ptypes, suppliers, locs):
+    ds = get_dataset()
+    selections = dict(zip(PAGE_FILTERS, (ptypes, suppliers, locs)))
+
+    with phase("aggregate"):
+        agg = ds.cube.run(PRODUCTION_KPI_PLAN, selections)
+        lead_time = f"{agg['lead_time']:.1f} days"
+        cost = f"${agg['cost']:.2f}"
+        defect = f"{agg['defect']:.2f}%"
+        # An empty selection shows 0% rather than NaN.
+        pass_rate = 0.0 if math.isnan(agg["pass_rate"]) else agg["pass_rate"]
+        inspection = f"{pass_rate * 100:.1f}%"
+
+    return lead_time, cost, inspection, defect
+
+
+@callback(
     Output("box-manuf-lead-time", "figure"),
+    Input("prod-product-type", "value"),
+    Input("prod-supplier", "value"),
+    Input("prod-location", "value")
+)
+@instrument
+@memoize
+@compact_outputs
+def update_production_lead_times(ptypes, suppliers, locs):
+    ds = get_dataset()
+    df = ds.frame
+    selections = dict(zip(PAGE_FILTERS, (ptypes, suppliers, locs)))
+
+    if ptypes:
+        with phase("figure"):
+            return ds.histograms.figure(
+                "Manufacturing lead time", selections, color="Product type",
+                title="Lead Time Distribution (Filtered by Product Type)", template="plotly_white",
+            )
+
+    # Large selections are drawn from the lead-time sketches without
+    # touching their rows.
+    if ds.quantiles.count("Manufacturing lead time", selections) > sampling.ROW_THRESHOLD:
+        with phase("aggregate"):
+            sketches = ds.quantiles.groups("Manufacturing lead time", "Product type", selections)
+        with phase("figure"):
+            return sampling.box(None, x="Product type", y="Manufacturing lead time", sketches=sketches,
+                                title="Manufacturing Lead Time by Product Type", template="plotly_white")
+
+    with phase("filter"):
+        dff = ds.index.filter(df, selections)
+        record_rows(len(df), len(dff))
+
+    with phase("figure"):
+        return sampling.box(dff, x="Product type", y="Manufacturing lead time",
+                            title="Manufacturing Lead Time by Product Type", template="plotly_white")
+
+
+@cube_callback(
+    "prod-bundle",
     Output("bar-manuf-costs", "figure"),
     Output("bar-inspection-results", "figure"),
     Output("bar-defect-rates", "figure"),
+    Output("prod-charts-sent", "data"),
     Input("prod-product-type", "value"),
     Input("prod-supplier", "value"),
-    Input("prod-location", "value")
+    Input("prod-location", "value"),
+    State("prod-charts-sent", "data")
 )
-def update_production(ptypes, suppliers, locs):
-    dff = df.copy()
-    if ptypes: dff = dff[dff["Product type"].isin(ptypes)]
-    if suppliers: dff = dff[dff["Supplier name"].isin(suppliers)]
-    if locs: dff = dff[dff["Location"].isin(locs)]
-
-    # KPIs
-    lead_time = f"{dff['Manufacturing lead time'].mean():.1f} days"
-    cost = f"${dff['Manufacturing costs'].mean():.2f}"
-    defect = f"{dff['Defect rates'].mean():.2f}%"
-    if "Inspection results" in dff.columns:
-        pass_rate = dff["Inspection results"].value_counts(normalize=True).get("Pass", 0) * 100
-        inspection = f"{pass_rate:.1f}%"
-    else:
-        inspection = "N/A"
+@instrument
+@memoize
+@compact_outputs
+def update_production_charts(ptypes, suppliers, locs, sent=None):
+    ds = get_dataset()
+    selections = dict(zip(PAGE_FILTERS, (ptypes, suppliers, locs)))
+    sent = sent or {}
+
+    with phase("aggregate"):
+        agg = ds.cube.run(PRODUCTION_CHART_PLAN, selections)
+        cost_by_supplier = agg["cost_by_supplier"]
+        defect_by_type = agg["defect_by_type"]
 
     # Charts
-    if ptypes:
-        fig1 = px.histogram(
-            dff, x="Manufacturing lead time", color="Product type",
-            title="Lead Time Distribution (Filtered by Product Type)", template="plotly_white",
-        )
-    else:
-        fig1 = px.box(dff, x="Product type", y="Manufacturing lead time", color="Product type",
-                      title="Manufacturing Lead Time by Product Type", template="plotly_white")
-
-    if suppliers:
-        # Histogram of individual cost values from filtered suppliers
-        fig2 = px.histogram(
-            dff, x="Manufacturing costs", color="Supplier name",
-            title="Manufacturing Cost Distribution (Filtered by Supplier)", template="plotly_white",
-        )
-    else:
-        # Bar chart for all suppliers
-        fig2 = px.bar(
-            dff.groupby("Supplier name", as_index=False)["Manufacturing costs"].mean(),
-            x="Supplier name", y="Manufacturing costs", color="Supplier name",
-            title="Average Manufacturing Costs by Supplier", template="plotly_white"
+    with phase("figure"):
+        bars = skeletons(ds, "production-charts", chart_skeletons)
+        shown = {"bar-defect-rates": bars["bar-defect-rates"].signature}
+        if suppliers:
+            # Histogram of individual cost values from filtered suppliers
+            fig2 = ds.histograms.figure(
+                "Manufacturing costs", selections, color="Supplier name",
+                title="Manufacturing Cost Distribution (Filtered by Supplier)", template="plotly_white",
+            )
+        else:
+            # Bar chart for all suppliers
+            fig2 = bars["bar-manuf-costs"].render(
+                cost_by_supplier, "Average Manufacturing Costs by Supplier", sent.get("bar-manuf-costs")
+            )
+            shown["bar-manuf-costs"] = bars["bar-manuf-costs"].signature
+
+        fig3 = ds.histograms.figure("Inspection results", selections, color="Product type", barmode="group",
+                                    title="Inspection Results by Product Type", template="plotly_white")
+
+        fig4 = bars["bar-defect-rates"].render(
+            defect_by_type, "Average Defect Rate by Product Type", sent.get("bar-defect-rates")
         )
 
-    fig3 = px.histogram(dff, x="Inspection results", color="Product type", barmode="group",
-                        title="Inspection Results by Product Type", template="plotly_white")
+    return fig2, fig3, fig4, shown
 
-    fig4 = px.bar(dff.groupby("Product type", as_index=False)["Defect rates"].mean(),
-                  x="Product type", y="Defect rates", color="Product type",
-                  title="Average Defect Rate by Product Type", template="plotly_white")
 
-    return lead_time, cost, inspection, defect, fig1, fig2, fig3, fig4
+# Filter-driven callbacks, for tooling that calls them directly (benchmarks, precompute).
+PAGE_CALLBACKS = [update_production_kpis, update_production_lead_times, update_production_charts]
@@ -1,162 +1,303 @@
-from dash import html, dcc, register_page, Input, Output, callback, dash_table
+from dash import html, dcc, register_page, Input, Output, State, callback, dash_table
 import dash_bootstrap_components as dbc
-import pandas as pd
-import plotly.express as px
+
+from analytics import sampling
+from analytics.bundle import ClientView, cube_callback, histogram_spec
+from analytics.cache import memoize
+from analytics.data import get_data, get_dataset, options
+from analytics.figures import BarSkeleton, skeletons
+from analytics.metrics import instrument, phase, record_rows
+from analytics.planner import AggregationPlan
+from analytics.ranks import sort_order
+from analytics.wire import compact_outputs
 
 register_page(__name__, path="/sales")
 
-# Load your cleaned data
-df = pd.read_csv("data/raw/supply_chain_data.csv")
-
-# Unique filter values
-product_types = df["Product type"].unique()
-suppliers = df["Supplier name"].unique()
-locations = df["Location"].unique()
-
-layout = html.Div([
-    html.H2("Sales Dashboard", className="mb-4"),
-
-    dbc.Row([
-        # Sidebar Filters
-        dbc.Col([
-            html.H3("Filters", className="mb-4"),
-            html.Label("Product Type"),
-            dcc.Dropdown(product_types, id="sales-product-filter", multi=True),
-
-            html.Label("Supplier"),
-            dcc.Dropdown(suppliers, id="sales-supplier-filter", multi=True),
-
-            html.Label("Location"),
-            dcc.Dropdown(locations, id="sales-location-filter", multi=True)
-        ], width=2, style={"backgroundColor": "#f8f9fa", "padding": "20px"}),
-        # Main Content
-        dbc.Col([
-            # KPIs
-            dbc.Row([
-                dbc.Col(dbc.Card(dbc.CardBody([
-                    html.H6("Total Revenue"), html.H4(id="kpi-total-revenue")
-                ]), color="success", inverse=True), width=4),
-                dbc.Col(dbc.Card(dbc.CardBody([
-                    html.H6("Avg Price"), html.H4(id="kpi-avg-price")
-                ]), color="primary", inverse=True), width=4),
-                dbc.Col(dbc.Card(dbc.CardBody([
-                    html.H6("Total Products Sold"), html.H4(id="kpi-total-sold")
-                ]), color="info", inverse=True), width=4),
-                # dbc.Col(dbc.Card(dbc.CardBody([
-                #     html.H6("Total Cost"), html.H4(id="kpi-total-cost")
-                # ]), color="danger", inverse=True), width=3),
-            ], className="mb-4"),
-            dbc.Row([
-                dbc.Col(html.Div([
-                    html.H5("Top 5 Selling Products", className="mt-4"),
-                    dash_table.DataTable(
-                        id="top-products-table",
-                        columns=[
-                            {"name": "SKU", "id": "SKU"},
-                            {"name": "Product type", "id": "Product type"},
-                            {"name": "Number of products sold", "id": "Number of products sold"},
-                            {"name": "Revenue generated", "id": "Revenue generated", "type": "numeric",
-                             "format": {"specifier": "$,.2f"}}
-                        ],
-                        style_table={"overflowX": "auto"},
-                        style_cell={"padding": "5px", "textAlign": "left"},
-                        style_header={"backgroundColor": "lightgrey", "fontWeight": "bold"},
-                        page_size=5
-                    )
-                ]), width=12)
-            ]),
-            # Graphs
-            dbc.Row([
-                dbc.Col(dcc.Graph(id="bar-revenue-by-product"), width=6),
-                dbc.Col(dcc.Graph(id="bar-sales-by-location"), width=6)
-            ]),
-            dbc.Row([
-                dbc.Col(dcc.Graph(id="scatter-price-vs-sold"), width=12)
-            ]),
-
-        ], width=10)
-    ]),
-
-], className="mt-4")
+# Dataset columns behind the dropdowns, in callback argument order.
+PAGE_FILTERS = ["Product type", "Supplier name", "Location"]
 
-@callback(
+# The KPI cards and the bar charts, each answered in one pass over the cube.
+SALES_KPI_PLAN = (
+    AggregationPlan()
+    .total("revenue", "Revenue generated", "sum")
+    .total("avg_price", "Price", "mean")
+    .total("sold", "Number of products sold", "sum")
+    .total("cost", "Costs", "sum")
+)
+SALES_CHART_PLAN = (
+    AggregationPlan()
+    .group("revenue_by_type", "Product type", "Revenue generated", "sum")
+    .group("sold_by_location", "Location", "Number of products sold", "sum")
+)
+# Rows per page of the products table; pages are cut on the server.
+TABLE_PAGE_SIZE = 5
+
+
+def chart_skeletons(ds):
+    agg = ds.cube.run(SALES_CHART_PLAN, {})
+    return {
+        "bar-revenue-by-product": BarSkeleton(
+            agg["revenue_by_type"], x="Product type", y="Revenue generated", color="Product type",
+            title="Total Revenue by Product Type", signature=ds.version, template="plotly_white"
+        ),
+        "bar-sales-by-location": BarSkeleton(
+            agg["sold_by_location"], x="Location", y="Number of products sold", color="Location",
+            title="Products Sold by Location", signature=ds.version, template="plotly_white"
+        ),
+    }
+
+
+# The KPI cards and bar charts as computed in the browser with CLIENT_FILTERING.
+CLIENT_VIEW = (
+    ClientView(PAGE_FILTERS, chart_skeletons)
+    .kpi("kpi-total-revenue", SALES_KPI_PLAN, "revenue", prefix="$", decimals=2, grouping=True)
+    .kpi("kpi-avg-price", SALES_KPI_PLAN, "avg_price", prefix="$", decimals=2, grouping=True)
+    .kpi("kpi-total-sold", SALES_KPI_PLAN, "sold", decimals=0)
+    .bar("bar-revenue-by-product", SALES_CHART_PLAN, "revenue_by_type", when="Product type", histogram=histogram_spec(
+        "Revenue generated", "Product type", "Revenue Distribution by Product Type"
+    ))
+    .bar("bar-sales-by-location", SALES_CHART_PLAN, "sold_by_location")
+)
+
+
+def layout(**kwargs):
+    # Built per page load so the dropdowns follow data reloads.
+    df = get_data()
+
+    # Unique filter values
+    product_types = options(df, "Product type")
+    suppliers = options(df, "Supplier name")
+    locations = options(df, "Location")
+
+    return html.Div([
+        html.H2("Sales Dashboard", className="mb-4"),
+
+        dbc.Row([
+            # Sidebar Filters
+            dbc.Col([
+                html.H3("Filters", className="mb-4"),
+                html.Label("Product Type"),
+                dcc.Dropdown(product_types, id="sales-product-filter", multi=True),
+
+                html.Label("Supplier"),
+                dcc.Dropdown(suppliers, id="sales-supplier-filter", multi=True),
+
+                html.Label("Location"),
+                dcc.Dropdown(locations, id="sales-location-filter", multi=True)
+            ], width=2, style={"backgroundColor": "#f8f9fa", "padding": "20px"}),
+            # Main Content
+            dbc.Col([
+                # KPIs
+                dbc.Row([
+                    dbc.Col(dbc.Card(dbc.CardBody([
+                        html.H6("Total Revenue"), html.H4(id="kpi-total-revenue")
+                    ]), color="success", inverse=True), width=4),
+                    dbc.Col(dbc.Card(dbc.CardBody([
+                        html.H6("Avg Price"), html.H4(id="kpi-avg-price")
+                    ]), color="primary", inverse=True), width=4),
+                    dbc.Col(dbc.Card(dbc.CardBody([
+                        html.H6("Total Products Sold"), html.H4(id="kpi-total-sold")
+                    ]), color="info", inverse=True), width=4),
+                    # dbc.Col(dbc.Card(dbc.CardBody([
+                    #     html.H6("Total Cost"), html.H4(id="kpi-total-cost")
+                    # ]), color="danger", inverse=True), width=3),
+                ], className="mb-4"),
+                dbc.Row([
+                    dbc.Col(html.Div([
+                        html.H5("Top Selling Products", className="mt-4"),
+                        dash_table.DataTable(
+                            id="top-products-table",
+                            columns=[
+                                {"name": "SKU", "id": "SKU"},
+                                {"name": "Product type", "id": "Product type"},
+                                {"name": "Number of products sold", "id": "Number of products sold"},
+                                {"name": "Revenue generated", "id": "Revenue generated", "type": "numeric",
+                                 "format": {"specifier": "$,.2f"}}
+                            ],
+                            style_table={"overflowX": "auto"},
+                            style_cell={"padding": "5px", "textAlign": "left"},
+                            style_header={"backgroundColor": "lightgrey", "fontWeight": "bold"},
+                            page_action="custom", page_current=0, page_size=TABLE_PAGE_SIZE,
+                            sort_action="custom", sort_mode="single", sort_by=[]
+                        )
+                    ]), width=12)
+                ]),
+                # Graphs
+                dbc.Row([
+                    dbc.Col(dcc.Graph(id="bar-revenue-by-product"), width=6),
+                    dbc.Col(dcc.Graph(id="bar-sales-by-location"), width=6)
+                ]),
+                dbc.Row([
+                    dbc.Col(dcc.Graph(id="scatter-price-vs-sold"), width=12)
+                ]),
+                # Which skeleton each bar chart shows, so updates can be patches.
+                dcc.Store(id="sales-charts-sent"),
+                CLIENT_VIEW.store("sales-bundle"),
+
+            ], width=10)
+        ]),
+
+    ], className="mt-4")
+
+# The KPI cards, the cube-backed charts, the scatter and the table each have
+# their own callback: Dash requests them in parallel, so the cards paint as
+# soon as the cube answers instead of waiting on the slowest figure.
+@cube_callback(
+    "sales-bundle",
     Output("kpi-total-revenue", "children"),
     Output("kpi-avg-price", "children"),
     Output("kpi-total-sold", "children"),
     # Output("kpi-total-cost", "children"),
-    Output("bar-revenue-by-product", "figure"),
-    Output("bar-sales-by-location", "figure"),
-    Output("scatter-price-vs-sold", "figure"),
-    Output("top-products-table", "data"),
     Input("sales-product-filter", "value"),
     Input("sales-supplier-filter", "value"),
     Input("sales-location-filter", "value")
 )
-def update_sales_dashboard(product_types, suppliers, locations):
-    # Filter the DataFrame
-    filtered = df.copy()
-    if product_types:
-        filtered = filtered[filtered["Product type"].isin(product_types)]
-    if suppliers:
-        filtered = filtered[filtered["Supplier name"].isin(suppliers)]
-    if locations:
-        filtered = filtered[filtered["Location"].isin(locations)]
-
-    # --- KPI CALCULATIONS ---
-    total_revenue = filtered["Revenue generated"].sum()
-    avg_price = filtered["Price"].mean()
-    total_sold = filtered["Number of products sold"].sum()
-    total_cost = filtered["Costs"].sum()
-
-    # --- CHARTS ---
-    # Revenue by Product Type
-    if product_types:
-        # Histogram: Distribution of revenue values within selected product types
-        fig_revenue = px.histogram(
-            filtered,
-            x="Revenue generated",
-            color="Product type",
-            nbins=20,
-            title="Revenue Distribution by Product Type",
-            template="plotly_white",
-        )
-    else:
-        # Bar chart: Total revenue per product type
-        fig_revenue = px.bar(
-            filtered.groupby("Product type", as_index=False)["Revenue generated"].sum(),
-            x="Product type", y="Revenue generated",
-            title="Total Revenue by Product Type",
-            color="Product type", template="plotly_white"
-        )
-
-    # Sales by Location
-    fig_sales = px.bar(
-        filtered.groupby("Location", as_index=False)["Number of products sold"].sum(),
-        x="Location", y="Number of products sold", title="Products Sold by Location",
-        color="Location", template="plotly_white"
-    )
-
-    # Price vs Products Sold
-    fig_scatter = px.scatter(
-        filtered, x="Price", y="Number of products sold", color="Product type",
-        title="Price vs. Number of Products Sold", template="plotly_white"
-    )
+@instrument
+@memoize
+def update_sales_kpis(product_types, suppliers, locations):
+    ds = get_dataset()
+    selections = dict(zip(PAGE_FILTERS, (product_types, suppliers, locations)))
 
-    top_products = (
-        filtered.groupby(["SKU", "Product type"], as_index=False)
-        .agg({"Number of products sold": "sum", "Revenue generated": "sum"})
-        .sort_values(by="Revenue generated", ascending=False)
-        .head(5)
-    )
+    with phase("aggregate"):
+        agg = ds.cube.run(SALES_KPI_PLAN, selections)
+        total_revenue = agg["revenue"]
+        avg_price = agg["avg_price"]
+        total_sold = agg["sold"]
+        total_cost = agg["cost"]
 
-    # Return values for all outputs
     return (
         f"${total_revenue:,.2f}",
         f"${avg_price:,.2f}",
         f"{int(total_sold)}",
         # f"${total_cost:,.2f}",
-        fig_revenue,
-        fig_sales,
-        fig_scatter,
-        top_products.to_dict("records")
     )
+
+
+@cube_callback(
+    "sales-bundle",
+    Output("bar-revenue-by-product", "figure"),
+    Output("bar-sales-by-location", "figure"),
+    Output("sales-charts-sent", "data"),
+    Input("sales-product-filter", "value"),
+    Input("sales-supplier-filter", "value"),
+    Input("sales-location-filter", "value"),
+    State("sales-charts-sent", "data")
+)
+@instrument
+@memoize
+@compact_outputs
+def update_sales_charts(product_types, suppliers, locations, sent=None):
+    ds = get_dataset()
+    selections = dict(zip(PAGE_FILTERS, (product_types, suppliers, locations)))
+    sent = sent or {}
+
+    with phase("aggregate"):
+        agg = ds.cube.run(SALES_CHART_PLAN, selections)
+        revenue_by_type = agg["revenue_by_type"]
+        sold_by_location = agg["sold_by_location"]
+
+    with phase("figure"):
+        bars = skeletons(ds, "sales-charts", chart_skeletons)
+        shown = {"bar-sales-by-location": bars["bar-sales-by-location"].signature}
+        # Revenue by Product Type
+        if product_types:
+            # Histogram: Distribution of revenue values within selected product types
+            fig_revenue = ds.histograms.figure(
+                "Revenue generated",
+                selections,
+                color="Product type",
+                title="Revenue Distribution by Product Type",
+                template="plotly_white",
+            )
+        else:
+            # Bar chart: Total revenue per product type
+            fig_revenue = bars["bar-revenue-by-product"].render(
+                revenue_by_type, "Total Revenue by Product Type", sent.get("bar-revenue-by-product")
+            )
+            shown["bar-revenue-by-product"] = bars["bar-revenue-by-product"].signature
+
+        # Sales by Location
+        fig_sales = bars["bar-sales-by-location"].render(
+            sold_by_location, "Products Sold by Location", sent.get("bar-sales-by-location")
+        )
+
+    return fig_revenue, fig_sales, shown
+
+
+@callback(
+    Output("scatter-price-vs-sold", "figure"),
+    Input("sales-product-filter", "value"),
+    Input("sales-supplier-filter", "value"),
+    Input("sales-location-filter", "value")
+)
+@instrument
+@memoize
+@compact_outputs
+def update_sales_scatter(product_types, suppliers, locations):
+    ds = get_dataset()
+    selections = dict(zip(PAGE_FILTERS, (product_types, suppliers, locations)))
+
+    with phase("filter"):
+        filtered = ds.index.filter(ds.frame, selections)
+        record_rows(len(ds.frame), len(filtered))
+
+    with phase("figure"):
+        # Price vs Products Sold
+        return sampling.scatter(
+            filtered, x="Price", y="Number of products sold", color="Product type",
+            title="Price vs. Number of Products Sold", template="plotly_white"
+        )
+
+
+@callback(
+    Output("top-products-table", "page_count"),
+    Output("top-products-table", "page_current"),
+    Input("sales-product-filter", "value"),
+    Input("sales-supplier-filter", "value"),
+    Input("sales-location-filter", "value"),
+    Input("top-products-table", "page_size")
+)
+@instrument
+@memoize
+def update_sales_top_products_pages(product_types, suppliers, locations, page_size=TABLE_PAGE_SIZE):
+    # A new selection starts again at the first page.
+    ds = get_dataset()
+    selections = dict(zip(PAGE_FILTERS, (product_types, suppliers, locations)))
+
+    with phase("aggregate"):
+        count = ds.products.count(ds.index, ds.frame, selections)
+
+    return max(1, -(-count // page_size)), 0
+
+
+@callback(
+    Output("top-products-table", "data"),
+    Input("sales-product-filter", "value"),
+    Input("sales-supplier-filter", "value"),
+    Input("sales-location-filter", "value"),
+    Input("top-products-table", "page_current"),
+    Input("top-products-table", "page_size"),
+    Input("top-products-table", "sort_by")
+)
+@instrument
+@memoize
+def update_sales_top_products(product_types, suppliers, locations, page_current=0, page_size=TABLE_PAGE_SIZE,
+                              sort_by=None):
+    ds = get_dataset()
+    selections = dict(zip(PAGE_FILTERS, (product_types, suppliers, locations)))
+
+    # SKU totals and their sort orders are kept per selection, so a page is a
+    # slice of a presorted order.
+    with phase("aggregate"):
+        page = ds.products.page(
+            ds.index, ds.frame, selections, (page_current or 0) * page_size, page_size, sort_order(sort_by)
+        )
+
+    return page.to_dict("records")
+
+
+# Filter-driven callbacks, for tooling that calls them directly (benchmarks, precompute).
+PAGE_CALLBACKS = [
+    update_sales_kpis, update_sales_charts, update_sales_scatter, update_sales_top_products_pages,
+    update_sales_top_products,
+]
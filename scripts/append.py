@@ -0,0 +1,27 @@
+# scripts/append.py
+# Appends the rows of a CSV (same columns as the main one) to the dataset,
+# updating the columnar copy and the cube cells from the new rows only:
+#   python scripts/append.py NEW_ROWS.csv
+# Running app workers pick the rows up on their next DATA_RELOAD_INTERVAL check.
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from analytics.append import append_csv
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Append rows to the supply-chain dataset.")
+    parser.add_argument("source", help="CSV of rows to append")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    dataset = append_csv(args.source)
+    elapsed = time.perf_counter() - start
+    print(f"Dataset now {len(dataset.frame):,} rows (version {dataset.version}) after {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,23 @@
+import os
+import sys
+
 import dash
 from dash import dcc, html, dash_table
 import dash_bootstrap_components as dbc
-import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from analytics.data import get_data, get_dataset, options
 
 # Load your cleaned data
-df = pd.read_csv("../data/raw/supply_chain_data.csv")
+df = get_data()
 
 # Initialize app
 app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
 
 # Unique values for filters
-product_types = df['Product type'].unique()
-suppliers = df['Supplier name'].unique()
-locations = df['Location'].unique()
+product_types = options(df, 'Product type')
+suppliers = options(df, 'Supplier name')
+locations = options(df, 'Location')
 
 # App layout
 app.layout = dbc.Container([
@@ -93,19 +98,17 @@ from dash.dependencies import Input, Output
     Input("location-filter", "value")
 )
 def update_kpis(selected_types, selected_suppliers, selected_locations):
-    filtered_df = df.copy()
-
-    if selected_types:
-        filtered_df = filtered_df[filtered_df['Product type'].isin(selected_types)]
-    if selected_suppliers:
-        filtered_df = filtered_df[filtered_df['Supplier name'].isin(selected_suppliers)]
-    if selected_locations:
-        filtered_df = filtered_df[filtered_df['Location'].isin(selected_locations)]
-
-    avg_manufacturing_cost = filtered_df['Manufacturing costs'].mean()
-    avg_shipping_cost = filtered_df['Shipping costs'].mean()
-    avg_lead_time = filtered_df['Lead time'].mean()
-    avg_defect_rate = filtered_df['Defect rates'].mean()
+    cube = get_dataset().cube
+    selections = {
+        'Product type': selected_types,
+        'Supplier name': selected_suppliers,
+        'Location': selected_locations,
+    }
+
+    avg_manufacturing_cost = cube.total(selections, 'Manufacturing costs', 'mean')
+    avg_shipping_cost = cube.total(selections, 'Shipping costs', 'mean')
+    avg_lead_time = cube.total(selections, 'Lead time', 'mean')
+    avg_defect_rate = cube.total(selections, 'Defect rates', 'mean')
 
     return (
         f"${avg_manufacturing_cost:.2f}",
@@ -0,0 +1,36 @@
+# scripts/ingest.py
+# Streams the supply-chain CSV into the columnar layout the app memory-maps,
+# chunk by chunk, so files larger than memory can be converted:
+#   python scripts/ingest.py [--source CSV] [--out DIR] [--chunk-rows N]
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from analytics.data import COLUMNAR_PATH, DATA_PATH
+from analytics.ingest import CHUNK_ROWS, ingest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert the supply-chain CSV to the columnar layout.")
+    parser.add_argument("--source", default=DATA_PATH, help="CSV to convert")
+    parser.add_argument("--out", default=COLUMNAR_PATH, help="output directory")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help="rows parsed per chunk")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+
+    def progress(rows):
+        elapsed = time.perf_counter() - start
+        print(f"{rows:>12,} rows  {rows / elapsed:10,.0f} rows/s", file=sys.stderr)
+
+    manifest = ingest(args.source, args.out, args.chunk_rows, progress)
+    elapsed = time.perf_counter() - start
+    print(f"Wrote {manifest['rows']:,} rows, {len(manifest['columns'])} columns to {args.out} in {elapsed:.2f}s")
+    if "partition_by" in manifest:
+        print(f"{len(manifest['partitions'])} partitions by {', '.join(manifest['partition_by'])}")
+
+
+if __name__ == "__main__":
+    main()
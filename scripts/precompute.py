@@ -0,0 +1,107 @@
+# scripts/precompute.py
+# Renders the page callbacks for the common filter selections ahead of time and
+# writes their outputs where the app serves them from (see PrecomputedStore):
+#   python scripts/precompute.py [--depth 2] [--workers N] [--pages sales,...]
+# Outputs already on disk for the current data version are skipped, so an
+# interrupted run picks up where it stopped.
+import argparse
+import importlib
+import itertools
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Render every selection for real: no cache, no reading back our own output.
+os.environ["CACHE_BACKEND"] = "off"
+os.environ["PRECOMPUTED"] = "0"
+os.environ["METRICS"] = "0"
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from plotly.io.json import to_json_plotly
+
+from analytics.cache import PRECOMPUTED_DIR, PrecomputedStore, callback_cache
+from analytics.data import get_data, get_version, options
+
+PAGES = {"sales": "pages.sales", "logistics": "pages.logistics", "production": "pages.production"}
+
+
+def selections(df, columns, depth):
+    # No filter and every single value; at depth 2 also every pair of values
+    # within a filter and every pair of single values across two filters.
+    values = [sorted(options(df, c)) for c in columns]
+    combos = [tuple(None for _ in columns)]
+    for i, vals in enumerate(values):
+        combos += [tuple([v] if j == i else None for j in range(len(columns))) for v in vals]
+    if depth >= 2:
+        for i, vals in enumerate(values):
+            combos += [
+                tuple(list(pair) if j == i else None for j in range(len(columns)))
+                for pair in itertools.combinations(vals, 2)
+            ]
+        for i, k in itertools.combinations(range(len(columns)), 2):
+            for a, b in itertools.product(values[i], values[k]):
+                combos.append(tuple([a] if j == i else [b] if j == k else None for j in range(len(columns))))
+    return combos
+
+
+def _init():
+    import index  # noqa: F401  registers the pages; a no-op for forked workers
+
+
+def _render(module, name, args):
+    # Callbacks with several outputs return a tuple, stored as a list the
+    # store turns back into a tuple; a single output is stored as it is.
+    func = getattr(importlib.import_module(module), name)
+    value = func(*args)
+    if isinstance(value, tuple):
+        return to_json_plotly({"outputs": list(value)})
+    return to_json_plotly({"output": value})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute page outputs for common filter selections.")
+    parser.add_argument("--pages", default=",".join(PAGES), help="comma-separated subset of pages")
+    parser.add_argument("--depth", type=int, default=2, help="1 = single values, 2 = also pairs")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--out", default=PRECOMPUTED_DIR, help="output directory")
+    parser.add_argument("--prune", action="store_true", help="delete outputs of older data versions")
+    args = parser.parse_args()
+
+    _init()
+    store = PrecomputedStore(args.out)
+    version = get_version()
+    if args.prune:
+        store.prune(version)
+
+    df = get_data()
+    tasks = []
+    for page in args.pages.split(","):
+        module = importlib.import_module(PAGES[page])
+        for func in module.PAGE_CALLBACKS:
+            for combo in selections(df, module.PAGE_FILTERS, args.depth):
+                key = callback_cache.key(func, combo)
+                if key not in store:
+                    tasks.append((key, PAGES[page], func.__name__, combo))
+    print(f"{len(tasks):,} outputs to render for data version {version}")
+    if not tasks:
+        return
+
+    start = time.perf_counter()
+    # Forked workers inherit the loaded dataset and its indexes.
+    context = multiprocessing.get_context("fork" if sys.platform != "win32" else "spawn")
+    with ProcessPoolExecutor(args.workers, mp_context=context, initializer=_init) as pool:
+        futures = {pool.submit(_render, *task[1:]): task for task in tasks}
+        for done, future in enumerate(as_completed(futures), 1):
+            key, module, name, combo = futures[future]
+            store.put(key, future.result())
+            if done % 50 == 0 or done == len(tasks):
+                elapsed = time.perf_counter() - start
+                eta = elapsed / done * (len(tasks) - done)
+                print(f"[{done:>6,}/{len(tasks):,}] {done / elapsed:6.1f}/s  eta {eta:5.0f}s")
+    print(f"Wrote {len(tasks):,} outputs to {args.out} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from analytics.append import append_rows, concat_frames
+from analytics.data import Dataset, get_dataset, set_dataset
+from analytics.filters import FILTER_COLUMNS
+from benchmarks.synthetic import generate
+
+MEASURES = ["Revenue generated", "Price", "Number of products sold", "Stock levels"]
+
+
+def selections(frame, rng, count):
+    values = {c: frame[c].cat.categories.tolist() for c in FILTER_COLUMNS}
+    for _ in range(count):
+        yield {
+            c: None if rng.random() < 0.5 else list(rng.choice(values[c], rng.integers(1, 3), replace=False))
+            for c in FILTER_COLUMNS
+        }
+
+
+def test_concat_keeps_existing_codes():
+    frame = generate(500, seed=0)
+    rows = generate(50, seed=1)
+    rows["Location"] = pd.Categorical(["Pune"] * 25 + ["Mumbai"] * 25)
+    merged = concat_frames(frame, rows)
+    assert len(merged) == 550
+    for column in frame.columns:
+        if isinstance(frame[column].dtype, pd.CategoricalDtype):
+            before = frame[column].cat.categories.tolist()
+            assert merged[column].cat.categories.tolist()[:len(before)] == before
+            np.testing.assert_array_equal(merged[column].cat.codes[:500], frame[column].cat.codes)
+            assert merged[column].iloc[500:].tolist() == rows[column].tolist()
+        else:
+            assert merged[column].dtype == frame[column].dtype
+            np.testing.assert_array_equal(merged[column].iloc[500:], rows[column].to_numpy())
+    assert merged["Location"].cat.categories[-1] == "Pune"
+
+
+@pytest.fixture(scope="module")
+def datasets():
+    # A snapshot extended by appended rows, and one built from all the rows.
+    frame = generate(3000, seed=2)
+    full = concat_frames(frame, generate(700, seed=3))
+    extended = Dataset(frame, "v1").warm().extend(full, "v2")
+    return extended, Dataset(full, "v2")
+
+
+def test_extended_index_matches_reload(datasets):
+    extended, fresh = datasets
+    for selected in selections(fresh.frame, np.random.default_rng(4), 100):
+        a, b = extended.index.select(selected), fresh.index.select(selected)
+        assert (a is None) == (b is None)
+        if a is not None:
+            np.testing.assert_array_equal(a, b)
+
+
+def test_extended_cube_matches_reload(datasets):
+    extended, fresh = datasets
+    for selected in selections(fresh.frame, np.random.default_rng(5), 50):
+        for measure in MEASURES:
+            for how in ("sum", "mean", "min", "max"):
+                assert extended.cube.total(selected, measure, how) == pytest.approx(
+                    fresh.cube.total(selected, measure, how), rel=1e-9, nan_ok=True
+                )
+
+
+def test_extended_totals_and_histograms_match_reload(datasets):
+    extended, fresh = datasets
+
+    def by_sku(totals):
+        keys = ["SKU", "Product type"]
+        return totals.astype({k: str for k in keys}).sort_values(keys).reset_index(drop=True)
+
+    pd.testing.assert_frame_equal(by_sku(extended.products.totals), by_sku(fresh.products.totals))
+    for selected in selections(fresh.frame, np.random.default_rng(6), 50):
+        a = extended.histograms.counts_by("Inspection results", selected, "Location")
+        b = fresh.histograms.counts_by("Inspection results", selected, "Location")
+        assert a.keys() == b.keys()
+        for value in a:
+            np.testing.assert_array_equal(a[value], b[value])
+
+
+def test_extended_inventory_matches_reload(datasets):
+    extended, fresh = datasets
+    for a, b in zip(extended.inventory.issues(), fresh.inventory.issues()):
+        pd.testing.assert_frame_equal(a, b)
+    for selected in selections(fresh.frame, np.random.default_rng(7), 20):
+        rows = fresh.index.select(selected)
+        for a, b in zip(extended.inventory.issues(rows), fresh.inventory.issues(rows)):
+            pd.testing.assert_frame_equal(a, b)
+
+
+def test_append_rows_publishes_a_new_snapshot():
+    previous = get_dataset()
+    frame = generate(1000, seed=8)
+    rows = generate(100, seed=9)
+    try:
+        # A version that is not the data on disk: nothing is written.
+        set_dataset(Dataset(frame, "test"))
+        dataset = append_rows(rows)
+        assert get_dataset() is dataset
+        assert dataset.version == f"test+{1100:x}"
+        pd.testing.assert_frame_equal(dataset.frame.iloc[:1000], frame)
+        added = dataset.frame.iloc[1000:].sort_values(list(frame.columns)).reset_index(drop=True)
+        expected = concat_frames(frame, rows).iloc[1000:].sort_values(list(frame.columns)).reset_index(drop=True)
+        pd.testing.assert_frame_equal(added, expected)
+    finally:
+        set_dataset(previous)
@@ -0,0 +1,82 @@
+import base64
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from analytics.bundle import ClientView
+from analytics.data import Dataset
+from analytics.planner import AggregationPlan
+from benchmarks.synthetic import generate
+
+DIMENSIONS = ["Product type", "Location"]
+PLAN = (
+    AggregationPlan()
+    .total("revenue", "Revenue generated", "sum")
+    .total("price", "Price", "mean")
+    .total("sold", "Number of products sold", "sum")
+)
+
+
+def decode(values):
+    if isinstance(values, dict):
+        return np.frombuffer(base64.b64decode(values["bdata"]), dtype=np.dtype(values["dtype"]))
+    return np.asarray(values)
+
+
+@pytest.fixture(scope="module")
+def dataset():
+    return Dataset(generate(3000, seed=0), "v1")
+
+
+def view():
+    return (
+        ClientView(DIMENSIONS)
+        .kpi("revenue", PLAN, "revenue")
+        .kpi("price", PLAN, "price")
+        .kpi("sold", PLAN, "sold")
+        .histogram("inspections", "Inspection results", "Location", "Inspections")
+    )
+
+
+def cells(bundle):
+    # The bundle's rolled-up cells as a frame of labels.
+    return pd.DataFrame({
+        d: np.asarray(bundle["labels"][d], dtype=object)[decode(bundle["cells"][d])] for d in bundle["filters"]
+    })
+
+
+def test_sums_and_counts_per_cell(dataset):
+    bundle = view().bundle(dataset)
+    keys = cells(bundle)
+    # Sums are sent in float64, so compare them with float64 sums.
+    frame = dataset.frame.astype({d: str for d in DIMENSIONS}).astype({"Price": np.float64})
+    for measure in ("Revenue generated", "Price", "Number of products sold"):
+        expected = frame.groupby(DIMENSIONS)[measure].agg(["sum", "count"])
+        got = keys.assign(
+            sum=decode(bundle["measures"][measure]["sum"]), count=decode(bundle["measures"][measure]["count"]),
+        ).set_index(DIMENSIONS)
+        got = got.loc[expected.index]
+        np.testing.assert_allclose(got["sum"], expected["sum"], rtol=1e-9)
+        np.testing.assert_array_equal(got["count"], expected["count"])
+    assert len(keys) == len(expected)
+
+
+def test_histogram_counts_per_cell(dataset):
+    bundle = view().bundle(dataset)
+    keys = cells(bundle)
+    entry = bundle["histograms"]["Inspection results"]
+    counts = decode(entry["counts"]).reshape(len(keys), entry["bins"])
+    frame = dataset.frame.astype({d: str for d in DIMENSIONS + ["Inspection results"]})
+    expected = frame.groupby(DIMENSIONS + ["Inspection results"]).size()
+    for i, key in enumerate(keys.itertuples(index=False)):
+        for j, label in enumerate(entry["labels"]):
+            assert counts[i, j] == expected.get((*key, label), 0)
+
+
+def test_built_once_per_version(dataset):
+    client_view = view()
+    bundle = client_view.bundle(dataset)
+    assert client_view.bundle(dataset) is bundle
+    newer = Dataset(dataset.frame, "v2")
+    assert client_view.bundle(newer)["version"] == "v2"
@@ -0,0 +1,54 @@
+from analytics import cache
+from analytics.cache import CallbackCache, MemoryBackend
+from analytics.data import Dataset, get_dataset, set_dataset
+
+calls = []
+
+
+def update(product_types, locations):
+    calls.append((product_types, locations))
+    return len(calls)
+
+
+def test_key_ignores_value_order_and_empty_filters():
+    callback_cache = CallbackCache(MemoryBackend())
+    key = callback_cache.key
+    assert key(update, (None, ["Mumbai", "Delhi"])) == key(update, ([], ["Delhi", "Mumbai"]))
+    assert key(update, (["haircare"], None)) != key(update, (None, ["haircare"]))
+    assert key(update, (["haircare"], None)) != key(update, (["haircare", "skincare"], None))
+
+
+def test_memoize_reuses_outputs_for_equal_selections():
+    calls.clear()
+    callback_cache = CallbackCache(MemoryBackend())
+    cached = callback_cache.memoize(update)
+    assert cached(["skincare", "haircare"], None) == 1
+    assert cached(["haircare", "skincare"], []) == 1
+    assert cached(["haircare"], None) == 2
+    assert len(calls) == 2
+    stats = callback_cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 2, 2)
+
+
+def test_new_data_version_recomputes(monkeypatch):
+    calls.clear()
+    callback_cache = CallbackCache(MemoryBackend())
+    cached = callback_cache.memoize(update)
+    monkeypatch.setattr(cache, "get_version", lambda: "v1")
+    before = callback_cache.key(update, (None, None))
+    assert cached(None, None) == 1
+    monkeypatch.setattr(cache, "get_version", lambda: "v2")
+    assert callback_cache.key(update, (None, None)) != before
+    assert cached(None, None) == 2
+
+
+def test_swapping_the_dataset_changes_keys():
+    callback_cache = CallbackCache(MemoryBackend())
+    current = get_dataset()
+    before = callback_cache.key(update, (None, None))
+    try:
+        set_dataset(Dataset(current.frame, f"{current.version}+swapped"))
+        assert callback_cache.key(update, (None, None)) != before
+    finally:
+        set_dataset(current)
+    assert callback_cache.key(update, (None, None)) == before
@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from analytics.columnar import read_columnar, read_manifest, write_columnar
+
+
+def frame(n, seed):
+    rng = np.random.default_rng(seed)
+    location = rng.choice(["Mumbai", "Delhi", "Kolkata"], n).astype(object)
+    location[rng.random(n) < 0.1] = None
+    return pd.DataFrame({
+        "Location": pd.Categorical(location, categories=["Mumbai", "Delhi", "Kolkata", "Pune"]),
+        "Stock levels": rng.integers(0, 100, n).astype("int16"),
+        "Price": rng.random(n).astype("float32"),
+        "Revenue generated": rng.random(n) * 1e4,
+    })
+
+
+@pytest.mark.parametrize("mmap", [True, False])
+def test_round_trip(tmp_path, mmap):
+    df = frame(1000, seed=0)
+    write_columnar(df, str(tmp_path / "data"), source_version="v1")
+    pd.testing.assert_frame_equal(read_columnar(str(tmp_path / "data"), mmap=mmap), df)
+    assert read_manifest(str(tmp_path / "data"))["source_version"] == "v1"
+
+
+def test_rewrite_replaces_the_dataset(tmp_path):
+    directory = str(tmp_path / "data")
+    write_columnar(frame(1000, seed=1), directory)
+    smaller = frame(10, seed=2)
+    write_columnar(smaller, directory)
+    pd.testing.assert_frame_equal(read_columnar(directory), smaller)
+
+
+def test_empty_frame(tmp_path):
+    df = frame(0, seed=3)
+    write_columnar(df, str(tmp_path / "data"))
+    pd.testing.assert_frame_equal(read_columnar(str(tmp_path / "data")), df)
+
+
+def test_text_columns_are_rejected(tmp_path):
+    df = frame(10, seed=4).assign(SKU=[f"SKU{i}" for i in range(10)])
+    with pytest.raises(TypeError):
+        write_columnar(df, str(tmp_path / "data"))
+    assert read_manifest(str(tmp_path / "data")) is None
+
+
+def test_missing_dataset(tmp_path):
+    assert read_manifest(str(tmp_path)) is None
+    with pytest.raises(FileNotFoundError):
+        read_columnar(str(tmp_path))
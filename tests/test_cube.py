@@ -0,0 +1,67 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from analytics.cube import PASS_MEASURE, Cube
+from analytics.data import DATA_PATH
+from analytics.schema import DTYPES
+
+MEASURES = ["Revenue generated", "Price", "Number of products sold", "Shipping costs", PASS_MEASURE]
+HOWS = ["sum", "mean", "count", "min", "max"]
+SELECTIONS = [
+    {},
+    {"Product type": ["skincare"]},
+    {"Location": ["Mumbai", "Delhi"], "Shipping carriers": ["Carrier B"]},
+    {"Supplier name": ["Supplier 1", "Supplier 3"], "Transportation modes": ["Air", "Road"]},
+]
+
+
+@pytest.fixture(scope="module")
+def rows():
+    # The sample resampled so every cell holds several rows.
+    df = pd.read_csv(DATA_PATH, dtype=DTYPES).sample(3000, replace=True, random_state=0)
+    df[PASS_MEASURE] = df["Inspection results"].eq("Pass").astype("int8")
+    return df.reset_index(drop=True)
+
+
+def selected(df, selections):
+    mask = np.ones(len(df), dtype=bool)
+    for column, values in selections.items():
+        mask &= df[column].isin(values).to_numpy()
+    return df[mask]
+
+
+def test_totals_match_the_rows(rows):
+    cube = Cube(rows)
+    for selections in SELECTIONS:
+        df = selected(rows, selections)
+        for measure in MEASURES:
+            for how in HOWS:
+                # Sums of float32 measures may carry float32 rounding.
+                expected = df[measure].astype(np.float64).agg(how)
+                assert cube.total(selections, measure, how) == pytest.approx(expected, rel=1e-6)
+
+
+def test_groups_match_groupby(rows):
+    cube = Cube(rows)
+    for selections in SELECTIONS:
+        df = selected(rows, selections)
+        for by in ("Product type", ["Location", "Supplier name"]):
+            for measure in MEASURES:
+                for how in HOWS:
+                    keys = [by] if isinstance(by, str) else by
+                    expected = df.groupby(by, as_index=False, observed=True)[measure].agg(how)
+                    got = cube.group(selections, by, measure, how)
+                    expected = expected.sort_values(keys).reset_index(drop=True)
+                    got = got.sort_values(keys).reset_index(drop=True)
+                    pd.testing.assert_frame_equal(got, expected, check_dtype=False, check_categorical=False)
+
+
+def test_empty_selection(rows):
+    cube = Cube(rows)
+    nothing = {"Location": ["Pune"]}
+    assert cube.total(nothing, "Revenue generated", "sum") == 0
+    assert math.isnan(cube.total(nothing, "Price", "mean"))
+    assert len(cube.group(nothing, "Product type", "Price", "mean")) == 0
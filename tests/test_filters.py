@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+
+from analytics.filters import FILTER_COLUMNS, FilterIndex
+
+VALUES = {
+    "Product type": ["cosmetics", "haircare", "skincare"],
+    "Supplier name": ["Supplier 1", "Supplier 2", "Supplier 3", "Supplier 4"],
+    "Location": ["Chennai", "Delhi", "Kolkata", "Mumbai", "Bangalore"],
+    "Shipping carriers": ["Carrier A", "Carrier B", "Carrier C"],
+    "Transportation modes": ["Air", "Rail", "Road", "Sea"],
+}
+
+
+def frame(n, seed):
+    # Filter columns as categoricals with some missing values, one value never
+    # used, and a measure to check which rows came back.
+    rng = np.random.default_rng(seed)
+    columns = {}
+    for column, values in VALUES.items():
+        drawn = rng.choice(values[:-1] if column == "Location" else values, n).astype(object)
+        drawn[rng.random(n) < 0.05] = None
+        columns[column] = pd.Categorical(drawn, categories=values)
+    columns["Price"] = rng.random(n)
+    return pd.DataFrame(columns)
+
+
+def expected(df, selections):
+    mask = np.ones(len(df), dtype=bool)
+    for column, values in selections.items():
+        if values:
+            mask &= df[column].isin(values).to_numpy()
+    return np.flatnonzero(mask)
+
+
+def check(df, index, selections):
+    rows = index.select(selections)
+    np.testing.assert_array_equal(rows, expected(df, selections))
+    pd.testing.assert_frame_equal(index.filter(df, selections), df.iloc[expected(df, selections)])
+
+
+def test_empty_selection_is_all_rows():
+    df = frame(500, seed=0)
+    index = FilterIndex(df)
+    for selections in ({}, {c: None for c in FILTER_COLUMNS}, {c: [] for c in FILTER_COLUMNS}):
+        assert index.select(selections) is None
+        assert index.filter(df, selections) is df
+
+
+def test_single_and_multi_value_selections():
+    df = frame(2000, seed=1)
+    index = FilterIndex(df)
+    rng = np.random.default_rng(2)
+    for _ in range(200):
+        selections = {}
+        for column, values in VALUES.items():
+            if rng.random() < 0.5:
+                selections[column] = list(rng.choice(values, rng.integers(1, 4), replace=False))
+        if selections:
+            check(df, index, selections)
+
+
+def test_unknown_values():
+    df = frame(500, seed=3)
+    index = FilterIndex(df)
+    # A value absent from the data selects nothing, alone or next to a known one.
+    assert len(index.select({"Location": ["Pune"]})) == 0
+    assert len(index.select({"Location": ["Bangalore"]})) == 0
+    assert len(index.filter(df, {"Location": ["Pune"], "Product type": ["haircare"]})) == 0
+    check(df, index, {"Location": ["Pune", "Delhi"]})
+    check(df, index, {"Location": ["Bangalore", "Mumbai"], "Product type": ["skincare"]})
@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from analytics.columnar import ColumnarWriter, read_columnar
+from analytics.cube import Cube
+from analytics.data import DATA_PATH
+from analytics.ingest import CUBE_DIR, conform, ingest
+from analytics.schema import DTYPES
+
+
+def as_rows(df):
+    # Rows as plain values in a canonical order, to compare frames whose row
+    # order or category order may differ.
+    df = df.astype({c: object for c in df.columns if isinstance(df[c].dtype, pd.CategoricalDtype)})
+    return df.sort_values(list(df.columns)).reset_index(drop=True)
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "rows.csv"
+    pd.read_csv(DATA_PATH).sample(1000, replace=True, random_state=0).to_csv(path, index=False)
+    return str(path)
+
+
+def test_ingest_matches_the_csv(source, tmp_path):
+    directory = str(tmp_path / "columnar")
+    manifest = ingest(source, directory, chunk_rows=128)
+    expected = pd.read_csv(source, dtype=DTYPES)
+    assert manifest["rows"] == len(expected)
+    frame = read_columnar(directory)
+    assert {c: str(t) for c, t in frame.dtypes.items()} == {c: str(t) for c, t in expected.dtypes.items()}
+    pd.testing.assert_frame_equal(as_rows(frame), as_rows(expected))
+
+    # Cube cells merged chunk by chunk match a cube of all the rows.
+    cells = read_columnar(f"{directory}/{CUBE_DIR}", mmap=False)
+    pd.testing.assert_frame_equal(as_rows(cells), as_rows(Cube(expected).cells), check_dtype=False)
+
+
+def test_writer_merges_chunk_categories(tmp_path):
+    chunks = [
+        pd.DataFrame({"Location": pd.Categorical(["Delhi", "Mumbai"]), "Stock levels": np.array([1, 2], "int16")}),
+        pd.DataFrame({"Location": pd.Categorical(["Pune", None, "Delhi"]), "Stock levels": np.array([3, 4, 5], "int16")}),
+    ]
+    with ColumnarWriter(str(tmp_path / "data"), sort_categories=True) as writer:
+        for part in chunks:
+            writer.append(part)
+    frame = read_columnar(str(tmp_path / "data"))
+    assert frame["Location"].cat.categories.tolist() == ["Delhi", "Mumbai", "Pune"]
+    assert frame["Location"].cat.codes.tolist() == [0, 1, 2, -1, 0]
+    assert frame["Stock levels"].tolist() == [1, 2, 3, 4, 5]
+
+
+def test_writer_discards_a_failed_build(tmp_path):
+    directory = str(tmp_path / "data")
+    with pytest.raises(TypeError):
+        with ColumnarWriter(directory) as writer:
+            writer.append(pd.DataFrame({"Stock levels": np.array([1], "int16")}))
+            writer.append(pd.DataFrame({"Stock levels": np.array([1.5])}))
+    assert not (tmp_path / "data").exists()
+    assert list(tmp_path.iterdir()) == []
+
+
+def chunk(**changes):
+    rows = pd.read_csv(DATA_PATH, nrows=5, dtype=str)
+    for column, (row, value) in changes.items():
+        rows.loc[row, column.replace("_", " ")] = value
+    return rows
+
+
+def test_conform_rejects_rows_outside_the_schema():
+    conformed = conform(chunk())
+    assert {c: str(t) for c, t in conformed.dtypes.items()} == DTYPES
+    with pytest.raises(ValueError, match="missing \\['Price'\\]"):
+        conform(chunk().drop(columns="Price"))
+    with pytest.raises(ValueError, match="unexpected \\['Notes'\\]"):
+        conform(chunk().assign(Notes="x"))
+    with pytest.raises(ValueError, match="line 4: 'Price' value 'n/a' is not numeric"):
+        conform(chunk(Price=(2, "n/a")))
+    with pytest.raises(ValueError, match="line 3: 'Stock levels' is empty"):
+        conform(chunk(Stock_levels=(1, None)))
+    with pytest.raises(ValueError, match="line 12: 'Availability' value 40000 does not fit int16"):
+        conform(chunk(Availability=(0, "40000")), first_line=12)
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from analytics.append import concat_frames
+from analytics.filters import FILTER_COLUMNS, FilterIndex
+from analytics.partitions import Partitions, cluster
+from benchmarks.synthetic import generate
+
+
+def selections(frame, rng, count):
+    values = {c: frame[c].cat.categories.tolist() for c in FILTER_COLUMNS}
+    for _ in range(count):
+        yield {
+            c: None if rng.random() < 0.4 else list(rng.choice(values[c], rng.integers(1, 3), replace=False))
+            for c in FILTER_COLUMNS
+        }
+
+
+def assert_same_rows(frame, pruned, plain, rng, count=200):
+    for selected in selections(frame, rng, count):
+        a, b = plain.select(selected), pruned.select(selected)
+        assert (a is None) == (b is None)
+        if a is not None:
+            np.testing.assert_array_equal(a, b)
+        assert plain.filter(frame, selected).equals(pruned.filter(frame, selected))
+
+
+@pytest.mark.parametrize("by", [["Location"], ["Location", "Supplier name"]])
+def test_pruning_returns_the_unpruned_rows(by):
+    frame = cluster(generate(4000, seed=3), by)
+    partitions = Partitions.of(frame, by)
+    assert partitions is not None
+    assert_same_rows(frame, FilterIndex(frame, partitions=partitions), FilterIndex(frame), np.random.default_rng(0))
+
+
+def test_pruning_after_extend():
+    by = ["Location"]
+    frame = cluster(generate(3000, seed=4), by)
+    rows = cluster(generate(700, seed=5), by)
+    extended = concat_frames(frame, rows)
+    index = FilterIndex(frame, partitions=Partitions.of(frame, by)).extend(extended, len(frame))
+    assert_same_rows(extended, index, FilterIndex(extended), np.random.default_rng(1))
+
+
+def test_entries_round_trip():
+    by = ["Location"]
+    frame = cluster(generate(2000, seed=6), by)
+    partitions = Partitions.of(frame, by)
+    loaded = Partitions.from_entries(partitions.entries(), by, frame)
+    np.testing.assert_array_equal(loaded.starts, partitions.starts)
+    np.testing.assert_array_equal(loaded.stops, partitions.stops)
+    for column in partitions.low:
+        np.testing.assert_allclose(loaded.low[column], partitions.low[column])
+        np.testing.assert_allclose(loaded.high[column], partitions.high[column])
+
+
+def test_unclustered_rows_are_not_partitioned():
+    frame = generate(20000, seed=7)
+    assert Partitions.of(frame, ["Location", "Supplier name"]) is None
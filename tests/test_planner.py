@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from analytics.cube import Cube
+from analytics.data import DATA_PATH
+from analytics.planner import AggregationPlan
+from analytics.schema import DTYPES
+
+HOWS = ["sum", "mean", "count", "min", "max"]
+GROUPS = [["Product type"], ["Location", "Shipping carriers"], ["SKU", "Product type"]]
+COLUMNS = ["Revenue generated", "Number of products sold", "Shipping costs"]
+
+
+@pytest.fixture(scope="module")
+def rows():
+    df = pd.read_csv(DATA_PATH, dtype=DTYPES).sample(3000, replace=True, random_state=1).reset_index(drop=True)
+    # Missing values are skipped like groupby skips them.
+    shipping = df["Shipping costs"].copy()
+    shipping[np.random.default_rng(0).random(len(df)) < 0.1] = np.nan
+    return df.assign(**{"Shipping costs": shipping})
+
+
+def plan_for(how):
+    plan = AggregationPlan()
+    for column in COLUMNS:
+        plan.total(column, column, how)
+    for i, keys in enumerate(GROUPS):
+        plan.group(i, keys, COLUMNS, how)
+    return plan
+
+
+@pytest.mark.parametrize("how", HOWS)
+def test_plan_matches_groupby(rows, how):
+    results = plan_for(how).run(rows)
+    for column in COLUMNS:
+        assert results[column] == pytest.approx(rows[column].astype(np.float64).agg(how), rel=1e-9, nan_ok=True)
+    for i, keys in enumerate(GROUPS):
+        expected = rows.groupby(keys, as_index=False, observed=True)[COLUMNS].agg(how)
+        pd.testing.assert_frame_equal(results[i], expected, check_dtype=False, rtol=1e-6)
+
+
+def test_integer_sums_stay_integers(rows):
+    results = AggregationPlan().total("sold", "Number of products sold", "sum").run(rows)
+    assert results["sold"] == rows["Number of products sold"].astype(np.int64).sum()
+    assert np.asarray(results["sold"]).dtype.kind == "i"
+
+
+def test_empty_frame(rows):
+    results = plan_for("mean").run(rows.iloc[:0])
+    assert np.isnan(results["Revenue generated"])
+    assert all(len(results[i]) == 0 for i in range(len(GROUPS)))
+
+
+@pytest.mark.parametrize("how", HOWS)
+def test_cube_cells_answer_like_rows(rows, how):
+    cube = Cube(rows)
+    plan = AggregationPlan().total("revenue", "Revenue generated", how).group(
+        "by_location", ["Location", "Product type"], ["Revenue generated", "Shipping costs"], how
+    )
+    for selections in ({}, {"Product type": ["haircare"], "Location": ["Delhi", "Mumbai"]}):
+        mask = np.ones(len(rows), dtype=bool)
+        for column, values in selections.items():
+            mask &= rows[column].isin(values).to_numpy()
+        expected = plan.run(rows[mask])
+        got = cube.run(plan, selections)
+        assert got["revenue"] == pytest.approx(expected["revenue"], rel=1e-9)
+        pd.testing.assert_frame_equal(got["by_location"], expected["by_location"], check_dtype=False, rtol=1e-6)
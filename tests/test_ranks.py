@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+
+from analytics.ranks import RankIndex
+
+
+def table(n, seed):
+    # Few distinct values so that ties are common, plus missing values.
+    rng = np.random.default_rng(seed)
+    price = rng.integers(0, 20, n).astype(float)
+    price[rng.random(n) < 0.1] = np.nan
+    return pd.DataFrame({
+        "Price": price,
+        "Sold": rng.integers(0, 5, n),
+        "SKU": pd.Categorical(rng.choice(["SKU10", "SKU2", "SKU1"], n)),
+    })
+
+
+def test_extend_matches_fresh_index():
+    full = table(3000, seed=0)
+    start = 1800
+    ratio = full["Sold"].to_numpy() / (full["Price"].to_numpy() + 1)
+    old = RankIndex(full.iloc[:start], {"ratio": ratio[:start]})
+    columns = ["Price", "Sold", "SKU", "ratio"]
+    for column in columns:
+        for ascending in (True, False):
+            old.order(column, ascending)
+
+    extended = old.extend(full, start, {"ratio": ratio})
+    fresh = RankIndex(full, {"ratio": ratio})
+    for column in columns:
+        for ascending in (True, False):
+            np.testing.assert_array_equal(extended.order(column, ascending), fresh.order(column, ascending))
+            np.testing.assert_array_equal(extended.rank(column, ascending), fresh.rank(column, ascending))
+
+
+def test_extend_builds_other_orders_lazily():
+    full = table(500, seed=1)
+    old = RankIndex(full.iloc[:300])
+    old.order("Price", True)
+    extended = old.extend(full, 300)
+    np.testing.assert_array_equal(extended.order("Sold", False), RankIndex(full).order("Sold", False))
@@ -0,0 +1,52 @@
+import numpy as np
+
+from analytics.sketches import KLLSketch
+
+K = 200
+# KLLSketch documents a rank error of roughly 1.7/k.
+BOUND = 1.7 / K
+QS = np.linspace(0, 1, 101)
+
+
+def rank_error(values, sketch):
+    # Largest distance between each q and the rank range of the value the
+    # sketch answers for it (ties span a range of ranks).
+    values = np.sort(values)
+    answers = sketch.quantiles(QS)
+    low = np.searchsorted(values, answers, side="left") / len(values)
+    high = np.searchsorted(values, answers, side="right") / len(values)
+    return float(np.max(np.maximum(low - QS, QS - high).clip(0)))
+
+
+def test_small_inputs_are_exact():
+    values = np.random.default_rng(0).normal(size=K // 2)
+    sketch = KLLSketch.of(values, k=K)
+    assert sketch.exact
+    np.testing.assert_allclose(sketch.quantiles(QS), np.quantile(values, QS))
+
+
+def test_quantiles_within_error_bound():
+    rng = np.random.default_rng(1)
+    for values in (rng.normal(size=200_000), rng.integers(0, 30, 200_000).astype(float), rng.exponential(size=50_000)):
+        sketch = KLLSketch.of(values, k=K)
+        assert not sketch.exact
+        assert rank_error(values, sketch) <= BOUND
+        assert sketch.min == values.min() and sketch.max == values.max()
+
+
+def test_merged_and_united_sketches_within_error_bound():
+    rng = np.random.default_rng(2)
+    parts = [rng.normal(loc, size=30_000) for loc in range(6)]
+    values = np.concatenate(parts)
+    sketches = [KLLSketch.of(part, k=K, seed=i) for i, part in enumerate(parts)]
+    merged = sketches[0]
+    for sketch in sketches[1:]:
+        merged = merged.merge(sketch)
+    assert len(merged) == len(values)
+    assert rank_error(values, merged) <= BOUND
+    assert rank_error(values, KLLSketch.union(sketches)) <= BOUND
+
+
+def test_from_sorted_within_error_bound():
+    values = np.sort(np.random.default_rng(3).gamma(2.0, size=100_000))
+    assert rank_error(values, KLLSketch.from_sorted(values, k=K)) <= BOUND
@@ -0,0 +1,99 @@
+import base64
+import gzip
+import json
+
+import numpy as np
+import plotly.graph_objects as go
+import pytest
+from flask import Flask, Response
+
+from analytics import wire
+from analytics.wire import DECIMALS, MIN_TYPED_LENGTH, TEMPLATE, compact_figure, install_compression, typed_array
+
+
+def decode(values):
+    if isinstance(values, dict):
+        return np.frombuffer(base64.b64decode(values["bdata"]), dtype=np.dtype(values["dtype"]))
+    return np.asarray(values)
+
+
+def test_integers_use_the_smallest_dtype():
+    assert typed_array(np.arange(100))["dtype"] == "i1"
+    assert typed_array(np.arange(200))["dtype"] == "u1"
+    assert typed_array(np.arange(-200, 100))["dtype"] == "i2"
+    assert typed_array(np.arange(100) * 100_000)["dtype"] == "i4"
+    # Whole floats are sent as integers.
+    assert typed_array(np.arange(100, dtype=float))["dtype"] == "i1"
+    np.testing.assert_array_equal(decode(typed_array(np.arange(-200, 100))), np.arange(-200, 100))
+
+
+def test_floats_are_rounded():
+    values = np.random.default_rng(0).random(100) * 100
+    spec = typed_array(values)
+    assert spec["dtype"] == "f4"
+    np.testing.assert_allclose(decode(spec), values, rtol=0, atol=10 ** -DECIMALS)
+    # float32 would lose the cents of large totals.
+    large = values * 1e6
+    assert typed_array(large)["dtype"] == "f8"
+    np.testing.assert_allclose(decode(typed_array(large)), large, rtol=0, atol=10 ** -DECIMALS)
+
+
+def test_other_values_are_unchanged():
+    assert typed_array(["a", "b"]) == ["a", "b"]
+    assert typed_array(list(range(MIN_TYPED_LENGTH - 1))) == list(range(MIN_TYPED_LENGTH - 1))
+    assert typed_array("x") == "x"
+    assert typed_array([]) == []
+
+
+def test_compact_figure():
+    x = [f"SKU{i}" for i in range(50)]
+    y = np.random.default_rng(1).random(50) * 1000
+    fig = go.Figure(go.Bar(x=x, y=y), layout={"template": "plotly_white", "title": {"text": "Revenue"}})
+    figure = compact_figure(fig)
+    assert figure["layout"]["template"] == TEMPLATE
+    assert figure["layout"]["title"]["text"] == "Revenue"
+    assert figure["data"][0]["x"] == x
+    np.testing.assert_allclose(decode(figure["data"][0]["y"]), y, rtol=0, atol=10 ** -DECIMALS)
+    # Plotly.js renders it: the slim template still holds the bar defaults.
+    assert "bar" in figure["layout"]["template"]["data"]
+    json.dumps(figure)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(wire, "brotli", None)
+    app = Flask(__name__)
+    install_compression(app)
+    body = json.dumps({"values": list(range(2000))})
+
+    @app.route("/big")
+    def big():
+        return Response(body, mimetype="application/json")
+
+    @app.route("/small")
+    def small():
+        return Response("{}", mimetype="application/json")
+
+    return app.test_client(), body
+
+
+def test_gzip_when_accepted(client):
+    client, body = client
+    response = client.get("/big", headers={"Accept-Encoding": "br, gzip;q=0.8"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert gzip.decompress(response.data).decode() == body
+
+
+@pytest.mark.parametrize("header", ["", "identity", "gzip;q=0", "br;q=1, gzip; q=0.0"])
+def test_uncompressed_unless_gzip_is_accepted(client, header):
+    client, body = client
+    response = client.get("/big", headers={"Accept-Encoding": header})
+    assert "Content-Encoding" not in response.headers
+    assert response.get_data(as_text=True) == body
+
+
+def test_small_bodies_are_sent_as_they_are(client):
+    client, _ = client
+    response = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in response.headers